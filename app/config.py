@@ -13,6 +13,9 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 XAI_API_KEY = os.getenv("XAI_API_KEY")
 PORTKEY_API_KEY = os.getenv("PORTKEY_API_KEY")
 
+# Local OpenAI-compatible stand-in (benchmarks/fake_llm), e.g. http://localhost:8100/v1
+FAKE_LLM_URL = os.getenv("FAKE_LLM_URL")
+
 # Auth0 Configuration
 AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
 AUTH0_API_AUDIENCE = os.getenv("AUTH0_API_AUDIENCE")
@@ -23,3 +26,57 @@ AUTH0_ALGORITHMS = os.getenv("AUTH0_ALGORITHMS")
 class STATSD:
     HOST = os.getenv("STATSD_HOST", "localhost")
     PORT = os.getenv("STATSD_PORT", 8125)
+
+
+class LOOP_MONITOR:
+    # Opt-in event-loop lag and blocking reporting, see app/metrics/loop_monitor.py
+    ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "false").lower() == "true"
+    INTERVAL_MS = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", 100))
+    BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_MONITOR_BLOCK_THRESHOLD_MS", 250))
+
+
+class TEMPLATE_JOBS:
+    # Split large template builds into per-batch RQ jobs, see app/services/background_jobs/tasks.py
+    FAN_OUT = os.getenv("TEMPLATE_FAN_OUT", "false").lower() == "true"
+    FAN_OUT_MIN_CHAPTERS = int(os.getenv("TEMPLATE_FAN_OUT_MIN_CHAPTERS", 200))
+
+
+class CHAPTER_SUMMARIES:
+    # Summarize consecutive short chapters in one structured call, see StoryExtractor
+    PACKING = os.getenv("SUMMARY_PACKING", "false").lower() == "true"
+    # Estimated chapter tokens per packed call; chapters over half of it are summarized alone
+    PACK_TOKEN_BUDGET = int(os.getenv("SUMMARY_PACK_TOKEN_BUDGET", 8000))
+    PACK_MAX_CHAPTERS = int(os.getenv("SUMMARY_PACK_MAX_CHAPTERS", 6))
+    # Chapters estimated above this many tokens are summarized in chunks and then combined
+    CHUNK_THRESHOLD_TOKENS = int(os.getenv("SUMMARY_CHUNK_THRESHOLD_TOKENS", 32000))
+    CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 8000))
+    # Re-summarize a chapter in a low-priority job when its content is edited
+    REFRESH_ON_SAVE = os.getenv("SUMMARY_REFRESH_ON_SAVE", "false").lower() == "true"
+
+
+class WORKER:
+    # "async" runs jobs concurrently on one event loop, see app/services/background_jobs/async_worker.py
+    MODE = os.getenv("WORKER_MODE", "rq")
+    # Jobs in flight per async worker; each holds a database connection while it runs
+    CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", 4))
+    # How long SIGTERM waits for running jobs before they are cancelled and requeued. Keep it
+    # below the container stop timeout (30s on ECS by default).
+    SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("WORKER_SHUTDOWN_TIMEOUT_SECONDS", 25))
+    # Job classes this worker pool serves, see app/services/background_jobs/job_classes.py
+    CLASSES = os.getenv("WORKER_CLASSES", "interactive,storyboard,template,maintenance")
+
+
+class JOB_CLASSES:
+    # Queues per job class. Users are hashed onto them and workers take turns between them,
+    # so that one user's backlog only delays the users that share its lane.
+    LANES = int(os.getenv("JOB_CLASS_LANES", 8))
+    # Relative share of dequeues between the classes of a worker that serves several
+    WEIGHTS = os.getenv("JOB_CLASS_WEIGHTS", "interactive=8,storyboard=4,template=2,maintenance=1")
+
+
+class QUEUE_METRICS:
+    # Queue, job and worker gauges for autoscaling, see app/services/background_jobs/metrics.py
+    ENABLED = os.getenv("QUEUE_METRICS_ENABLED", "true").lower() == "true"
+    INTERVAL_SECONDS = float(os.getenv("QUEUE_METRICS_INTERVAL_SECONDS", 15))
+    # Export from the API too, in one process only: each exporter reads every queue
+    API_EXPORTER = os.getenv("QUEUE_METRICS_API_EXPORTER", "false").lower() == "true"
@@ -5,9 +5,37 @@ class Constants:
         INCREMENT_COUNT = 1
         API_LATENCY = "request_latency"
         API_COUNT = "request_count"
+        EVENT_LOOP_LAG = "event_loop_lag"
+        EVENT_LOOP_BLOCKED = "event_loop_blocked"
+        EVENT_LOOP_BLOCK_DURATION = "event_loop_block_duration"
+        JOB_LOCK_ACQUIRED = "job_lock_acquired"
+        JOB_LOCK_CONTENDED = "job_lock_contended"
+        JOB_LOCK_WAIT = "job_lock_wait"
+        JOB_LOCK_TIMEOUT = "job_lock_timeout"
+        JOB_ENQUEUE_DUPLICATE = "job_enqueue_duplicate"
+        JOB_QUEUE_DEPTH = "job_queue_depth"
+        JOB_QUEUE_OLDEST_AGE = "job_queue_oldest_age"
+        JOB_QUEUE_STARTED = "job_queue_started"
+        JOB_QUEUE_DEFERRED = "job_queue_deferred"
+        JOB_QUEUE_FAILED = "job_queue_failed"
+        JOB_WORKERS = "job_workers"
+        JOB_WORKERS_BUSY = "job_workers_busy"
+        JOB_DURATION = "job_duration"
+        JOB_SUCCEEDED = "job_succeeded"
+        JOB_FAILED = "job_failed"
+        CHAPTER_CONTEXT_PACK = "chapter_context_pack"
+        JOB_WAIT = "job_wait"
+        JOB_CANCELLED = "job_cancelled"
+        JOB_CANCEL_AVOIDED_ITEMS = "job_cancel_avoided_items"
+        JOB_CANCEL_AVOIDED_TIME = "job_cancel_avoided_time"
 
     class Tag:
         PATH = "path"
         METHOD = "method"
         CODE = "code"
         STAGE = "stage"
+        LOCK = "lock"
+        JOB_CLASS = "job_class"
+        KIND = "kind"
+        TASK = "task"
+        RESULT = "result"
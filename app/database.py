@@ -1,11 +1,13 @@
 import os
 import time
+from contextlib import contextmanager
+from typing import Iterator
 
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 # Load environment variables
 load_dotenv()
@@ -19,7 +21,8 @@ MYSQL_PORT = os.getenv("MYSQL_PORT", "3306")
 MYSQL_DB_NAME = os.getenv("MYSQL_DB_NAME", "vaani")
 
 # Create database URL for MySQL connection
-SQLALCHEMY_DATABASE_URL = (
+# DATABASE_URL overrides it, e.g. sqlite:///bench.db for local benchmarks
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL") or (
     f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB_NAME}"
 )
 
@@ -29,9 +32,14 @@ def create_engine_with_retry(max_retries=5, retry_interval=5):
     for attempt in range(max_retries):
         try:
             # Create MySQL engine
+            connect_args = {}
+            if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+                # Pipeline coroutines hand the session to worker threads
+                connect_args["check_same_thread"] = False
             engine = create_engine(
                 SQLALCHEMY_DATABASE_URL,
                 pool_pre_ping=True,
+                connect_args=connect_args,
             )
 
             # Test the connection
@@ -64,3 +72,13 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    # For background jobs, which outlive any request: the session is closed when the job ends
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 
 from asgi_correlation_id import CorrelationIdMiddleware
@@ -6,8 +7,14 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.auth import get_current_user
 from app.logging_config import configure_logging
+from app.metrics.loop_monitor import start_loop_monitor, stop_loop_monitor
 from app.metrics.router import MetricsRouter
 from app.routes import router as api_router
+from app.services.background_jobs.metrics import (
+    collect_queue_metrics,
+    start_queue_metrics_exporter,
+    stop_queue_metrics_exporter,
+)
 
 app = FastAPI(
     title="Vaani API",
@@ -19,7 +26,8 @@ app = FastAPI(
             "description": "Authentication endpoints",
         },
     ],
-    on_startup=[configure_logging],
+    on_startup=[configure_logging, start_loop_monitor, start_queue_metrics_exporter],
+    on_shutdown=[stop_loop_monitor, stop_queue_metrics_exporter],
 )
 utils_router = MetricsRouter()
 logger = logging.getLogger(__name__)
@@ -51,5 +59,10 @@ async def health_check(health_id: int):
     return {"status": f"healthy {health_id}", "api": "Vaani API", "version": "1.0.0"}
 
 
+@utils_router.get("/queues", tags=["public"])
+async def queue_metrics():
+    return await asyncio.to_thread(collect_queue_metrics)
+
+
 app.include_router(api_router, prefix="/vaani/api/v1", dependencies=[Depends(get_current_user)])
 app.include_router(utils_router, prefix="/vaani/utils")
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from app.config import LOOP_MONITOR
+from app.constants.metrics import Constants
+from app.metrics.statsd_client import statsd
+
+logger = logging.getLogger("metrics")
+
+# ("<METHOD> <route path>", correlation ID) of the request each task is handling, set by
+# MetricsAPIRoute. Task.get_context() would do, but only exists from Python 3.12.
+request_contexts: "weakref.WeakKeyDictionary[asyncio.Task, Tuple[str, Optional[str]]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+class LoopMonitor:
+    """Measures event-loop lag and reports callbacks that block the loop.
+
+    A heartbeat task sleeps for ``interval`` and records how late it wakes up. A watchdog
+    thread notices when the heartbeat is overdue by more than ``threshold`` and samples the
+    loop thread's stack while it is still blocked, together with the route and correlation ID
+    of the task that is running. Once the loop recovers, the heartbeat logs the stall with the
+    samples and sends it to statsd.
+    """
+
+    def __init__(self, interval_ms: float, threshold_ms: float, max_frames: int = 40):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.max_frames = max_frames
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._beat_at = time.monotonic()
+        # Stack samples for the stall that started after the heartbeat at _sampled_beat
+        self._sampled_beat: Optional[float] = None
+        self._samples: List[Tuple[str, Optional[str], Optional[str]]] = []
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat_at = time.monotonic()
+        self._heartbeat = self._loop.create_task(self._beat(), name="loop-monitor-heartbeat")
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-monitor-watchdog", daemon=True
+        )
+        self._watchdog.start()
+        logger.info(
+            f"Event loop monitor started | interval {self.interval * 1000:.0f}ms | "
+            f"threshold {self.threshold * 1000:.0f}ms"
+        )
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._heartbeat:
+            self._heartbeat.cancel()
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+
+    async def _beat(self) -> None:
+        while True:
+            self._beat_at = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = time.monotonic() - self._beat_at - self.interval
+            statsd.timing(
+                Constants.Metric.EVENT_LOOP_LAG,
+                lag * 1000,
+                Constants.Metric.HUNDRED_SAMPLING_RATE,
+            )
+            if lag >= self.threshold:
+                self._report(lag)
+
+    def _watch(self) -> None:
+        # Poll often enough to catch stalls only slightly longer than the threshold
+        poll = min(self.interval, self.threshold) / 4
+        while not self._stop.wait(poll):
+            beat_at = self._beat_at
+            if time.monotonic() - beat_at < self.interval + self.threshold:
+                continue
+            sample = self._sample()
+            if sample is None:
+                continue
+            with self._lock:
+                if self._sampled_beat != beat_at:
+                    self._sampled_beat, self._samples = beat_at, []
+                self._samples.append(sample)
+
+    def _sample(self) -> Optional[Tuple[str, Optional[str], Optional[str]]]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        stack = "".join(traceback.format_stack(frame, limit=self.max_frames))
+
+        task = asyncio.current_task(self._loop)
+        route, request_id = request_contexts.get(task, (None, None)) if task else (None, None)
+        return stack, route, request_id
+
+    def _report(self, lag: float) -> None:
+        with self._lock:
+            samples = self._samples if self._sampled_beat == self._beat_at else []
+            self._sampled_beat, self._samples = None, []
+
+        lag_ms = lag * 1000
+        route = request_id = None
+        stack = "No stack sample captured"
+        if samples:
+            # The most frequent stack is where the loop spent most of the stall
+            stacks = Counter(sample[0] for sample in samples)
+            stack = stacks.most_common(1)[0][0]
+            route = next((sample[1] for sample in samples if sample[1]), None)
+            request_id = next((sample[2] for sample in samples if sample[2]), None)
+
+        method, _, path = (route or "unknown unknown").partition(" ")
+        tags: Dict[str, str] = {Constants.Tag.METHOD: method, Constants.Tag.PATH: path}
+        statsd.increment(
+            Constants.Metric.EVENT_LOOP_BLOCKED,
+            Constants.Metric.INCREMENT_COUNT,
+            Constants.Metric.HUNDRED_SAMPLING_RATE,
+            tags,
+        )
+        statsd.timing(
+            Constants.Metric.EVENT_LOOP_BLOCK_DURATION,
+            lag_ms,
+            Constants.Metric.HUNDRED_SAMPLING_RATE,
+            tags,
+        )
+        logger.warning(
+            f"Event loop blocked | {lag_ms:.0f}ms | {route or 'unknown route'} | "
+            f"correlation_id={request_id or '-'} | {len(samples)} stack samples\n{stack}"
+        )
+
+
+loop_monitor: Optional[LoopMonitor] = None
+
+
+async def start_loop_monitor():
+    global loop_monitor
+    if not LOOP_MONITOR.ENABLED or loop_monitor is not None:
+        return
+    loop_monitor = LoopMonitor(LOOP_MONITOR.INTERVAL_MS, LOOP_MONITOR.BLOCK_THRESHOLD_MS)
+    loop_monitor.start()
+
+
+async def stop_loop_monitor():
+    global loop_monitor
+    if loop_monitor is not None:
+        loop_monitor.stop()
+        loop_monitor = None
@@ -1,11 +1,14 @@
+import asyncio
 import logging
 import time
 from typing import Callable
 
+from asgi_correlation_id import correlation_id
 from fastapi import APIRouter, Request, Response
 from fastapi.routing import APIRoute
 
 from app.constants.metrics import Constants
+from app.metrics.loop_monitor import request_contexts
 from app.metrics.statsd_client import statsd
 
 # Use the same logger as in the original middleware
@@ -21,6 +24,10 @@ class MetricsAPIRoute(APIRoute):
             route_path = request.scope["route"].path
             method = request.method
 
+            # Lets the loop monitor attribute blocking to this route
+            task = asyncio.current_task()
+            request_contexts[task] = (f"{method} {route_path}", correlation_id.get())
+
             # Get client IP - considering forwarded headers (from original middleware)
             client_ip = request.headers.get(
                 "X-Forwarded-For", request.client.host if request.client else "unknown"
@@ -69,6 +76,8 @@ class MetricsAPIRoute(APIRoute):
 
                 # Re-raise the exception
                 raise
+            finally:
+                request_contexts.pop(task, None)
 
         return metrics_route_handler
 
@@ -26,6 +26,10 @@ class StatsdClient:
         stat = self._sanitize_metric(stat)
         self.client.incr(stat=stat, count=count, rate=rate, tags=tags)
 
+    def gauge(self, stat: str, value: float, rate: int = 1, tags: Optional[Dict[str, str]] = None):
+        stat = self._sanitize_metric(stat)
+        self.client.gauge(stat=stat, value=value, rate=rate, tags=tags)
+
     def _sanitize_metric(self, metric: str) -> str:
         return metric.replace("/", ".").replace("-", "_").replace(" ", "_")
 
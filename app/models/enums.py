@@ -12,3 +12,10 @@ class StoryboardStatus(Enum):
 class PromptSource(Enum):
     SCENE = "SCENE"
     CHAPTER = "CHAPTER"
+
+
+class TemplateCheckpointStage(Enum):
+    CHAPTER_SUMMARY_CHUNKS = "CHAPTER_SUMMARY_CHUNKS"
+    CHARACTER_ARC_BATCHES = "CHARACTER_ARC_BATCHES"
+    CHARACTER_ARC_TEMPLATES = "CHARACTER_ARC_TEMPLATES"
+    PLOT_BEAT_TEMPLATES = "PLOT_BEAT_TEMPLATES"
@@ -4,10 +4,12 @@ from sqlalchemy import (
     Column,
     Enum,
     ForeignKey,
+    Index,
     Integer,
     LargeBinary,
     String,
     Text,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import relationship
 
@@ -27,6 +29,35 @@ class CharacterArc(Base):
     archetype = Column(Text, nullable=True)
 
 
+class CharacterArcSegment(Base):
+    # One chapter_range_content entry of a character arc, kept in sync by CharacterArcsRepository
+    __tablename__ = "character_arc_segments"
+    __table_args__ = (
+        Index(
+            "ix_character_arc_segments_source_range",
+            "type",
+            "source_id",
+            "start_chapter",
+            "end_chapter",
+        ),
+        Index(
+            "ix_character_arc_segments_arc_range",
+            "character_arc_id",
+            "start_chapter",
+            "end_chapter",
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    character_arc_id = Column(Integer, ForeignKey("character_arcs.id"), nullable=False)
+    type = Column(String(50), nullable=False)  # Type of the arc
+    source_id = Column(Integer, nullable=True)  # Source of the arc
+    position = Column(Integer, nullable=False)  # Index in chapter_range_content
+    start_chapter = Column(Integer, nullable=False)
+    end_chapter = Column(Integer, nullable=False)
+    content = Column(Text, nullable=False)
+
+
 class Image(Base):
     __tablename__ = "images"
 
@@ -65,6 +96,8 @@ class Chapter(Base):
     chapter_no = Column(Integer, nullable=False)
     content = Column(Text, nullable=False)
     source_text = Column(Text, nullable=True)
+    # Content and summary settings the pipeline summarized, see summary_fingerprint
+    source_text_fingerprint = Column(String(64), nullable=True)
     character_ids = Column(JSON, nullable=True, default=list)
     state = Column(String(50), default="DRAFT", nullable=False)
     created_at = Column(BigInteger, nullable=False)  # Unix timestamp
@@ -75,6 +108,27 @@ class Chapter(Base):
     scenes = relationship("Scene", back_populates="chapter")
 
 
+class ChapterContextPack(Base):
+    # Context a storyboard chapter is generated with, see app/services/chapter_context_service.py
+    __tablename__ = "chapter_context_packs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # Packs go with their chapter or book, whichever way it is deleted
+    chapter_id = Column(
+        Integer, ForeignKey("chapters.id", ondelete="CASCADE"), nullable=False, unique=True
+    )
+    book_id = Column(
+        Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    chapter_no = Column(Integer, nullable=False)
+    context_size = Column(Integer, nullable=False)  # Previous chapters covered
+    character_ids = Column(JSON, nullable=False)  # Characters of the chapter, tagged or matched
+    character_arcs = Column(JSON, nullable=False)  # [name, content] of their covering segments
+    previous_chapters = Column(JSON, nullable=False)  # chapter_no, title and source_text of each
+    next_chapter = Column(JSON, nullable=True)
+    built_at = Column(BigInteger, nullable=False)  # Unix timestamp
+
+
 class Character(Base):
     __tablename__ = "characters"
 
@@ -137,6 +191,22 @@ class Template(Base):
     plot_beat_template_status = Column(Text, nullable=True)
 
 
+class TemplateStageCheckpoint(Base):
+    __tablename__ = "template_stage_checkpoints"
+    __table_args__ = (UniqueConstraint("template_id", "stage", "item_key"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    template_id = Column(Integer, ForeignKey("templates.id"), nullable=False, index=True)
+    stage = Column(String(50), nullable=False)  # TemplateCheckpointStage value
+    item_key = Column(String(255), nullable=False)  # Batch, character arc or plot beat key
+    status = Column(Text, nullable=False)  # TemplateStatusEnum value
+    result_json = Column(JSON, nullable=True)  # Item result, reused when the stage resumes
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(BigInteger, nullable=False)  # Unix timestamp
+    updated_at = Column(BigInteger, nullable=False)  # Unix timestamp
+
+
 class Storyboard(Base):
     __tablename__ = "storyboards"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -75,6 +75,9 @@ FILE_END
 And so on for each important character...
 """
 
+# Bump when the chapter summary prompts change, so that existing summaries are refreshed
+CHAPTER_SUMMARY_PROMPT_VERSION = 1
+
 CHAPTER_SUMMARY_SYSTEM_PROMPT = (
     "You are a literary assistant specializing in precise chapter summarization. "
     "Your task is to create a detailed summary of the chapter that captures all key story elements, background and context. "
@@ -100,6 +103,58 @@ Chapter Number: {chapter_number}
 
 Please create a detailed but comprehensive summary of this chapter"""
 
+CHAPTER_CHUNK_SUMMARY_USER_PROMPT_TEMPLATE = """
+# Chapter Summarization Task
+
+## Chapter Information
+Title: {chapter_title}
+Chapter Number: {chapter_number}
+Part: {part} of {part_count}
+
+## Content to Summarize
+```
+{chunk_content}
+```
+
+## Summarization Instructions
+
+This is one consecutive part of a long chapter. Please create a detailed but comprehensive summary of this part only"""
+
+CHAPTER_SUMMARY_REDUCE_USER_PROMPT_TEMPLATE = """
+# Chapter Summarization Task
+
+## Chapter Information
+Title: {chapter_title}
+Chapter Number: {chapter_number}
+
+## Summaries of the Chapter's Parts, in Order
+{part_summaries}
+
+## Summarization Instructions
+
+Please combine these part summaries into one detailed but comprehensive summary of the whole chapter, keeping the order of events and every detail they preserve"""
+
+CHAPTER_SUMMARY_PACKED_USER_PROMPT_TEMPLATE = """
+# Chapter Summarization Task
+
+The following {chapter_count} consecutive chapters are to be summarized separately.
+{chapters}
+
+## Summarization Instructions
+
+Please create a detailed but comprehensive summary of each chapter. Summarize every chapter on its own, without moving events between chapters, and return one entry per chapter with its chapter number."""
+
+CHAPTER_SUMMARY_PACKED_CHAPTER_TEMPLATE = """
+## Chapter Information
+Title: {chapter_title}
+Chapter Number: {chapter_number}
+
+## Content to Summarize
+```
+{chapter_content}
+```
+"""
+
 # Character Consolidation Prompts
 CHARACTER_CONSOLIDATION_SYSTEM_PROMPT = (
     "You are a helpful assistant that identifies the same characters across different text sections. "
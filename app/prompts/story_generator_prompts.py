@@ -220,20 +220,15 @@ This section is essential for informing full chapter generation later. It must i
 - [List of all named or meaningful characters present or referenced]
 """
 
-# Character Identification Prompts
-CHARACTER_IDENTIFICATION_SYSTEM_PROMPT = """You are an AI assistant that identifies characters in plot beats.
-Your task is to analyze the plot beat content and identify which characters are involved.
-Return only the character IDs in a structured format."""
+# Appended to the plot beat user prompt when the beat is generated as structured output
+PLOT_BEAT_CHARACTER_IDS_PROMPT_TEMPLATE = """
 
-CHARACTER_IDENTIFICATION_USER_PROMPT_TEMPLATE = """Given the following chapter summary and list of characters with their IDs, identify which characters are involved in this chapter summary.
+---
 
-Characters:
+## Characters With IDs:
 {character_list_with_ids}
 
-Chapter Summary:
-{plot_beat_content}
-
-Return only the character IDs in a structured format."""
+Return the chapter summary, in the output format above, as `content`, and the IDs of every character involved in it as `character_ids`."""
 
 # Character Name Generation Prompt
 CHARACTER_NAME_GENERATION_PROMPT = (
@@ -1,8 +1,11 @@
 import logging
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, update
 
 from app.models.models import Chapter
+from app.schemas.schemas import ChapterRecord
 from app.utils.exceptions import rollback_on_exception
 
 from .base_repository import BaseRepository
@@ -57,6 +60,64 @@ class ChapterRepository(BaseRepository[Chapter]):
         self.db.refresh(merged_chapter)
         return merged_chapter
 
+    def get_records_by_book_id(self, book_id: int) -> List[ChapterRecord]:
+        return self._records(Chapter.book_id == book_id)
+
+    def get_record(self, book_id: int, chapter_id: int) -> Optional[ChapterRecord]:
+        records = self._records(Chapter.book_id == book_id, Chapter.id == chapter_id)
+        return records[0] if records else None
+
+    def _records(self, *criteria) -> List[ChapterRecord]:
+        # Everything but the chapter text, which can be tens of kilobytes per chapter
+        rows = (
+            self.db.query(
+                Chapter.id,
+                Chapter.chapter_no,
+                Chapter.title,
+                func.coalesce(func.char_length(Chapter.content), 0),
+                func.coalesce(func.char_length(Chapter.source_text), 0) > 0,
+                Chapter.source_text_fingerprint,
+            )
+            .filter(*criteria)
+            .order_by(Chapter.chapter_no)
+            .all()
+        )
+        return [
+            ChapterRecord(
+                id=row[0],
+                chapter_no=row[1],
+                title=row[2],
+                content_length=row[3],
+                has_summary=bool(row[4]),
+                summary_fingerprint=row[5],
+            )
+            for row in rows
+        ]
+
+    def get_field(self, chapter_ids: List[int], field: str) -> Dict[int, Any]:
+        column = getattr(Chapter, field)
+        rows = self.db.query(Chapter.id, column).filter(Chapter.id.in_(chapter_ids)).all()
+        return dict(rows)
+
+    def stream_field(
+        self, book_id: int, field: str, batch_size: int = 100
+    ) -> Iterator[Tuple[int, Any]]:
+        # yield_per streams rows from a server-side cursor, so memory does not grow with the book
+        column = getattr(Chapter, field)
+        query = (
+            self.db.query(Chapter.id, column)
+            .filter(Chapter.book_id == book_id)
+            .order_by(Chapter.chapter_no)
+            .yield_per(batch_size)
+        )
+        for chapter_id, value in query:
+            yield chapter_id, value
+
+    def bulk_update(self, rows: List[Dict[str, Any]]) -> None:
+        # One UPDATE per column set, keyed by each row's "id". The caller commits.
+        if rows:
+            self.db.execute(update(Chapter), rows)
+
     @rollback_on_exception
     def delete(self, chapter_id: int) -> bool:
         chapter = self.get_by_id(chapter_id)
@@ -1,17 +1,47 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from sqlalchemy.orm import Session
 
-from app.models.models import CharacterArc, Storyboard
+from app.models.models import CharacterArc, CharacterArcSegment, Storyboard
 from app.utils.exceptions import CharacterArcNotFoundException, rollback_on_exception
 
 from .base_repository import BaseRepository
 
 
+def build_segments(arc: CharacterArc) -> List[CharacterArcSegment]:
+    segments = []
+    for position, segment in enumerate((arc.content_json or {}).get("chapter_range_content") or []):
+        chapter_range = segment.get("chapter_range") or []
+        # Ranges that are not [start, end] never matched a chapter, so they are not stored
+        if len(chapter_range) != 2 or not all(isinstance(n, int) for n in chapter_range):
+            continue
+        segments.append(
+            CharacterArcSegment(
+                character_arc_id=arc.id,
+                type=arc.type,
+                source_id=arc.source_id,
+                position=position,
+                start_chapter=chapter_range[0],
+                end_chapter=chapter_range[1],
+                content=segment.get("content") or "",
+            )
+        )
+    return segments
+
+
 class CharacterArcsRepository(BaseRepository[CharacterArc]):
     def __init__(self, db: Session):
         super().__init__(db)
 
+    def replace_segments(self, arcs: Iterable[CharacterArc]) -> None:
+        # Part of the caller's transaction, arcs must have been flushed
+        arcs = list(arcs)
+        self.db.query(CharacterArcSegment).filter(
+            CharacterArcSegment.character_arc_id.in_([arc.id for arc in arcs])
+        ).delete(synchronize_session=False)
+        for arc in arcs:
+            self.db.add_all(build_segments(arc))
+
     @rollback_on_exception
     def create(
         self,
@@ -32,6 +62,8 @@ class CharacterArcsRepository(BaseRepository[CharacterArc]):
             archetype=archetype,
         )
         self.db.add(arc)
+        self.db.flush()
+        self.replace_segments([arc])
         self.db.commit()
         self.db.refresh(arc)
         return arc
@@ -53,6 +85,8 @@ class CharacterArcsRepository(BaseRepository[CharacterArc]):
             self.db.add(arc)
             created_arcs.append(arc)
 
+        self.db.flush()
+        self.replace_segments(created_arcs)
         self.db.commit()
 
         for arc in created_arcs:
@@ -97,11 +131,34 @@ class CharacterArcsRepository(BaseRepository[CharacterArc]):
             if hasattr(arc, key):
                 setattr(arc, key, value)
 
+        if update_data.keys() & {"content_json", "type", "source_id"}:
+            self.replace_segments([arc])
         self.db.commit()
         self.db.refresh(arc)
 
         return arc
 
+    @rollback_on_exception
+    def delete_by_type_and_source_id(self, type: str, source_id: int) -> int:
+        arc_ids = [
+            row.id
+            for row in self.db.query(CharacterArc.id).filter(
+                CharacterArc.type == type, CharacterArc.source_id == source_id
+            )
+        ]
+        if not arc_ids:
+            return 0
+        self.db.query(CharacterArcSegment).filter(
+            CharacterArcSegment.character_arc_id.in_(arc_ids)
+        ).delete(synchronize_session=False)
+        deleted = (
+            self.db.query(CharacterArc)
+            .filter(CharacterArc.id.in_(arc_ids))
+            .delete(synchronize_session=False)
+        )
+        self.db.commit()
+        return deleted
+
     def get_character_arcs_by_book_id(self, book_id: int) -> List[CharacterArc]:
         character_arcs = (
             self.db.query(CharacterArc)
@@ -111,3 +168,49 @@ class CharacterArcsRepository(BaseRepository[CharacterArc]):
         )
 
         return character_arcs
+
+    def get_segments_by_chapter(
+        self,
+        type: str,
+        source_ids: List[int],
+        chapter_no: int,
+        character_arc_ids: Optional[Iterable[int]] = None,
+        archetypes: Optional[Iterable[str]] = None,
+    ) -> List[Tuple[str, str, int]]:
+        """Name, content and arc id of the arc segments whose chapter range covers chapter_no.
+
+        Optionally only those of the given arcs, or of the arcs with the given archetypes.
+        """
+        query = (
+            self.db.query(
+                CharacterArc.name, CharacterArcSegment.content, CharacterArcSegment.character_arc_id
+            )
+            .join(CharacterArc, CharacterArc.id == CharacterArcSegment.character_arc_id)
+            .filter(
+                CharacterArcSegment.type == type,
+                CharacterArcSegment.source_id.in_(source_ids),
+                CharacterArcSegment.start_chapter <= chapter_no,
+                CharacterArcSegment.end_chapter >= chapter_no,
+            )
+        )
+        if character_arc_ids is not None:
+            query = query.filter(CharacterArcSegment.character_arc_id.in_(list(character_arc_ids)))
+        if archetypes is not None:
+            query = query.filter(CharacterArc.archetype.in_(list(archetypes)))
+        rows = query.order_by(
+            CharacterArcSegment.character_arc_id, CharacterArcSegment.position
+        ).all()
+        return [tuple(row) for row in rows]
+
+    def get_segments_by_book_and_chapter(
+        self, book_id: int, chapter_no: int, character_arc_ids: Optional[Iterable[int]] = None
+    ) -> List[Tuple[str, str, int]]:
+        storyboard_ids = [
+            storyboard_id
+            for (storyboard_id,) in self.db.query(Storyboard.id).filter(
+                Storyboard.book_id == book_id
+            )
+        ]
+        return self.get_segments_by_chapter(
+            "STORYBOARD", storyboard_ids, chapter_no, character_arc_ids=character_arc_ids
+        )
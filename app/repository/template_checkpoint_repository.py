@@ -0,0 +1,143 @@
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from app.models.enums import TemplateCheckpointStage
+from app.models.models import TemplateStageCheckpoint
+from app.schemas.schemas import TemplateStatusEnum
+from app.utils.exceptions import rollback_on_exception
+
+from .base_repository import BaseRepository
+
+
+class TemplateCheckpointRepository(BaseRepository[TemplateStageCheckpoint]):
+    def __init__(self, db: Optional[Session] = None):
+        super().__init__(db)
+
+    def get_stage(
+        self, template_id: int, stage: TemplateCheckpointStage
+    ) -> Dict[str, TemplateStageCheckpoint]:
+        checkpoints = (
+            self.db.query(TemplateStageCheckpoint)
+            .filter(
+                TemplateStageCheckpoint.template_id == template_id,
+                TemplateStageCheckpoint.stage == stage.value,
+            )
+            .all()
+        )
+        return {checkpoint.item_key: checkpoint for checkpoint in checkpoints}
+
+    def get_completed_results(
+        self, template_id: int, stage: TemplateCheckpointStage
+    ) -> Dict[str, Any]:
+        return {
+            item_key: checkpoint.result_json
+            for item_key, checkpoint in self.get_stage(template_id, stage).items()
+            if checkpoint.status == TemplateStatusEnum.COMPLETED
+        }
+
+    @rollback_on_exception
+    def save(
+        self,
+        template_id: int,
+        stage: TemplateCheckpointStage,
+        item_key: str,
+        status: TemplateStatusEnum,
+        result_json: Any = None,
+        error: str = None,
+    ) -> TemplateStageCheckpoint:
+        current_time = int(time.time())
+        checkpoint = (
+            self.db.query(TemplateStageCheckpoint)
+            .filter(
+                TemplateStageCheckpoint.template_id == template_id,
+                TemplateStageCheckpoint.stage == stage.value,
+                TemplateStageCheckpoint.item_key == item_key,
+            )
+            .first()
+        )
+        if not checkpoint:
+            checkpoint = TemplateStageCheckpoint(
+                template_id=template_id,
+                stage=stage.value,
+                item_key=item_key,
+                attempts=0,
+                created_at=current_time,
+            )
+            self.db.add(checkpoint)
+        checkpoint.status = status.value
+        checkpoint.result_json = result_json
+        checkpoint.error = error
+        checkpoint.attempts += 1
+        checkpoint.updated_at = current_time
+        self.db.commit()
+        return checkpoint
+
+    def bulk_save(self, checkpoints: List[Dict[str, Any]]) -> None:
+        """Upsert checkpoints without committing, for ResultSink.
+
+        Each entry has template_id, stage, item_key, status, result_json, error and the
+        number of attempts it records. Existing rows are updated and the rest inserted, in
+        one query and at most two bulk statements.
+        """
+        if not checkpoints:
+            return
+        existing = {
+            (row.template_id, row.stage, row.item_key): row
+            for row in self.db.query(
+                TemplateStageCheckpoint.id,
+                TemplateStageCheckpoint.template_id,
+                TemplateStageCheckpoint.stage,
+                TemplateStageCheckpoint.item_key,
+                TemplateStageCheckpoint.attempts,
+            ).filter(
+                TemplateStageCheckpoint.template_id.in_({c["template_id"] for c in checkpoints}),
+                TemplateStageCheckpoint.stage.in_({c["stage"] for c in checkpoints}),
+                TemplateStageCheckpoint.item_key.in_({c["item_key"] for c in checkpoints}),
+            )
+        }
+        current_time = int(time.time())
+        updates, inserts = [], []
+        for checkpoint in checkpoints:
+            row = existing.get(
+                (checkpoint["template_id"], checkpoint["stage"], checkpoint["item_key"])
+            )
+            values = {**checkpoint, "updated_at": current_time}
+            if row:
+                values.update(id=row.id, attempts=row.attempts + checkpoint["attempts"])
+                updates.append(values)
+            else:
+                inserts.append({**values, "created_at": current_time})
+        if updates:
+            self.db.execute(update(TemplateStageCheckpoint), updates)
+        if inserts:
+            self.db.execute(insert(TemplateStageCheckpoint), inserts)
+
+    def delete_items(
+        self, template_id: int, stage: TemplateCheckpointStage, item_keys: List[str]
+    ) -> int:
+        # Without committing, for ResultSink
+        return (
+            self.db.query(TemplateStageCheckpoint)
+            .filter(
+                TemplateStageCheckpoint.template_id == template_id,
+                TemplateStageCheckpoint.stage == stage.value,
+                TemplateStageCheckpoint.item_key.in_(item_keys),
+            )
+            .delete(synchronize_session=False)
+        )
+
+    @rollback_on_exception
+    def delete_stage(self, template_id: int, stage: TemplateCheckpointStage) -> int:
+        deleted = (
+            self.db.query(TemplateStageCheckpoint)
+            .filter(
+                TemplateStageCheckpoint.template_id == template_id,
+                TemplateStageCheckpoint.stage == stage.value,
+            )
+            .delete(synchronize_session=False)
+        )
+        self.db.commit()
+        return deleted
@@ -3,6 +3,8 @@ from typing import Optional
 from sqlalchemy.orm import Session
 
 from app.models.models import Template
+from app.schemas.schemas import TemplateStatusEnum
+from app.utils.exceptions import rollback_on_exception
 
 from .base_repository import BaseRepository
 
@@ -35,40 +37,15 @@ class TemplateRepository(BaseRepository[Template]):
         self.db.refresh(template)
         return template
 
-    def update_summary_status(self, template_id, status):
-        template = self.get_by_id(template_id)
-        template.summary_status = status
-        self.db.commit()
-        self.db.refresh(template)
-        return template
-
-    def update_character_arc_status(self, template_id, status):
-        template = self.get_by_id(template_id)
-        template.character_arc_status = status
-        self.db.commit()
-        self.db.refresh(template)
-        return template
-
-    def update_plot_beats_status(self, template_id, status):
-        template = self.get_by_id(template_id)
-        template.plot_beats_status = status
-        self.db.commit()
-        self.db.refresh(template)
-        return template
-
-    def update_character_arc_template_status(self, template_id, status):
-        template = self.get_by_id(template_id)
-        template.character_arc_template_status = status
-        self.db.commit()
-        self.db.refresh(template)
-        return template
-
-    def update_plot_beat_template_status(self, template_id, status):
-        template = self.get_by_id(template_id)
-        template.plot_beat_template_status = status
+    @rollback_on_exception
+    def update_status(self, template_id: int, **statuses: TemplateStatusEnum):
+        # One UPDATE for any number of stage status columns, without reloading the row
+        if not statuses:
+            return
+        self.db.query(Template).filter(Template.id == template_id).update(
+            statuses, synchronize_session=False
+        )
         self.db.commit()
-        self.db.refresh(template)
-        return template
 
     def get_all_templates(self):
         return self.db.query(Template).all()
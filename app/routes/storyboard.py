@@ -15,7 +15,7 @@ router = MetricsRouter(tags=["storyboard"])
 
 
 @router.post("/storyboard", response_model=StoryboardResponse)
-async def create_storyboard(
+def create_storyboard(
     storyboard: StoryboardCreate,
     # current_user: dict = Depends(require_storyboard_write_permission)):
     db: Session = Depends(get_db),
@@ -35,6 +35,12 @@ def get_storyboard_by_id(storyboard_id: int, db: Session = Depends(get_db)):
     return storyboard
 
 
+@router.get("/storyboard/{storyboard_id}/progress/stream")
+def stream_storyboard_progress(storyboard_id: int, db: Session = Depends(get_db)):
+    storyboard_service = StoryboardService(db, "test")
+    return storyboard_service.stream_storyboard_progress(storyboard_id)
+
+
 @router.put("/storyboard/{storyboard_id}/continue", response_model=StoryboardResponse)
 def continue_storyboard(storyboard_id: int, db: Session = Depends(get_db)):
     storyboard_service = StoryboardService(db, "test")
@@ -42,6 +48,13 @@ def continue_storyboard(storyboard_id: int, db: Session = Depends(get_db)):
     return storyboard
 
 
+@router.post("/storyboard/{storyboard_id}/cancel", response_model=BooleanResponse)
+def cancel_storyboard(storyboard_id: int, db: Session = Depends(get_db)):
+    storyboard_service = StoryboardService(db, "test")
+    storyboard_service.cancel_storyboard(storyboard_id)
+    return BooleanResponse(success=True, message="Cancellation requested")
+
+
 @router.post(
     "/storyboard/{storyboard_id}/generate-chapters-summary", response_model=BooleanResponse
 )
@@ -50,3 +50,31 @@ def get_template_status_route(template_id: int, db: Session = Depends(get_db)):
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     return template
+
+
+@router.get("/templates/{template_id}/progress")
+def get_template_progress_route(template_id: int, db: Session = Depends(get_db)):
+    service = TemplateService(db)
+    if not service.get_template_row(template_id):
+        raise HTTPException(status_code=404, detail="Template not found")
+    return service.get_template_progress(template_id)
+
+
+@router.get("/templates/{template_id}/progress/stream")
+def stream_template_progress_route(template_id: int, db: Session = Depends(get_db)):
+    service = TemplateService(db)
+    if not service.get_template_row(template_id):
+        raise HTTPException(status_code=404, detail="Template not found")
+    return service.stream_template_progress(template_id)
+
+
+@router.post("/templates/{template_id}/cancel", response_model=dict)
+def cancel_template_route(
+    template_id: int,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(require_write_permission),
+):
+    service = TemplateService(db)
+    if not service.get_template_row(template_id):
+        raise HTTPException(status_code=404, detail="Template not found")
+    return service.cancel_template(template_id)
@@ -60,6 +60,31 @@ class ChapterSourceTextUpdate(BaseModel):
     source_text: str | None = None
 
 
+class ChapterRecord(BaseModel):
+    """A chapter as the template pipeline keeps it in memory.
+
+    The text fields are only set while a stage works on the chapter, see StoryExtractor.
+    """
+
+    id: int
+    chapter_no: int
+    title: str
+    content_length: int
+    has_summary: bool
+    summary_fingerprint: Optional[str] = None
+    content: Optional[str] = None
+    source_text: Optional[str] = None
+
+
+class ChapterSummary(BaseModel):
+    chapter_number: int
+    summary: str
+
+
+class ChapterSummaries(BaseModel):
+    summaries: List[ChapterSummary]
+
+
 class ChapterResponse(BaseModel):
     id: int
     book_id: int
@@ -275,6 +300,7 @@ class TemplateStatusEnum(str, Enum):
     IN_PROGRESS = "IN_PROGRESS"
     COMPLETED = "COMPLETED"
     FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
 
 
 class TemplateBase(BaseModel):
@@ -3,7 +3,7 @@ from typing import Optional, Tuple
 from openai import OpenAI
 from portkey_ai import PORTKEY_GATEWAY_URL, createHeaders
 
-from app.config import ENV, OPENAI_API_KEY, PORTKEY_API_KEY, XAI_API_KEY
+from app.config import ENV, FAKE_LLM_URL, OPENAI_API_KEY, PORTKEY_API_KEY, XAI_API_KEY
 
 
 def get_headers(model: str | None = None) -> Tuple[str, Optional[str]]:
@@ -24,4 +24,13 @@ def get_headers(model: str | None = None) -> Tuple[str, Optional[str]]:
 def get_openai_client(model: str | None = None):
     headers = get_headers(model)
 
+    if FAKE_LLM_URL:
+        # Target the local fake LLM server. The Portkey headers are still sent so that the
+        # server can forward them upstream when it runs in record mode.
+        return OpenAI(
+            base_url=FAKE_LLM_URL,
+            api_key=OPENAI_API_KEY or "fake-llm",
+            default_headers=headers,
+        )
+
     return OpenAI(base_url=PORTKEY_GATEWAY_URL, default_headers=headers)
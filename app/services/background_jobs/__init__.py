@@ -1,9 +1,18 @@
 import logging
 import os
-from typing import Any, Callable, Dict, Optional
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
 
 from redis import Redis
+from redis.exceptions import LockError
 from rq import Queue
+from rq.exceptions import NoSuchJobError
+from rq.job import Job, JobStatus
+
+from app.constants.metrics import Constants
+from app.metrics.statsd_client import statsd
+from app.services.background_jobs.job_classes import lane_for
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -20,6 +29,86 @@ high_queue = Queue("high", connection=redis_conn)
 default_queue = Queue("default", connection=redis_conn)
 low_queue = Queue("low", connection=redis_conn)
 
+# A lock expires on its own after LOCK_TIMEOUT_SECONDS, in case its holder dies
+LOCK_TIMEOUT_SECONDS = 30
+LOCK_WAIT_SECONDS = 10
+# Idempotency keys outlive their job, whose status decides whether it is a duplicate
+JOB_KEY_TTL_SECONDS = 7 * 24 * 3600
+ACTIVE_JOB_STATUSES = (
+    JobStatus.QUEUED,
+    JobStatus.STARTED,
+    JobStatus.DEFERRED,
+    JobStatus.SCHEDULED,
+)
+PENDING_JOB_STATUSES = (JobStatus.QUEUED, JobStatus.DEFERRED, JobStatus.SCHEDULED)
+
+
+class JobLockTimeoutError(RuntimeError):
+    pass
+
+
+@contextmanager
+def job_lock(job_type: str, key: Any) -> Iterator[None]:
+    """Hold the Redis lock of one job type and book, template or storyboard.
+
+    Serialises check-then-enqueue sequences across API processes. Contention, waits and
+    timeouts are reported to statsd, tagged with the job type.
+    """
+    tags = {Constants.Tag.LOCK: job_type}
+    lock = redis_conn.lock(f"job_lock:{job_type}:{key}", timeout=LOCK_TIMEOUT_SECONDS)
+    if not lock.acquire(blocking=False):
+        statsd.increment(
+            Constants.Metric.JOB_LOCK_CONTENDED,
+            Constants.Metric.INCREMENT_COUNT,
+            Constants.Metric.HUNDRED_SAMPLING_RATE,
+            tags,
+        )
+        start = time.monotonic()
+        acquired = lock.acquire(blocking_timeout=LOCK_WAIT_SECONDS)
+        statsd.timing(
+            Constants.Metric.JOB_LOCK_WAIT,
+            (time.monotonic() - start) * 1000,
+            Constants.Metric.HUNDRED_SAMPLING_RATE,
+            tags,
+        )
+        if not acquired:
+            statsd.increment(
+                Constants.Metric.JOB_LOCK_TIMEOUT,
+                Constants.Metric.INCREMENT_COUNT,
+                Constants.Metric.HUNDRED_SAMPLING_RATE,
+                tags,
+            )
+            raise JobLockTimeoutError(
+                f"Timed out after {LOCK_WAIT_SECONDS}s waiting for the {job_type} lock of {key}"
+            )
+    statsd.increment(
+        Constants.Metric.JOB_LOCK_ACQUIRED,
+        Constants.Metric.INCREMENT_COUNT,
+        Constants.Metric.HUNDRED_SAMPLING_RATE,
+        tags,
+    )
+    try:
+        yield
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            logger.warning(f"The {job_type} lock of {key} expired before it was released")
+
+
+def active_job(
+    func: Callable, idempotency_key: Any, statuses: Tuple[JobStatus, ...] = ACTIVE_JOB_STATUSES
+) -> Optional[Job]:
+    # The job last enqueued with this key, if it has not finished, failed or been cancelled
+    job_id = redis_conn.get(f"job_key:{func.__name__}:{idempotency_key}")
+    if not job_id:
+        return None
+    try:
+        job = Job.fetch(job_id.decode(), connection=redis_conn)
+    except NoSuchJobError:
+        return None
+    return job if job.get_status() in statuses else None
+
 
 def enqueue_job(
     func: Callable,
@@ -27,8 +116,84 @@ def enqueue_job(
     priority: str = "default",
     job_timeout: int = 3600,
     result_ttl: int = 86400,
+    idempotency_key: Any = None,
+    dedupe_started: bool = True,
+    job_class: Optional[str] = None,
+    for_user: Any = None,
     **kwargs: Any,
 ):
+    """Enqueue func on the queue of the given priority.
+
+    With a job class (see job_classes.py) the job goes to the lane of that class for the user
+    given as for_user instead, so that the class's workers share their time between users.
+
+    With an idempotency key, usually the id of the book, template or storyboard the job works
+    on, at most one job per function and key is active: a duplicate submission returns the
+    job that is already queued or running instead of enqueueing another. With
+    dedupe_started=False only a job that has not started yet counts, for jobs that read their
+    input when they start and would miss changes made while they run.
+    """
+    if idempotency_key is None:
+        return _enqueue(
+            func,
+            *args,
+            priority=priority,
+            job_timeout=job_timeout,
+            result_ttl=result_ttl,
+            job_class=job_class,
+            for_user=for_user,
+            **kwargs,
+        )
+
+    with job_lock(func.__name__, idempotency_key):
+        existing = active_job(
+            func,
+            idempotency_key,
+            ACTIVE_JOB_STATUSES if dedupe_started else PENDING_JOB_STATUSES,
+        )
+        if existing:
+            logger.info(
+                f"Not enqueueing {func.__name__} for {idempotency_key}, "
+                f"job {existing.id} is already {existing.get_status()}"
+            )
+            statsd.increment(
+                Constants.Metric.JOB_ENQUEUE_DUPLICATE,
+                Constants.Metric.INCREMENT_COUNT,
+                Constants.Metric.HUNDRED_SAMPLING_RATE,
+                {Constants.Tag.LOCK: func.__name__},
+            )
+            return existing
+        job = _enqueue(
+            func,
+            *args,
+            priority=priority,
+            job_timeout=job_timeout,
+            result_ttl=result_ttl,
+            job_class=job_class,
+            for_user=for_user,
+            **kwargs,
+        )
+        redis_conn.set(f"job_key:{func.__name__}:{idempotency_key}", job.id, ex=JOB_KEY_TTL_SECONDS)
+        return job
+
+
+def _enqueue(
+    func: Callable,
+    *args: Any,
+    priority: str,
+    job_timeout: int,
+    result_ttl: int,
+    job_class: Optional[str],
+    for_user: Any,
+    **kwargs: Any,
+):
+    if job_class:
+        queue_name = lane_for(job_class, for_user)
+        logger.info(f"Enqueueing job: {func.__name__} on {queue_name}")
+        return Queue(queue_name, connection=redis_conn).enqueue(
+            func, *args, job_timeout=job_timeout, result_ttl=result_ttl, **kwargs
+        )
+
     logger.info(f"Enqueueing job: {func.__name__} with priority {priority}")
 
     if priority == "high":
@@ -46,8 +211,6 @@ def enqueue_job(
 
 
 def get_job(job_id: str):
-    from rq.job import Job
-
     try:
         return Job.fetch(job_id, connection=redis_conn)
     except Exception as e:
@@ -0,0 +1,219 @@
+import asyncio
+import inspect
+import logging
+import signal
+import sys
+import time
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+from rq import Queue
+from rq.exceptions import DequeueTimeout
+from rq.job import Job
+from rq.timeouts import JobTimeoutException
+from rq.utils import utcnow
+from rq.worker import WorkerStatus
+
+from app.services.background_jobs.fair_worker import FairWorker
+from app.services.template_generator.template_manager import LLM_THREADS, install_llm_executor
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncWorker(FairWorker):
+    """RQ worker that runs coroutine jobs concurrently on one event loop.
+
+    The stock worker forks a work horse per job and so runs one job at a time per process,
+    while the template and storyboard jobs spend nearly all their time waiting for LLM calls.
+    This worker keeps up to ``concurrency`` jobs in flight on one loop and runs plain functions
+    in threads. Registries, results, dependents and failures are handled by RQ's own Worker
+    methods, so jobs behave as they do on the stock worker, except that ``get_current_job`` is
+    not available and a timed-out plain function cannot be interrupted.
+
+    SIGTERM or SIGINT stop dequeuing and wait up to ``shutdown_timeout`` seconds for the running
+    jobs. Jobs still running then are cancelled and put back at the front of their queue,
+    without failing them or releasing their dependents; the template pipeline resumes them from
+    its checkpoints. A second signal cancels them at once. The loop waits for LLM calls that are
+    already in flight before the process exits.
+    """
+
+    DEQUEUE_TIMEOUT_SECONDS = 5
+
+    def __init__(self, queues: List[Queue], concurrency: int, shutdown_timeout: float, **kwargs):
+        super().__init__(queues, **kwargs)
+        self.concurrency = concurrency
+        self.shutdown_timeout = shutdown_timeout
+        self.running: Dict[asyncio.Task, Job] = {}
+        self.stop_requested: Optional[asyncio.Event] = None
+
+    def work(self, *args, **kwargs) -> bool:
+        # Replaces the fork-per-job loop of Worker.work
+        asyncio.run(self.run())
+        return True
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        # Jobs share the loop's default executor for their LLM calls
+        install_llm_executor(LLM_THREADS * self.concurrency)
+        self.stop_requested = asyncio.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, self.request_stop, signum)
+
+        self.register_birth()
+        self.set_state(WorkerStatus.IDLE)
+        logger.info(
+            f"Async worker {self.name} listening on {', '.join(self.queue_names())} "
+            f"with {self.concurrency} job slots"
+        )
+        heartbeats = asyncio.create_task(self.maintain_heartbeats())
+        connection_wait_time = 1.0
+        try:
+            while not self.stop_requested.is_set():
+                if len(self.running) >= self.concurrency:
+                    stop = asyncio.create_task(self.stop_requested.wait())
+                    await asyncio.wait([stop, *self.running], return_when=asyncio.FIRST_COMPLETED)
+                    stop.cancel()
+                    continue
+                try:
+                    result = await asyncio.to_thread(self.dequeue)
+                except RedisConnectionError as e:
+                    logger.error(
+                        f"Could not connect to Redis, retrying in {connection_wait_time}s: {e}"
+                    )
+                    await asyncio.sleep(connection_wait_time)
+                    connection_wait_time = min(connection_wait_time * 2, 60)
+                    continue
+                connection_wait_time = 1.0
+                if result is None:
+                    continue
+                job, queue = result
+                self.reorder_queues(queue)
+                if self.stop_requested.is_set():
+                    # Popped while the shutdown started
+                    await asyncio.to_thread(self.requeue_interrupted, job, queue)
+                    break
+                task = asyncio.create_task(self.perform(job, queue), name=f"rq-job-{job.id}")
+                self.running[task] = job
+                task.add_done_callback(self.job_done)
+                self.set_state(WorkerStatus.BUSY)
+        finally:
+            await self.drain()
+            heartbeats.cancel()
+            self.register_death()
+            logger.info(f"Async worker {self.name} stopped")
+
+    def job_done(self, task: asyncio.Task) -> None:
+        self.running.pop(task, None)
+        if not self.running:
+            self.set_state(WorkerStatus.IDLE)
+
+    def request_stop(self, signum: int) -> None:
+        if self.stop_requested.is_set():
+            logger.warning(f"Cancelling {len(self.running)} running jobs")
+            for task in self.running:
+                task.cancel()
+            return
+        logger.info(
+            f"Received {signal.Signals(signum).name}, waiting up to "
+            f"{self.shutdown_timeout:.0f}s for {len(self.running)} running jobs"
+        )
+        self.stop_requested.set()
+
+    async def drain(self) -> None:
+        if not self.running:
+            return
+        _, pending = await asyncio.wait(list(self.running), timeout=self.shutdown_timeout)
+        if pending:
+            logger.warning(f"Requeueing {len(pending)} jobs still running at shutdown")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def dequeue(self) -> Optional[Tuple[Job, Queue]]:
+        # Blocks for up to DEQUEUE_TIMEOUT_SECONDS, so it runs in a thread
+        self.heartbeat()
+        if self.should_run_maintenance_tasks:
+            self.run_maintenance_tasks()
+        try:
+            return self.queue_class.dequeue_any(
+                self._ordered_queues,
+                self.DEQUEUE_TIMEOUT_SECONDS,
+                connection=self.connection,
+                job_class=self.job_class,
+                serializer=self.serializer,
+            )
+        except DequeueTimeout:
+            return None
+
+    async def maintain_heartbeats(self) -> None:
+        # Keeps the worker and its running jobs out of RQ's abandoned-job cleanup
+        while True:
+            await asyncio.sleep(self.job_monitoring_interval)
+            try:
+                await asyncio.to_thread(self.send_heartbeats, list(self.running.values()))
+            except RedisConnectionError as e:
+                logger.error(f"Could not send worker heartbeat: {e}")
+
+    def send_heartbeats(self, jobs: List[Job]) -> None:
+        with self.connection.pipeline() as pipeline:
+            self.heartbeat(self.job_monitoring_interval + 60, pipeline=pipeline)
+            for job in jobs:
+                job.heartbeat(utcnow(), self.get_heartbeat_ttl(job), pipeline=pipeline, xx=True)
+            pipeline.execute()
+
+    async def perform(self, job: Job, queue: Queue) -> None:
+        started_job_registry = queue.started_job_registry
+        await asyncio.to_thread(self.prepare_job_execution, job, len(self.queues) == 1)
+        job.started_at = utcnow()
+        logger.info(f"{queue.name}: {job.func_name} ({job.id}) started")
+        start = time.monotonic()
+        try:
+            result = await self.call(job)
+        except asyncio.CancelledError:
+            await asyncio.to_thread(self.requeue_interrupted, job, queue)
+            raise
+        except Exception:
+            job.ended_at = utcnow()
+            exc_info = sys.exc_info()
+            await asyncio.to_thread(
+                self.handle_job_failure,
+                job=job,
+                queue=queue,
+                started_job_registry=started_job_registry,
+                exc_string="".join(traceback.format_exception(*exc_info)),
+            )
+            self.handle_exception(job, *exc_info)
+            return
+
+        job.ended_at = utcnow()
+        job._result = result
+        await asyncio.to_thread(
+            self.handle_job_success,
+            job=job,
+            queue=queue,
+            started_job_registry=started_job_registry,
+        )
+        logger.info(
+            f"{queue.name}: {job.func_name} ({job.id}) OK in {time.monotonic() - start:.1f}s"
+        )
+
+    async def call(self, job: Job) -> Any:
+        # Plain functions run in a thread, which a timeout cannot interrupt
+        if inspect.iscoroutinefunction(job.func):
+            call = job.func(*job.args, **job.kwargs)
+        else:
+            call = asyncio.to_thread(job.func, *job.args, **job.kwargs)
+        timeout = job.timeout or self.queue_class.DEFAULT_TIMEOUT
+        try:
+            return await asyncio.wait_for(call, timeout if timeout > 0 else None)
+        except asyncio.TimeoutError:
+            raise JobTimeoutException(f"Task exceeded maximum timeout value ({timeout} seconds)")
+
+    def requeue_interrupted(self, job: Job, queue: Queue) -> None:
+        logger.info(f"Requeueing {job.func_name} ({job.id}) at the front of {queue.name}")
+        with self.connection.pipeline() as pipeline:
+            # enqueue_job switches the pipeline to MULTI, so it must queue the first command
+            queue.enqueue_job(job, pipeline=pipeline, at_front=True)
+            queue.started_job_registry.remove(job, pipeline=pipeline)
+            pipeline.execute()
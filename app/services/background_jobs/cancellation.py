@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Optional, TypeVar
+from weakref import WeakKeyDictionary
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from app.constants.metrics import Constants
+from app.metrics.statsd_client import statsd
+from app.services.background_jobs import redis_conn
+from app.services.background_jobs.progress import STATUS_COMPLETED, JobProgress
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class JobCancelledError(Exception):
+    pass
+
+
+class CancellationToken:
+    """Cancellation request for a running template or storyboard job, kept in Redis.
+
+    The API sets the flag and the job watches it while it runs: as soon as it appears the job's
+    task is cancelled, which stops every fan-out from issuing further LLM calls and stops waiting
+    for the calls in flight, whose results are dropped. finally blocks still run, so the items
+    that completed are checkpointed and a restarted job skips them.
+    """
+
+    TTL_SECONDS = 24 * 3600
+    POLL_SECONDS = 2.0
+    RETRY_AFTER_SECONDS = 30.0
+    # Per connection, as in JobProgress
+    unavailable_until: "WeakKeyDictionary[Redis, float]" = WeakKeyDictionary()
+
+    def __init__(self, kind: str, job_id: int, connection: Optional[Redis] = None):
+        self.kind = kind
+        self.job_id = job_id
+        self.key = f"job_cancel:{kind}:{job_id}"
+        self.connection = connection or redis_conn
+        self.cancelled = False
+
+    def request(self) -> None:
+        self.connection.set(self.key, int(time.time()), ex=self.TTL_SECONDS)
+
+    def clear(self) -> None:
+        self.connection.delete(self.key)
+
+    def is_requested(self) -> bool:
+        if time.monotonic() < CancellationToken.unavailable_until.get(self.connection, 0):
+            return False
+        try:
+            return bool(self.connection.exists(self.key))
+        except RedisError as e:
+            # An unreachable Redis must neither stop the job nor stall it on every poll
+            CancellationToken.unavailable_until[self.connection] = (
+                time.monotonic() + self.RETRY_AFTER_SECONDS
+            )
+            logger.warning(
+                f"Could not check {self.key}, retrying in {self.RETRY_AFTER_SECONDS:.0f}s: {e}"
+            )
+            return False
+
+    async def run(self, awaitable: Awaitable[T]) -> T:
+        """Await awaitable until it completes or the job is cancelled.
+
+        Raises JobCancelledError once the cancelled awaitable has unwound, or right away if
+        cancellation was requested before the job started.
+        """
+        if self.is_requested():
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            self.cancelled = True
+            raise JobCancelledError(f"{self.kind} {self.job_id} was cancelled before it started")
+
+        task = asyncio.ensure_future(awaitable)
+        watcher = asyncio.create_task(self.watch(task))
+        try:
+            return await task
+        except asyncio.CancelledError:
+            # Only our own cancellation becomes an error, a worker shutdown propagates
+            if not self.cancelled:
+                raise
+            raise JobCancelledError(f"{self.kind} {self.job_id} was cancelled") from None
+        finally:
+            watcher.cancel()
+
+    async def watch(self, task: asyncio.Future) -> None:
+        while not task.done():
+            await asyncio.sleep(self.POLL_SECONDS)
+            if self.is_requested():
+                logger.info(f"Cancelling {self.kind} {self.job_id} on request")
+                self.cancelled = True
+                task.cancel()
+                return
+
+
+def report_cancelled(progress: JobProgress, kind: str) -> None:
+    """Send the LLM work a cancellation avoided to statsd.
+
+    The items left in the stages that had started were never sent to the LLM, and their ETA is
+    the LLM time saved. Stages that had not started are not counted, so both are lower bounds.
+    """
+    snapshot = progress.get()
+    avoided_items = sum(
+        max(stage["total"] - stage["done"], 0)
+        for stage in snapshot["stages"].values()
+        if stage["status"] != STATUS_COMPLETED
+    )
+    tags = {Constants.Tag.KIND: kind}
+    statsd.increment(
+        Constants.Metric.JOB_CANCELLED,
+        Constants.Metric.INCREMENT_COUNT,
+        Constants.Metric.HUNDRED_SAMPLING_RATE,
+        tags,
+    )
+    statsd.increment(
+        Constants.Metric.JOB_CANCEL_AVOIDED_ITEMS,
+        avoided_items,
+        Constants.Metric.HUNDRED_SAMPLING_RATE,
+        tags,
+    )
+    if snapshot["eta_seconds"]:
+        statsd.timing(
+            Constants.Metric.JOB_CANCEL_AVOIDED_TIME,
+            snapshot["eta_seconds"] * 1000,
+            Constants.Metric.HUNDRED_SAMPLING_RATE,
+            tags,
+        )
+    logger.info(
+        f"Cancelled {progress.key}, avoiding {avoided_items} items and "
+        f"{snapshot['eta_seconds'] or 0:.0f}s of LLM calls"
+    )
@@ -0,0 +1,83 @@
+import time
+from typing import Dict, List, Optional
+
+from rq import Queue, Worker
+from rq.job import Job
+from rq.utils import utcnow
+
+from app.config import JOB_CLASSES, QUEUE_METRICS
+from app.constants.metrics import Constants
+from app.metrics.statsd_client import statsd
+from app.services.background_jobs.job_classes import class_of, parse_weights
+from app.services.background_jobs.metrics import queue_stats, record_job_outcome, send_queue_metrics
+
+
+class FairWorker(Worker):
+    """RQ worker that shares its dequeues between job classes and between the users in them.
+
+    The queues are grouped by job class. After each job the lane it came from moves to the back
+    of its class, so users hashed to different lanes take turns instead of being served in
+    arrival order. Classes are ordered by smooth weighted round robin over their weights, charged
+    only when they are served, so an idle class leaves its share to the others. Wait times, job
+    outcomes and queue depths per class are sent to statsd for autoscaling.
+    """
+
+    def __init__(
+        self, queues: List[Queue], *args, weights: Optional[Dict[str, float]] = None, **kwargs
+    ):
+        super().__init__(queues, *args, **kwargs)
+        weights = weights or parse_weights(JOB_CLASSES.WEIGHTS)
+        self.lanes: Dict[str, List[Queue]] = {}
+        for queue in self.queues:
+            self.lanes.setdefault(class_of(queue.name), []).append(queue)
+        self.weights = {job_class: weights.get(job_class, 1.0) for job_class in self.lanes}
+        self.credit = dict.fromkeys(self.lanes, 0.0)
+        self.metrics_sent_at = 0.0
+        self.order_queues()
+
+    def order_queues(self) -> None:
+        # sorted() is stable, so classes with equal credit keep the order they were given in
+        classes = sorted(self.lanes, key=lambda job_class: -self.credit[job_class])
+        self._ordered_queues = [queue for job_class in classes for queue in self.lanes[job_class]]
+
+    def reorder_queues(self, reference_queue: Queue) -> None:
+        job_class = class_of(reference_queue.name)
+        lanes = self.lanes[job_class]
+        position = lanes.index(reference_queue)
+        self.lanes[job_class] = lanes[position + 1 :] + lanes[: position + 1]
+
+        # Credit is capped so that a class idle for long does not monopolise the worker later
+        total = sum(self.weights.values())
+        for other in self.credit:
+            self.credit[other] = min(self.credit[other] + self.weights[other], total)
+        self.credit[job_class] -= total
+        self.order_queues()
+
+    def prepare_job_execution(self, job: Job, *args, **kwargs) -> None:
+        super().prepare_job_execution(job, *args, **kwargs)
+        if job.enqueued_at:
+            statsd.timing(
+                Constants.Metric.JOB_WAIT,
+                (utcnow() - job.enqueued_at).total_seconds() * 1000,
+                Constants.Metric.HUNDRED_SAMPLING_RATE,
+                {Constants.Tag.JOB_CLASS: class_of(job.origin)},
+            )
+
+    def handle_job_success(self, job: Job, queue: Queue, started_job_registry) -> None:
+        super().handle_job_success(job, queue, started_job_registry)
+        record_job_outcome(self.connection, job, failed=False)
+
+    def handle_job_failure(self, job: Job, queue: Queue, *args, **kwargs) -> None:
+        super().handle_job_failure(job, queue, *args, **kwargs)
+        record_job_outcome(self.connection, job, failed=True)
+
+    def heartbeat(self, *args, **kwargs) -> None:
+        super().heartbeat(*args, **kwargs)
+        if not QUEUE_METRICS.ENABLED:
+            return
+        if time.monotonic() - self.metrics_sent_at >= QUEUE_METRICS.INTERVAL_SECONDS:
+            self.metrics_sent_at = time.monotonic()
+            # Only this worker's queues; the API exporter also counts workers per class
+            send_queue_metrics(
+                {"classes": queue_stats(self.connection, [queue.name for queue in self.queues])}
+            )
@@ -0,0 +1,42 @@
+import zlib
+from typing import Any, Dict, List
+
+from app.config import JOB_CLASSES
+
+# Job classes, each with its own queues so that it can get its own worker pool
+INTERACTIVE = "interactive"  # short jobs a user is waiting on
+STORYBOARD = "storyboard"
+TEMPLATE = "template"
+MAINTENANCE = "maintenance"  # refreshes nobody is waiting on
+ALL_CLASSES = (INTERACTIVE, STORYBOARD, TEMPLATE, MAINTENANCE)
+
+# Queues of enqueue_job's priority argument, which every worker keeps draining
+LEGACY_QUEUES = ("high", "default", "low")
+
+
+def class_queue_names(job_class: str) -> List[str]:
+    if job_class not in ALL_CLASSES:
+        raise ValueError(f"Unknown job class {job_class}, expected one of {ALL_CLASSES}")
+    return [f"{job_class}.{lane}" for lane in range(JOB_CLASSES.LANES)]
+
+
+def lane_for(job_class: str, user_id: Any) -> str:
+    # crc32 rather than hash(), which differs between processes
+    lanes = class_queue_names(job_class)
+    if user_id is None:
+        return lanes[0]
+    return lanes[zlib.crc32(str(user_id).encode()) % len(lanes)]
+
+
+def class_of(queue_name: str) -> str:
+    job_class, _, lane = queue_name.rpartition(".")
+    return job_class if job_class and lane.isdigit() else queue_name
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    weights = {}
+    for item in spec.split(","):
+        job_class, _, weight = item.partition("=")
+        if job_class.strip():
+            weights[job_class.strip()] = float(weight)
+    return weights
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import time
+import traceback
+from typing import Any, Dict, List, Optional
+
+from redis import Redis
+from redis.exceptions import RedisError
+from rq import Queue, Worker
+from rq.job import Job
+from rq.utils import utcnow, utcparse
+
+from app.config import QUEUE_METRICS
+from app.constants.metrics import Constants
+from app.metrics.statsd_client import statsd
+from app.services.background_jobs import redis_conn
+from app.services.background_jobs.job_classes import (
+    ALL_CLASSES,
+    LEGACY_QUEUES,
+    class_of,
+    class_queue_names,
+)
+
+logger = logging.getLogger(__name__)
+
+# Job outcomes are counted in hourly buckets, the summary covers the last day of them
+OUTCOME_BUCKET_SECONDS = 3600
+OUTCOME_BUCKETS = 24
+
+# Job registries counted per job class, by their Queue attribute
+REGISTRIES = {
+    "started": "started_job_registry",
+    "deferred": "deferred_job_registry",
+    "scheduled": "scheduled_job_registry",
+    "failed": "failed_job_registry",
+}
+
+
+def all_queue_names() -> List[str]:
+    return [name for job_class in ALL_CLASSES for name in class_queue_names(job_class)] + list(
+        LEGACY_QUEUES
+    )
+
+
+def queue_stats(connection: Redis, queue_names: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Depth, registry sizes and age of the oldest queued job of each job class.
+
+    Takes three round trips however many queues there are.
+    """
+    queues = [Queue(name, connection=connection) for name in queue_names]
+    with connection.pipeline() as pipe:
+        for queue in queues:
+            pipe.llen(queue.key)
+            pipe.lindex(queue.key, 0)
+            for registry in REGISTRIES.values():
+                pipe.zcard(getattr(queue, registry).key)
+        replies = iter(pipe.execute())
+
+    stats: Dict[str, Dict[str, Any]] = {}
+    heads = []
+    for queue in queues:
+        job_class = class_of(queue.name)
+        class_stats = stats.setdefault(
+            job_class, {"depth": 0, "oldest_age_seconds": None, **dict.fromkeys(REGISTRIES, 0)}
+        )
+        class_stats["depth"] += next(replies)
+        head = next(replies)
+        for name in REGISTRIES:
+            class_stats[name] += next(replies)
+        if head:
+            heads.append((job_class, head.decode()))
+
+    # Queues are FIFO, so the job at the head of a lane is its oldest
+    with connection.pipeline() as pipe:
+        for _, job_id in heads:
+            pipe.hget(Job.redis_job_namespace_prefix + job_id, "enqueued_at")
+        enqueued = pipe.execute()
+    now = utcnow()
+    for (job_class, _), enqueued_at in zip(heads, enqueued):
+        if not enqueued_at:
+            continue
+        age = (now - utcparse(enqueued_at.decode())).total_seconds()
+        oldest = stats[job_class]["oldest_age_seconds"]
+        stats[job_class]["oldest_age_seconds"] = max(age, oldest or 0.0)
+    return stats
+
+
+def worker_stats(connection: Redis) -> Dict[str, Dict[str, int]]:
+    # A worker counts once for every job class it serves
+    stats: Dict[str, Dict[str, int]] = {}
+    for worker in Worker.all(connection=connection):
+        busy = worker.get_state() == "busy"
+        for job_class in {class_of(name) for name in worker.queue_names()}:
+            class_stats = stats.setdefault(job_class, {"workers": 0, "busy_workers": 0})
+            class_stats["workers"] += 1
+            class_stats["busy_workers"] += busy
+    return stats
+
+
+def record_job_outcome(connection: Redis, job: Job, failed: bool) -> None:
+    """Count a finished or failed job and its run time, per task function."""
+    task = job.func_name.rpartition(".")[2]
+    tags = {Constants.Tag.TASK: task, Constants.Tag.JOB_CLASS: class_of(job.origin)}
+    statsd.increment(
+        Constants.Metric.JOB_FAILED if failed else Constants.Metric.JOB_SUCCEEDED,
+        Constants.Metric.INCREMENT_COUNT,
+        Constants.Metric.HUNDRED_SAMPLING_RATE,
+        tags,
+    )
+    duration = None
+    if job.started_at:
+        duration = ((job.ended_at or utcnow()) - job.started_at).total_seconds()
+        statsd.timing(
+            Constants.Metric.JOB_DURATION,
+            duration * 1000,
+            Constants.Metric.HUNDRED_SAMPLING_RATE,
+            tags,
+        )
+
+    key = f"job_outcomes:{int(time.time() // OUTCOME_BUCKET_SECONDS)}"
+    with connection.pipeline() as pipe:
+        pipe.hincrby(key, f"{task}.{'failed' if failed else 'succeeded'}", 1)
+        if duration is not None:
+            pipe.hincrby(key, f"{task}.timed", 1)
+            pipe.hincrbyfloat(key, f"{task}.duration_seconds", duration)
+        pipe.expire(key, OUTCOME_BUCKET_SECONDS * (OUTCOME_BUCKETS + 1))
+        pipe.execute()
+
+
+def task_stats(connection: Redis) -> Dict[str, Dict[str, Any]]:
+    bucket = int(time.time() // OUTCOME_BUCKET_SECONDS)
+    with connection.pipeline() as pipe:
+        for offset in range(OUTCOME_BUCKETS):
+            pipe.hgetall(f"job_outcomes:{bucket - offset}")
+        buckets = pipe.execute()
+
+    totals: Dict[str, Dict[str, float]] = {}
+    for fields in buckets:
+        for field, value in fields.items():
+            task, _, name = field.decode().rpartition(".")
+            task_totals = totals.setdefault(
+                task, {"succeeded": 0, "failed": 0, "timed": 0, "duration_seconds": 0.0}
+            )
+            task_totals[name] += float(value)
+
+    stats = {}
+    for task, task_totals in sorted(totals.items()):
+        finished = task_totals["succeeded"] + task_totals["failed"]
+        stats[task] = {
+            "succeeded": int(task_totals["succeeded"]),
+            "failed": int(task_totals["failed"]),
+            "failure_rate": round(task_totals["failed"] / finished, 3) if finished else None,
+            "avg_duration_seconds": (
+                round(task_totals["duration_seconds"] / task_totals["timed"], 2)
+                if task_totals["timed"]
+                else None
+            ),
+        }
+    return stats
+
+
+def collect_queue_metrics(connection: Optional[Redis] = None) -> Dict[str, Any]:
+    """Backlog, wait, workers and recent job outcomes of every job class and task function."""
+    connection = connection or redis_conn
+    classes = queue_stats(connection, all_queue_names())
+    for job_class, class_workers in worker_stats(connection).items():
+        classes.setdefault(job_class, {}).update(class_workers)
+    for class_stats in classes.values():
+        class_stats.setdefault("workers", 0)
+        class_stats.setdefault("busy_workers", 0)
+    return {
+        "classes": classes,
+        "tasks": task_stats(connection),
+        "task_window_hours": OUTCOME_BUCKETS * OUTCOME_BUCKET_SECONDS // 3600,
+    }
+
+
+def send_queue_metrics(metrics: Dict[str, Any]) -> None:
+    # Sends the fields the summary has, a worker's own summary has no worker counts
+    gauges = (
+        ("depth", Constants.Metric.JOB_QUEUE_DEPTH),
+        ("oldest_age_seconds", Constants.Metric.JOB_QUEUE_OLDEST_AGE),
+        ("started", Constants.Metric.JOB_QUEUE_STARTED),
+        ("deferred", Constants.Metric.JOB_QUEUE_DEFERRED),
+        ("failed", Constants.Metric.JOB_QUEUE_FAILED),
+        ("workers", Constants.Metric.JOB_WORKERS),
+        ("busy_workers", Constants.Metric.JOB_WORKERS_BUSY),
+    )
+    for job_class, class_stats in metrics["classes"].items():
+        tags = {Constants.Tag.JOB_CLASS: job_class}
+        for field, stat in gauges:
+            if field not in class_stats:
+                continue
+            statsd.gauge(
+                stat, class_stats.get(field) or 0, Constants.Metric.HUNDRED_SAMPLING_RATE, tags
+            )
+
+
+class QueueMetricsExporter:
+    """Sends the queue gauges to statsd every interval_seconds from the API process.
+
+    Workers send them too while they run, but the API keeps reporting the backlog when a pool
+    has been scaled to zero, which is when the autoscaler needs it most. Each exporter reads
+    every queue, so it only runs where QUEUE_METRICS.API_EXPORTER is set, in one API process.
+    """
+
+    def __init__(self, interval_seconds: float):
+        self.interval = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(
+            self._export(), name="queue-metrics-exporter"
+        )
+        logger.info(f"Queue metrics exporter started | interval {self.interval:.0f}s")
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+
+    async def _export(self) -> None:
+        while True:
+            try:
+                send_queue_metrics(await asyncio.to_thread(collect_queue_metrics))
+            except RedisError as e:
+                logger.warning(f"Could not collect queue metrics: {e}")
+            except Exception as e:
+                # Anything else would end the task silently and the gauges with it
+                logger.error(f"Queue metrics export failed: {e}")
+                logger.error(traceback.format_exc())
+            await asyncio.sleep(self.interval)
+
+
+queue_metrics_exporter: Optional[QueueMetricsExporter] = None
+
+
+async def start_queue_metrics_exporter():
+    global queue_metrics_exporter
+    if not (QUEUE_METRICS.ENABLED and QUEUE_METRICS.API_EXPORTER) or queue_metrics_exporter:
+        return
+    queue_metrics_exporter = QueueMetricsExporter(QUEUE_METRICS.INTERVAL_SECONDS)
+    queue_metrics_exporter.start()
+
+
+async def stop_queue_metrics_exporter():
+    global queue_metrics_exporter
+    if queue_metrics_exporter is not None:
+        queue_metrics_exporter.stop()
+        queue_metrics_exporter = None
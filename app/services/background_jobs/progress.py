@@ -0,0 +1,300 @@
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+from weakref import WeakKeyDictionary
+
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+from redis.client import Pipeline
+from redis.exceptions import RedisError
+
+from app.services.background_jobs import redis_conn, redis_url
+
+logger = logging.getLogger(__name__)
+
+# Counters written by the per-batch template jobs, so that progress is visible across workers
+SUMMARIZED = "summarized_batches"
+SUMMARY_FAILED = "summary_failed_batches"
+EXTRACTED = "extracted_batches"
+EXTRACTION_FAILED = "extraction_failed_batches"
+COUNTERS = ("total_batches", SUMMARIZED, SUMMARY_FAILED, EXTRACTED, EXTRACTION_FAILED)
+
+# Values of the "phase" field
+PHASE_MAP = "map"
+PHASE_REDUCE = "reduce"
+PHASE_COMPLETED = "completed"
+PHASE_FAILED = "failed"
+PHASE_CANCELLED = "cancelled"
+
+
+class TemplateProgress:
+    """Progress of a fanned-out template build, kept in one Redis hash per template."""
+
+    TTL_SECONDS = 7 * 24 * 3600
+
+    def __init__(self, template_id: int, connection: Optional[Redis] = None):
+        self.key = f"template_progress:{template_id}"
+        self.connection = connection or redis_conn
+
+    def start(self, total_batches: int, extracted: int = 0) -> None:
+        now = int(time.time())
+        with self.connection.pipeline() as pipe:
+            pipe.delete(self.key)
+            pipe.hset(
+                self.key,
+                mapping={
+                    "phase": PHASE_MAP,
+                    "total_batches": total_batches,
+                    SUMMARIZED: 0,
+                    SUMMARY_FAILED: 0,
+                    EXTRACTED: extracted,
+                    EXTRACTION_FAILED: 0,
+                    "started_at": now,
+                    "updated_at": now,
+                },
+            )
+            pipe.expire(self.key, self.TTL_SECONDS)
+            pipe.execute()
+
+    def increment(self, field: str) -> None:
+        with self.connection.pipeline() as pipe:
+            pipe.hincrby(self.key, field, 1)
+            pipe.hset(self.key, "updated_at", int(time.time()))
+            pipe.execute()
+
+    def set_phase(self, phase: str) -> None:
+        self.connection.hset(self.key, mapping={"phase": phase, "updated_at": int(time.time())})
+
+    def get(self) -> Dict[str, Any]:
+        progress: Dict[str, Any] = {
+            field.decode(): value.decode()
+            for field, value in self.connection.hgetall(self.key).items()
+        }
+        for field in COUNTERS + ("started_at", "updated_at"):
+            if field in progress:
+                progress[field] = int(progress[field])
+        return progress
+
+
+# Values of the job and stage "status" fields, as in TemplateStatusEnum
+STATUS_NOT_STARTED = "NOT_STARTED"
+STATUS_IN_PROGRESS = "IN_PROGRESS"
+STATUS_COMPLETED = "COMPLETED"
+STATUS_FAILED = "FAILED"
+STATUS_CANCELLED = "CANCELLED"
+FINAL_STATUSES = (STATUS_COMPLETED, STATUS_FAILED, STATUS_CANCELLED)
+
+# Kinds of jobs that report progress
+KIND_TEMPLATE = "template"
+KIND_STORYBOARD = "storyboard"
+
+# Stages of a template build, named after their Template status columns without "_status"
+TEMPLATE_SUMMARY = "summary"
+TEMPLATE_CHARACTER_ARC = "character_arc"
+TEMPLATE_PLOT_BEATS = "plot_beats"
+TEMPLATE_CHARACTER_ARC_TEMPLATE = "character_arc_template"
+TEMPLATE_PLOT_BEAT_TEMPLATE = "plot_beat_template"
+
+# Stages of a storyboard
+STORYBOARD_CHARACTER_ARCS = "character_arcs"
+STORYBOARD_PLOT_BEATS = "plot_beats"
+
+# Stage fields are "<stage>.<field>"
+STAGE_FIELDS = ("total", "done", "failed", "start_done", "started_at", "status")
+
+
+class JobProgress:
+    """Fine-grained progress of a template or storyboard job, for live clients.
+
+    Stages count the items they have processed out of a total in one Redis hash per job, and
+    every change is announced on the job's channel, so that SSE clients are pushed snapshots
+    instead of polling the database. Counters are incremented atomically, so the per-batch jobs
+    of a fanned-out template build can all report to the same stage. Publishing never fails
+    the job: Redis errors are logged and dropped, and publishing to that connection pauses for
+    a while after one so that an unreachable Redis does not stall the pipeline on connection
+    timeouts. Final statuses are always written, clients wait for them to close their streams.
+    """
+
+    TTL_SECONDS = 7 * 24 * 3600
+    RETRY_AFTER_SECONDS = 30.0
+    # Per connection, shared by every job in the process that uses it
+    unavailable_until: "WeakKeyDictionary[Redis, float]" = WeakKeyDictionary()
+
+    def __init__(self, kind: str, job_id: int, connection: Optional[Redis] = None):
+        self.key = f"job_progress:{kind}:{job_id}"
+        self.channel = f"{self.key}:events"
+        self.connection = connection or redis_conn
+
+    def _write(self, commands: Callable[[Pipeline], None], final: bool = False) -> None:
+        if not final and time.monotonic() < JobProgress.unavailable_until.get(self.connection, 0):
+            return
+        try:
+            with self.connection.pipeline() as pipe:
+                commands(pipe)
+                pipe.hset(self.key, "updated_at", time.time())
+                pipe.expire(self.key, self.TTL_SECONDS)
+                pipe.publish(self.channel, "")
+                pipe.execute()
+        except RedisError as e:
+            JobProgress.unavailable_until[self.connection] = (
+                time.monotonic() + self.RETRY_AFTER_SECONDS
+            )
+            logger.warning(
+                f"Could not publish progress of {self.key}, pausing for "
+                f"{self.RETRY_AFTER_SECONDS:.0f}s: {e}"
+            )
+
+    def set_status(self, status: str, error: Optional[str] = None) -> None:
+        def commands(pipe: Pipeline):
+            pipe.hset(self.key, "status", status)
+            if status == STATUS_IN_PROGRESS:
+                pipe.hsetnx(self.key, "started_at", time.time())
+            if error:
+                pipe.hset(self.key, "last_error", error)
+
+        self._write(commands, final=status in FINAL_STATUSES)
+
+    def reset(self) -> None:
+        """Clear the progress a finished run left, when the job is enqueued or started again.
+
+        Its final status would otherwise end the streams of clients that subscribe before the
+        new run reports. Progress of a run that has not finished is kept.
+        """
+        try:
+            status = self.connection.hget(self.key, "status")
+            if status and status.decode() in FINAL_STATUSES:
+                self.connection.delete(self.key)
+        except RedisError as e:
+            logger.warning(f"Could not reset progress of {self.key}: {e}")
+
+    def report_error(self, error: str) -> None:
+        self._write(lambda pipe: pipe.hset(self.key, "last_error", error))
+
+    def start_stage(self, stage: str, total: int, done: int = 0) -> None:
+        # Items done before the stage (re)started do not count towards its rate
+        self._write(
+            lambda pipe: pipe.hset(
+                self.key,
+                mapping={
+                    f"{stage}.total": total,
+                    f"{stage}.done": done,
+                    f"{stage}.failed": 0,
+                    f"{stage}.start_done": done,
+                    f"{stage}.started_at": time.time(),
+                    f"{stage}.status": STATUS_IN_PROGRESS,
+                },
+            )
+        )
+
+    def advance(self, stage: str, count: int = 1, error: Optional[str] = None) -> None:
+        # A failed item is processed too, it is retried by the next run
+        def commands(pipe: Pipeline):
+            pipe.hincrby(self.key, f"{stage}.done", count)
+            if error:
+                pipe.hincrby(self.key, f"{stage}.failed", count)
+                pipe.hset(self.key, "last_error", error)
+
+        self._write(commands)
+
+    def set_stage_status(self, **statuses: str) -> None:
+        if statuses:
+            self._write(
+                lambda pipe: pipe.hset(
+                    self.key,
+                    mapping={f"{stage}.status": status for stage, status in statuses.items()},
+                )
+            )
+
+    def get(self) -> Dict[str, Any]:
+        try:
+            fields = self.connection.hgetall(self.key)
+        except RedisError as e:
+            logger.warning(f"Could not read progress of {self.key}: {e}")
+            fields = {}
+        return parse_job_progress(fields)
+
+    async def subscribe(self, heartbeat_seconds: float = 15.0) -> AsyncIterator[Dict[str, Any]]:
+        """Yield a snapshot now and after every change, until the job completes or fails.
+
+        Yields None when nothing changed for heartbeat_seconds, so that callers can keep idle
+        connections alive. Bursts of changes are coalesced into one snapshot.
+        """
+        connection = async_redis()
+        pubsub = connection.pubsub()
+        await pubsub.subscribe(self.channel)
+        try:
+            # Subscribe before the first read, so that no change is missed in between
+            changed = True
+            while True:
+                if changed:
+                    progress = parse_job_progress(await connection.hgetall(self.key))
+                    yield progress
+                    if progress.get("status") in FINAL_STATUSES:
+                        return
+                else:
+                    yield None
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=heartbeat_seconds
+                )
+                changed = message is not None
+                while message is not None:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=0)
+        finally:
+            await pubsub.reset()
+
+
+def parse_job_progress(fields: Dict[bytes, bytes]) -> Dict[str, Any]:
+    now = time.time()
+    progress: Dict[str, Any] = {"status": STATUS_NOT_STARTED, "stages": {}}
+    for raw_field, raw_value in fields.items():
+        field, value = raw_field.decode(), raw_value.decode()
+        stage, _, stage_field = field.rpartition(".")
+        if stage and stage_field in STAGE_FIELDS:
+            progress["stages"].setdefault(stage, {})[stage_field] = value
+        else:
+            progress[field] = value
+    for field in ("started_at", "updated_at"):
+        if field in progress:
+            progress[field] = float(progress[field])
+
+    etas = []
+    for stage in progress["stages"].values():
+        for field in ("total", "done", "failed", "start_done"):
+            stage[field] = int(stage.get(field, 0))
+        started_at = float(stage.pop("started_at", now))
+        start_done = stage.pop("start_done")
+        stage.setdefault("status", STATUS_NOT_STARTED)
+        # Extrapolate the rate of this run over the items that are left
+        stage["eta_seconds"] = None
+        if stage["status"] == STATUS_IN_PROGRESS and stage["done"] > start_done:
+            rate = (stage["done"] - start_done) / max(now - started_at, 1e-3)
+            stage["eta_seconds"] = round(max(stage["total"] - stage["done"], 0) / rate, 1)
+            etas.append(stage["eta_seconds"])
+    # Running stages overlap, so the job is done when the slowest one is
+    progress["eta_seconds"] = max(etas) if etas else None
+    return progress
+
+
+_async_redis: Optional[AsyncRedis] = None
+
+
+def async_redis() -> AsyncRedis:
+    # Created on first use, inside the event loop that serves the SSE requests
+    global _async_redis
+    if _async_redis is None:
+        _async_redis = AsyncRedis.from_url(redis_url)
+    return _async_redis
+
+
+async def progress_events(progress: JobProgress) -> AsyncIterator[str]:
+    # Server-sent events; a comment line keeps idle connections open through proxies
+    try:
+        async for snapshot in progress.subscribe():
+            if snapshot is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"data: {json.dumps(snapshot)}\n\n"
+    except RedisError as e:
+        logger.error(f"Progress stream of {progress.key} failed: {e}")
+        yield f"data: {json.dumps({'error': 'Progress is unavailable'})}\n\n"
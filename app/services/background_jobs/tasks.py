@@ -1,39 +1,350 @@
 import logging
+from typing import Iterable, List, Optional
 
-from app.database import get_db
-from app.services.background_jobs import enqueue_job
+from redis.exceptions import RedisError
+from rq.job import Dependency
+from sqlalchemy.orm import Session
+
+from app.config import TEMPLATE_JOBS
+from app.database import session_scope
+from app.models.enums import StoryboardStatus
+from app.repository.template_repository import TemplateRepository
+from app.schemas.schemas import TemplateStatusEnum
+from app.services.background_jobs import active_job, enqueue_job, redis_conn
+from app.services.background_jobs.cancellation import CancellationToken, JobCancelledError
+from app.services.background_jobs.job_classes import MAINTENANCE, STORYBOARD, TEMPLATE
+from app.services.background_jobs.progress import (
+    EXTRACTED,
+    EXTRACTION_FAILED,
+    KIND_STORYBOARD,
+    KIND_TEMPLATE,
+    PHASE_CANCELLED,
+    PHASE_COMPLETED,
+    PHASE_FAILED,
+    PHASE_REDUCE,
+    SUMMARIZED,
+    SUMMARY_FAILED,
+    TEMPLATE_CHARACTER_ARC,
+    TEMPLATE_SUMMARY,
+    JobProgress,
+    TemplateProgress,
+)
+from app.services.chapter_context_service import (
+    build_chapter_context_packs,
+    delete_chapter_context_packs,
+    has_storyboard,
+)
 from app.services.storyboard.character_arc_generator import CharacterArcGenerator
 from app.services.storyboard.plot_generator import PlotBeatGenerator
-from app.services.template_generator.template_manager import TemplateManager
+from app.services.template_generator.story_extractor import StoryExtractor
+from app.services.template_generator.template_manager import (
+    TemplateManager,
+    TemplateStageFailedError,
+)
 
 logger = logging.getLogger(__name__)
 
 
-async def create_template_task(book_id: int, template_id: int):
-    db = next(get_db())
-    manager = TemplateManager(book_id, db)
-    await manager.run(template_id)
+async def create_template_task(book_id: int, template_id: int, user_id: Optional[str] = None):
+    with session_scope() as db:
+        if TEMPLATE_JOBS.FAN_OUT and await fan_out_template_jobs(db, book_id, template_id, user_id):
+            return
+        manager = TemplateManager(book_id, db)
+        await manager.run(template_id)
+
+
+def add_template_creation_task_to_bg_jobs(
+    book_id: int, template_id: int, user_id: Optional[str] = None
+):
+    # Starting over withdraws an earlier cancellation
+    CancellationToken(KIND_TEMPLATE, template_id).clear()
+    JobProgress(KIND_TEMPLATE, template_id).reset()
+    return enqueue_job(
+        create_template_task,
+        book_id=book_id,
+        template_id=template_id,
+        user_id=user_id,
+        idempotency_key=template_id,
+        job_class=TEMPLATE,
+        for_user=user_id,
+    )
+
+
+async def fan_out_template_jobs(
+    db, book_id: int, template_id: int, user_id: Optional[str] = None
+) -> bool:
+    """Map-reduce mode for large books.
+
+    Each chapter batch gets a summary job and an arc extraction job that depends on it, so
+    idle workers share the LLM calls. The reduce job depends on every extraction job and runs
+    TemplateManager, which finds the summaries and batch checkpoints in place, retries any
+    batch whose job failed, then consolidates and runs the remaining stages.
+    """
+    if active_job(reduce_template_task, template_id):
+        logger.info(f"Template {template_id} is already fanned out, waiting for its reduce job")
+        return True
+
+    template_repo = TemplateRepository(db)
+    template = template_repo.get_by_id(template_id)
+    if template.character_arc_status == TemplateStatusEnum.COMPLETED:
+        return False
+
+    extractor = StoryExtractor(book_id, db, template_id)
+    await extractor.initialize()
+    if len(extractor.chapters) < TEMPLATE_JOBS.FAN_OUT_MIN_CHAPTERS:
+        return False
+    extracted = extractor.load_extracted_batches()
+    batches = [n for n in range(1, extractor.batch_count() + 1) if n not in extracted]
+    if not batches:
+        return False
+
+    TemplateProgress(template_id).start(extractor.batch_count(), extracted=len(extracted))
+    template_repo.update_status(
+        template_id,
+        summary_status=TemplateStatusEnum.IN_PROGRESS,
+        character_arc_status=TemplateStatusEnum.IN_PROGRESS,
+    )
+    summarized = sum(1 for chapter in extractor.chapters if extractor.has_current_summary(chapter))
+    extractor.progress.reset()
+    extractor.progress.set_status(TemplateStatusEnum.IN_PROGRESS.value)
+    extractor.progress.start_stage(TEMPLATE_SUMMARY, len(extractor.chapters), done=summarized)
+    extractor.progress.start_stage(
+        TEMPLATE_CHARACTER_ARC, extractor.batch_count(), done=len(extracted)
+    )
+
+    # allow_failure: a failed batch is retried by the reduce job rather than blocking it
+    extraction_jobs = []
+    for batch_num in batches:
+        summary_job = enqueue_job(
+            summarize_template_batch_task,
+            book_id=book_id,
+            template_id=template_id,
+            batch_num=batch_num,
+            idempotency_key=f"{template_id}:{batch_num}",
+            job_class=TEMPLATE,
+            for_user=user_id,
+        )
+        extraction_jobs.append(
+            enqueue_job(
+                extract_template_batch_task,
+                book_id=book_id,
+                template_id=template_id,
+                batch_num=batch_num,
+                depends_on=Dependency(jobs=[summary_job], allow_failure=True),
+                idempotency_key=f"{template_id}:{batch_num}",
+                job_class=TEMPLATE,
+                for_user=user_id,
+            )
+        )
+    enqueue_job(
+        reduce_template_task,
+        book_id=book_id,
+        template_id=template_id,
+        depends_on=Dependency(jobs=extraction_jobs, allow_failure=True),
+        idempotency_key=template_id,
+        job_class=TEMPLATE,
+        for_user=user_id,
+    )
+    logger.info(f"Fanned out template {template_id} into {len(batches)} chapter batches")
+    return True
+
+
+async def summarize_template_batch_task(book_id: int, template_id: int, batch_num: int):
+    with session_scope() as db:
+        extractor = StoryExtractor(book_id, db, template_id)
+        await extractor.initialize()
+        progress = TemplateProgress(template_id)
+        try:
+            summarized = await CancellationToken(KIND_TEMPLATE, template_id).run(
+                extractor.summarize_batch(batch_num)
+            )
+        except JobCancelledError:
+            # The reduce job marks the template cancelled
+            logger.info(f"Skipping summaries of template {template_id} batch {batch_num}")
+            return
+        finally:
+            extractor.results.flush()
+        if not summarized:
+            progress.increment(SUMMARY_FAILED)
+            raise TemplateStageFailedError(
+                f"Template {template_id} batch {batch_num} summaries failed"
+            )
+        progress.increment(SUMMARIZED)
+
+
+async def extract_template_batch_task(book_id: int, template_id: int, batch_num: int):
+    with session_scope() as db:
+        extractor = StoryExtractor(book_id, db, template_id)
+        await extractor.initialize()
+        progress = TemplateProgress(template_id)
+        if not all(
+            extractor.has_current_summary(chapter)
+            for chapter in extractor.batch_chapters(batch_num)
+        ):
+            progress.increment(EXTRACTION_FAILED)
+            raise TemplateStageFailedError(
+                f"Template {template_id} batch {batch_num} is missing summaries, skipping extraction"
+            )
+        try:
+            extracted = await CancellationToken(KIND_TEMPLATE, template_id).run(
+                extractor.extract_batch(batch_num)
+            )
+        except JobCancelledError:
+            logger.info(f"Skipping arc extraction of template {template_id} batch {batch_num}")
+            return
+        finally:
+            extractor.results.flush()
+        if extracted is None:
+            progress.increment(EXTRACTION_FAILED)
+            extractor.progress.advance(
+                TEMPLATE_CHARACTER_ARC, error=f"Extracting chapter batch {batch_num} failed"
+            )
+            raise TemplateStageFailedError(
+                f"Template {template_id} batch {batch_num} extraction failed"
+            )
+        progress.increment(EXTRACTED)
+        extractor.progress.advance(TEMPLATE_CHARACTER_ARC)
+
 
+async def reduce_template_task(book_id: int, template_id: int):
+    with session_scope() as db:
+        progress = TemplateProgress(template_id)
+        progress.set_phase(PHASE_REDUCE)
+        try:
+            completed = await TemplateManager(book_id, db).run(template_id)
+        except Exception:
+            progress.set_phase(PHASE_FAILED)
+            raise
+        progress.set_phase(PHASE_COMPLETED if completed else PHASE_CANCELLED)
 
-def add_template_creation_task_to_bg_jobs(book_id: int, template_id: int):
-    enqueue_job(create_template_task, book_id=book_id, template_id=template_id)
+
+async def refresh_chapter_summary_task(book_id: int, chapter_id: int):
+    with session_scope() as db:
+        template = TemplateRepository(db).get_by_book_id(book_id)
+        if not template:
+            return
+        extractor = StoryExtractor(book_id, db, template.id)
+        chapter = extractor.initialize_chapter(chapter_id)
+        if not chapter or extractor.has_current_summary(chapter):
+            return
+        result = (await extractor.summarize_chapters([chapter]))[0]
+        extractor.results.flush()
+        if result.get("error"):
+            raise TemplateStageFailedError(f"Summary refresh of chapter {chapter_id} failed")
+
+
+def add_chapter_summary_refresh_task_to_bg_jobs(
+    book_id: int, chapter_id: int, user_id: Optional[str] = None
+):
+    enqueue_job(
+        refresh_chapter_summary_task,
+        book_id=book_id,
+        chapter_id=chapter_id,
+        job_class=MAINTENANCE,
+        for_user=user_id,
+    )
+
+
+def context_packs_generation_key(book_id: int) -> str:
+    # Bumped whenever packs of the book are invalidated
+    return f"chapter_context_packs_generation:{book_id}"
+
+
+def build_chapter_context_packs_task(book_id: int, chapter_nos: Optional[List[int]] = None):
+    generation = redis_conn.get(context_packs_generation_key(book_id))
+    with session_scope() as db:
+        built = build_chapter_context_packs(db, book_id, chapter_nos)
+        # Packs invalidated while they were built may hold what the edit changed, so they are
+        # dropped and built again from the edited chapters and arcs
+        if redis_conn.get(context_packs_generation_key(book_id)) != generation:
+            db.rollback()
+            logger.info(f"Context packs of book {book_id} changed while built, rebuilding")
+            enqueue_chapter_context_packs_build(book_id, chapter_nos)
+            return
+        db.commit()
+        logger.info(f"Built {built} chapter context packs for book {book_id}")
+
+
+def enqueue_chapter_context_packs_build(
+    book_id: int, chapter_nos: Optional[List[int]] = None, user_id: Optional[str] = None
+):
+    enqueue_job(
+        build_chapter_context_packs_task,
+        book_id=book_id,
+        chapter_nos=chapter_nos,
+        # Queued rebuilds of a whole book are collapsed, they all read the latest chapters and
+        # arcs. A running one may have read them before the change, so it does not count.
+        idempotency_key=book_id if chapter_nos is None else None,
+        dedupe_started=False,
+        job_class=MAINTENANCE,
+        for_user=user_id,
+    )
+
+
+def add_chapter_context_packs_task_to_bg_jobs(
+    db: Session,
+    book_id: int,
+    chapter_nos: Optional[Iterable[int]] = None,
+    user_id: Optional[str] = None,
+):
+    if not has_storyboard(db, book_id):
+        return
+    # The packs are dropped first, so that generation reads the live context until rebuilt,
+    # which is also all that happens if Redis is unavailable
+    delete_chapter_context_packs(db, book_id, chapter_nos)
+    db.commit()
+    try:
+        redis_conn.incr(context_packs_generation_key(book_id))
+        enqueue_chapter_context_packs_build(
+            book_id, None if chapter_nos is None else list(chapter_nos), user_id
+        )
+    except RedisError as e:
+        logger.warning(f"Could not enqueue the context pack build of book {book_id}: {e}")
 
 
 async def generate_character_arcs_task(storyboard_id: int):
-    db = next(get_db())
-    storyboard_inst = CharacterArcGenerator(db, storyboard_id)
-    await storyboard_inst.execute()
+    with session_scope() as db:
+        storyboard_inst = CharacterArcGenerator(db, storyboard_id)
+        await storyboard_inst.execute()
 
 
-def add_generate_character_arcs_task_to_bg_jobs(storyboard_id: int):
-    enqueue_job(generate_character_arcs_task, storyboard_id=storyboard_id)
+def add_generate_character_arcs_task_to_bg_jobs(storyboard_id: int, user_id: Optional[str] = None):
+    CancellationToken(KIND_STORYBOARD, storyboard_id).clear()
+    JobProgress(KIND_STORYBOARD, storyboard_id).reset()
+    return enqueue_job(
+        generate_character_arcs_task,
+        storyboard_id=storyboard_id,
+        idempotency_key=storyboard_id,
+        job_class=STORYBOARD,
+        for_user=user_id,
+    )
 
 
 async def generate_plot_beats_task(storyboard_id: int):
-    db = next(get_db())
-    storyboard_inst = PlotBeatGenerator(db, storyboard_id)
-    await storyboard_inst.execute()
+    with session_scope() as db:
+        storyboard_inst = PlotBeatGenerator(db, storyboard_id)
+        await storyboard_inst.execute()
+        storyboard = storyboard_inst.storyboard_repo.get_by_id(storyboard_id)
+        if storyboard.status == StoryboardStatus.PLOT_BEATS_GENERATION_COMPLETED:
+            add_chapter_context_packs_task_to_bg_jobs(db, storyboard.book_id)
+
+
+def add_generate_plot_beats_task_to_bg_jobs(storyboard_id: int, user_id: Optional[str] = None):
+    CancellationToken(KIND_STORYBOARD, storyboard_id).clear()
+    JobProgress(KIND_STORYBOARD, storyboard_id).reset()
+    return enqueue_job(
+        generate_plot_beats_task,
+        storyboard_id=storyboard_id,
+        idempotency_key=storyboard_id,
+        job_class=STORYBOARD,
+        for_user=user_id,
+    )
+
+
+def cancel_template_jobs(template_id: int):
+    # Running jobs stop within a poll interval, queued ones as soon as they start
+    CancellationToken(KIND_TEMPLATE, template_id).request()
 
 
-def add_generate_plot_beats_task_to_bg_jobs(storyboard_id: int):
-    enqueue_job(generate_plot_beats_task, storyboard_id=storyboard_id)
+def cancel_storyboard_jobs(storyboard_id: int):
+    CancellationToken(KIND_STORYBOARD, storyboard_id).request()
@@ -0,0 +1,44 @@
+import argparse
+from typing import List, Optional
+
+from rq import Queue
+
+from app.config import WORKER
+from app.services.background_jobs import redis_conn
+from app.services.background_jobs.async_worker import AsyncWorker
+from app.services.background_jobs.fair_worker import FairWorker
+from app.services.background_jobs.job_classes import LEGACY_QUEUES, class_queue_names
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run a worker of the pool that serves the given job classes."""
+    parser = argparse.ArgumentParser(description="Run an RQ worker for some job classes")
+    parser.add_argument(
+        "--classes",
+        default=WORKER.CLASSES,
+        help="Comma-separated job classes, in the order that breaks ties between them",
+    )
+    parser.add_argument("--mode", choices=("rq", "async"), default=WORKER.MODE)
+    parser.add_argument("--concurrency", type=int, default=WORKER.CONCURRENCY)
+    parser.add_argument("--shutdown-timeout", type=float, default=WORKER.SHUTDOWN_TIMEOUT_SECONDS)
+    args = parser.parse_args(argv)
+
+    job_classes = [job_class.strip() for job_class in args.classes.split(",") if job_class.strip()]
+    queue_names = [name for job_class in job_classes for name in class_queue_names(job_class)]
+    # Also drains jobs enqueued by priority, including those enqueued before job classes existed
+    queues = [Queue(name, connection=redis_conn) for name in queue_names + list(LEGACY_QUEUES)]
+
+    if args.mode == "async":
+        worker = AsyncWorker(
+            queues,
+            concurrency=args.concurrency,
+            shutdown_timeout=args.shutdown_timeout,
+            connection=redis_conn,
+        )
+    else:
+        worker = FairWorker(queues, connection=redis_conn)
+    worker.work()
+
+
+if __name__ == "__main__":
+    main()
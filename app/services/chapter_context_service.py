@@ -0,0 +1,147 @@
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session, load_only
+
+from app.constants.metrics import Constants
+from app.metrics.statsd_client import statsd
+from app.models.models import Chapter, ChapterContextPack, Storyboard
+from app.repository.character_arcs_repository import CharacterArcsRepository
+from app.services.setting_service import get_setting_by_key
+from app.utils.character_matcher import get_character_matcher
+
+# Previous chapters read by scene and chapter generation, packs cover the larger of the two
+CONTEXT_SIZE_SETTINGS = (
+    "scenes_previous_chapters_context_size",
+    "chapter_content_previous_chapters_context_size",
+)
+DEFAULT_CONTEXT_SIZE = 3
+
+
+def get_pack_context_size(db: Session) -> int:
+    sizes = []
+    for key in CONTEXT_SIZE_SETTINGS:
+        try:
+            sizes.append(int(get_setting_by_key(db, key).value))
+        except (HTTPException, ValueError):
+            sizes.append(DEFAULT_CONTEXT_SIZE)
+    return max(sizes)
+
+
+def get_chapter_character_ids(db: Session, book_id: int, chapter: Chapter) -> Set[int]:
+    # Chapters nobody tagged, such as those written by hand, are tagged from their summary
+    if chapter.character_ids:
+        return set(chapter.character_ids)
+    character_arcs = CharacterArcsRepository(db).get_character_arcs_by_book_id(book_id)
+    return set(get_character_matcher(character_arcs).match(chapter.source_text))
+
+
+def chapter_summary(chapter: Chapter) -> Dict[str, Any]:
+    return {
+        "chapter_no": chapter.chapter_no,
+        "title": chapter.title,
+        "source_text": chapter.source_text,
+    }
+
+
+def affected_chapter_nos(db: Session, chapter_no: int) -> List[int]:
+    # The chapter before lists it as next chapter, the ones after as previous chapters
+    return list(range(chapter_no - 1, chapter_no + get_pack_context_size(db) + 1))
+
+
+def has_storyboard(db: Session, book_id: int) -> bool:
+    # Only books written from a storyboard have context packs
+    return db.query(Storyboard.id).filter(Storyboard.book_id == book_id).first() is not None
+
+
+def build_chapter_context_packs(
+    db: Session, book_id: int, chapter_nos: Optional[Iterable[int]] = None
+) -> int:
+    """Build the context packs of a storyboard book's chapters, or of the given chapter numbers.
+
+    Returns the number of packs built, without committing them. Books without a storyboard get
+    none.
+    """
+    if not has_storyboard(db, book_id):
+        return 0
+
+    context_size = get_pack_context_size(db)
+    chapters = (
+        db.query(Chapter)
+        .options(
+            load_only(
+                Chapter.id,
+                Chapter.chapter_no,
+                Chapter.title,
+                Chapter.source_text,
+                Chapter.character_ids,
+            )
+        )
+        .filter(Chapter.book_id == book_id)
+        .all()
+    )
+    by_no = {chapter.chapter_no: chapter for chapter in chapters}
+    if chapter_nos is not None:
+        chapters = [by_no[chapter_no] for chapter_no in set(chapter_nos) if chapter_no in by_no]
+    packs = {
+        pack.chapter_id: pack
+        for pack in db.query(ChapterContextPack).filter(
+            ChapterContextPack.chapter_id.in_([chapter.id for chapter in chapters])
+        )
+    }
+
+    character_arcs_repo = CharacterArcsRepository(db)
+    built_at = int(time.time())
+    for chapter in chapters:
+        character_ids = get_chapter_character_ids(db, book_id, chapter)
+        segments = character_arcs_repo.get_segments_by_book_and_chapter(
+            book_id, chapter.chapter_no, character_ids
+        )
+        next_chapter = by_no.get(chapter.chapter_no + 1)
+
+        pack = packs.get(chapter.id)
+        if pack is None:
+            pack = ChapterContextPack(chapter_id=chapter.id, book_id=book_id)
+            db.add(pack)
+        pack.chapter_no = chapter.chapter_no
+        pack.context_size = context_size
+        pack.character_ids = sorted(character_ids)
+        pack.character_arcs = [[name, content] for name, content, _ in segments]
+        pack.previous_chapters = [
+            chapter_summary(by_no[chapter_no])
+            for chapter_no in range(chapter.chapter_no - context_size, chapter.chapter_no)
+            if chapter_no in by_no
+        ]
+        pack.next_chapter = chapter_summary(next_chapter) if next_chapter else None
+        pack.built_at = built_at
+    return len(chapters)
+
+
+def delete_chapter_context_packs(
+    db: Session, book_id: int, chapter_nos: Optional[Iterable[int]] = None
+) -> None:
+    # Part of the caller's transaction
+    query = db.query(ChapterContextPack).filter(ChapterContextPack.book_id == book_id)
+    if chapter_nos is not None:
+        query = query.filter(ChapterContextPack.chapter_no.in_(list(chapter_nos)))
+    query.delete(synchronize_session=False)
+
+
+def get_chapter_context_pack(
+    db: Session, chapter: Chapter, context_size: int
+) -> Optional[ChapterContextPack]:
+    pack = db.query(ChapterContextPack).filter(ChapterContextPack.chapter_id == chapter.id).first()
+    # Packs are dropped when what they hold changes, and rebuilt in the background
+    hit = (
+        pack is not None
+        and pack.chapter_no == chapter.chapter_no
+        and pack.context_size >= context_size
+    )
+    statsd.increment(
+        Constants.Metric.CHAPTER_CONTEXT_PACK,
+        Constants.Metric.INCREMENT_COUNT,
+        Constants.Metric.HUNDRED_SAMPLING_RATE,
+        {Constants.Tag.RESULT: "hit" if hit else "miss"},
+    )
+    return pack if hit else None
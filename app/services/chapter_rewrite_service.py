@@ -13,7 +13,7 @@ from app.prompts.chapters import (
 )
 from app.prompts.rewrite_prompts import CHAPTER_REWRITE_PROMPT
 from app.services.ai_service import get_openai_client
-from app.services.chapter_service import get_context_chapters
+from app.services.chapter_service import get_chapter_context
 from app.services.evaluations.critique_agent.critique_service import generate_chapter_critique
 from app.services.setting_service import get_setting_by_key
 
@@ -65,8 +65,8 @@ async def stream_chapter_rewrite(db: Session, book_id: int, chapter_id: int):
         temperature = float(get_setting_by_key(db, "create_chapter_content_temperature").value)
 
         # Get previous chapters, last chapter, and next chapter context
-        previous_chapters_context, last_chapter_content, next_chapter_content = (
-            get_context_chapters(db, book_id, chapter.chapter_no, context_size)
+        previous_chapters_context, last_chapter_content, next_chapter_content, _ = (
+            get_chapter_context(db, book_id, chapter, context_size, with_character_arcs=False)
         )
 
         # Get scenes if they exist
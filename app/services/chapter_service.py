@@ -1,14 +1,16 @@
 import json
 import logging
+import re
 import time
-from typing import List
+from typing import List, Optional, Tuple
 
 from bs4 import BeautifulSoup
 from fastapi import HTTPException
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from app.models.models import Book, Chapter, Scene
+from app.config import CHAPTER_SUMMARIES
+from app.models.models import Book, Chapter, ChapterContextPack, Scene
 from app.prompts import format_prompt
 from app.prompts.chapters import CHAPTER_GENERATION_FROM_SCENE_SYSTEM_PROMPT_V1
 from app.prompts.scenes import SCENE_GENERATION_SYSTEM_PROMPT_V1
@@ -19,12 +21,58 @@ from app.schemas.schemas import (
     SceneOutlineResponse,
 )
 from app.services.ai_service import get_openai_client
+from app.services.background_jobs.tasks import (
+    add_chapter_context_packs_task_to_bg_jobs,
+    add_chapter_summary_refresh_task_to_bg_jobs,
+)
+from app.services.chapter_context_service import (
+    affected_chapter_nos,
+    delete_chapter_context_packs,
+    get_chapter_character_ids,
+    get_chapter_context_pack,
+)
 from app.services.character_arc_service import CharacterArcService
 from app.services.setting_service import get_setting_by_key
-from app.utils.story_generator_utils import get_character_arcs_content_by_chapter_id
 
 logger = logging.getLogger(__name__)
 
+SCENE_PATTERN = re.compile(r"<scene-([0-9]+)>\s*<title>(.*?)</title>\s*([\s\S]*?)\s*</scene-\1>")
+# A more lenient pattern that might catch variations
+SCENE_FALLBACK_PATTERN = re.compile(
+    r"(?:scene|SCENE)[\s-]*([0-9]+)[:\s]*\s*(?:title|TITLE)?[:\s]*\s*([^\n]+)\n([\s\S]*?)(?=(?:scene|SCENE)[\s-]*[0-9]+|$)"
+)
+HEADING_TAGS = ["h1", "h2", "h3", "h4", "h5", "h6"]
+
+
+def parse_scene_outline(response_text: str) -> List[re.Match]:
+    scene_matches = list(SCENE_PATTERN.finditer(response_text))
+
+    # If no scenes were found with the pattern, try a fallback approach
+    if not scene_matches:
+        logger.warning("No scenes matched the expected format. Attempting fallback parsing.")
+        scene_matches = list(SCENE_FALLBACK_PATTERN.finditer(response_text))
+    return scene_matches
+
+
+def split_html_into_chapters(html_content: str) -> List[Tuple[str, str]]:
+    """Split HTML into (title, raw HTML content) pairs, one per heading."""
+    soup = BeautifulSoup(html_content, "html.parser")
+
+    chapters_data = []
+    for header in soup.find_all(HEADING_TAGS):
+        title = header.get_text().strip()
+
+        # Collect all content until the next heading
+        content_parts = []
+        for sibling in header.next_siblings:
+            if getattr(sibling, "name", None) in HEADING_TAGS:
+                break
+            content_parts.append(str(sibling))  # Save raw HTML
+
+        # Simply join the content parts without additional processing
+        chapters_data.append((title, "".join(content_parts)))
+    return chapters_data
+
 
 def create_chapter(db: Session, book_id: int, chapter: ChapterCreate, user_id: str):
     # Check if book exists
@@ -69,6 +117,9 @@ def create_chapter(db: Session, book_id: int, chapter: ChapterCreate, user_id: s
     db.add(db_chapter)
     db.commit()
     db.refresh(db_chapter)
+    add_chapter_context_packs_task_to_bg_jobs(
+        db, book_id, [next_chapter_no - 1, next_chapter_no], user_id
+    )
     return db_chapter
 
 
@@ -79,14 +130,26 @@ def update_chapter(
     if not chapter:
         return None
 
+    content_changed = bool(chapter_update.content) and chapter_update.content != chapter.content
+    source_text_changed = (
+        bool(chapter_update.source_text) and chapter_update.source_text != chapter.source_text
+    )
     if chapter_update.content:
         chapter.content = chapter_update.content
     if chapter_update.source_text:
         chapter.source_text = chapter_update.source_text
+        chapter.source_text_fingerprint = None
     chapter.updated_at = int(time.time())
     chapter.updated_by = user_id
     db.commit()
     db.refresh(chapter)
+    # Only summaries the template pipeline wrote are refreshed
+    if content_changed and chapter.source_text_fingerprint and CHAPTER_SUMMARIES.REFRESH_ON_SAVE:
+        add_chapter_summary_refresh_task_to_bg_jobs(book_id, chapter.id, user_id)
+    if source_text_changed:
+        add_chapter_context_packs_task_to_bg_jobs(
+            db, book_id, affected_chapter_nos(db, chapter.chapter_no), user_id
+        )
     return chapter
 
 
@@ -102,10 +165,14 @@ def patch_chapter_source_text(
         return None
 
     chapter.source_text = source_text
+    chapter.source_text_fingerprint = None
     chapter.updated_at = int(time.time())
     chapter.updated_by = user_id
     db.commit()
     db.refresh(chapter)
+    add_chapter_context_packs_task_to_bg_jobs(
+        db, book_id, affected_chapter_nos(db, chapter.chapter_no), user_id
+    )
     return chapter
 
 
@@ -167,6 +234,14 @@ def get_context_chapters(
             actual_previous_chapters = all_previous_chapters_list[:-1]
         else:  # Should not happen if context_size >=1 and chapters exist
             pass  # last_chapter_obj remains None, actual_previous_chapters remains []
+    return format_context_chapters(actual_previous_chapters, last_chapter_obj, next_chapter_obj)
+
+
+def format_context_chapters(
+    actual_previous_chapters: List[Chapter],
+    last_chapter_obj: Optional[Chapter],
+    next_chapter_obj: Optional[Chapter],
+) -> tuple[str, str, str]:
     # Prepare context from previous chapters (n-1-k)
     if actual_previous_chapters:
         previous_chapters_context_str = "\n\n".join(
@@ -202,6 +277,54 @@ def get_context_chapters(
     return previous_chapters_context_str, last_chapter_content_str, next_chapter_content_str
 
 
+def get_chapter_context(
+    db: Session,
+    book_id: int,
+    chapter: Chapter,
+    context_size: int,
+    with_character_arcs: bool = True,
+) -> Tuple[str, str, str, List[Tuple[str, str]]]:
+    """Previous, last and next chapter context, and name and content of the chapter's arcs.
+
+    Read from the chapter's context pack when it has a current one, otherwise derived from the
+    chapters and arc segments.
+    """
+    pack = get_chapter_context_pack(db, chapter, context_size)
+    if pack is None:
+        context = get_context_chapters(db, book_id, chapter.chapter_no, context_size)
+        character_arcs = []
+        if with_character_arcs:
+            character_arcs = [
+                (name, content)
+                for name, content, _ in CharacterArcService(
+                    db
+                ).get_character_arcs_content_by_chapter(
+                    book_id, chapter.chapter_no, get_chapter_character_ids(db, book_id, chapter)
+                )
+            ]
+        return (*context, character_arcs)
+
+    previous_chapters = [
+        Chapter(**summary)
+        for summary in pack.previous_chapters
+        if summary["chapter_no"] >= chapter.chapter_no - context_size
+    ]
+    last_chapter = None
+    if previous_chapters:
+        # The last chapter is given in full rather than summarized
+        last_chapter = (
+            db.query(Chapter)
+            .filter(
+                Chapter.book_id == book_id,
+                Chapter.chapter_no == previous_chapters.pop().chapter_no,
+            )
+            .first()
+        )
+    next_chapter = Chapter(**pack.next_chapter) if pack.next_chapter else None
+    context = format_context_chapters(previous_chapters, last_chapter, next_chapter)
+    return (*context, [(name, content) for name, content in pack.character_arcs])
+
+
 async def generate_chapter_outline(
     db: Session, book_id: int, chapter_id: int, user_prompt: str, user_id: str
 ) -> List[SceneOutlineResponse]:
@@ -224,9 +347,12 @@ async def generate_chapter_outline(
         # context_size includes both previous chapters (n-1-k) and the last chapter (n-1)
         context_size = int(get_setting_by_key(db, "scenes_previous_chapters_context_size").value)
 
-        previous_chapters_context, last_chapter_content, next_chapter_content = (
-            get_context_chapters(db, book_id, chapter.chapter_no, context_size)
-        )
+        (
+            previous_chapters_context,
+            last_chapter_content,
+            next_chapter_content,
+            character_arcs,
+        ) = get_chapter_context(db, book_id, chapter, context_size)
 
         # Prepare the messages for GPT
         system_prompt = format_prompt(
@@ -236,16 +362,6 @@ async def generate_chapter_outline(
             next_chapter=next_chapter_content,
         )
 
-        character_arc_service = CharacterArcService(db)
-        character_arcs_models = character_arc_service.get_character_arcs_by_book_id(book_id)
-        logger.info(f"Found {len(character_arcs_models)} character arcs for book {book_id}")
-        character_arcs = get_character_arcs_content_by_chapter_id(
-            character_arcs_models, chapter.chapter_no
-        )
-        logger.info(f"Found {len(character_arcs)} character arcs for chapter {chapter.chapter_no}")
-        character_arcs = [
-            (arc[0], arc[1]) for arc in character_arcs if arc[2] in chapter.character_ids
-        ]
         # log character names
         logger.info(
             f"Considering only {len(character_arcs)} character arcs: {', '.join([arc[0] for arc in character_arcs])}"
@@ -293,19 +409,7 @@ async def generate_chapter_outline(
             print("Raw response text:", response_text)
 
             # Extract scenes using regex pattern matching
-            import re
-
-            scene_pattern = r"<scene-([0-9]+)>\s*<title>(.*?)</title>\s*([\s\S]*?)\s*</scene-\1>"
-            scene_matches = list(re.finditer(scene_pattern, response_text))
-
-            # If no scenes were found with the pattern, try a fallback approach
-            if not scene_matches:
-                logger.warning(
-                    "No scenes matched the expected format. Attempting fallback parsing."
-                )
-                # Try a more lenient pattern that might catch variations
-                alt_pattern = r"(?:scene|SCENE)[\s-]*([0-9]+)[:\s]*\s*(?:title|TITLE)?[:\s]*\s*([^\n]+)\n([\s\S]*?)(?=(?:scene|SCENE)[\s-]*[0-9]+|$)"
-                scene_matches = list(re.finditer(alt_pattern, response_text))
+            scene_matches = parse_scene_outline(response_text)
 
             if not scene_matches:
                 logger.error("Failed to extract any scenes from the response.")
@@ -385,9 +489,12 @@ async def stream_chapter_content(
     )
 
     # Get all three chapter contexts: previous chapters, last chapter, and next chapter
-    previous_chapters_context, last_chapter_content, next_chapter_content = get_context_chapters(
-        db, book_id, chapter.chapter_no, context_size
-    )
+    (
+        previous_chapters_context,
+        last_chapter_content,
+        next_chapter_content,
+        character_arcs,
+    ) = get_chapter_context(db, book_id, chapter, context_size)
 
     # Get all scenes for the current chapter
     scenes = (
@@ -401,12 +508,6 @@ async def stream_chapter_content(
             [f"Scene {s.scene_number}: {s.title}\n" f"Content: {s.content}" for s in scenes]
         )
 
-    character_arc_service = CharacterArcService(db)
-    character_arcs_models = character_arc_service.get_character_arcs_by_book_id(book_id)
-    character_arcs = get_character_arcs_content_by_chapter_id(
-        character_arcs_models, chapter.chapter_no
-    )
-    character_arcs = [(arc[0], arc[1]) for arc in character_arcs if arc[2] in chapter.character_ids]
     # log character names
     logger.info(
         f"Considering only {len(character_arcs)} character arcs: {', '.join([arc[0] for arc in character_arcs])}"
@@ -512,8 +613,11 @@ def delete_chapter(db: Session, book_id: int, chapter_id: int):
     if not chapter:
         return None
 
+    chapter_no = chapter.chapter_no
+    db.query(ChapterContextPack).filter(ChapterContextPack.chapter_id == chapter_id).delete()
     db.delete(chapter)
     db.commit()
+    add_chapter_context_packs_task_to_bg_jobs(db, book_id, affected_chapter_nos(db, chapter_no))
     return {"message": "Chapter deleted successfully"}
 
 
@@ -525,8 +629,9 @@ def delete_all_chapters(db: Session, book_id: int):
     if not chapter_ids:
         return {"message": "No chapters found to delete"}
 
-    # Delete all scenes for these chapters
+    # Delete all scenes and context packs for these chapters
     db.query(Scene).filter(Scene.chapter_id.in_(chapter_ids)).delete(synchronize_session=False)
+    delete_chapter_context_packs(db, book_id)
     db.flush()
 
     # Delete all chapters
@@ -556,28 +661,8 @@ def bulk_upload_chapters(db: Session, book_id: int, html_content: str, user_id:
     if not book:
         return None
 
-    # Parse the HTML
-    soup = BeautifulSoup(html_content, "html.parser")
-
-    # Find all headings (h1, h2, h3, etc.)
-    headings = soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"])
-    chapters_data = []
-
-    for i, header in enumerate(headings):
-        title = header.get_text().strip()
-
-        # Collect all content until the next heading
-        content_parts = []
-        for sibling in header.next_siblings:
-            if getattr(sibling, "name", None) in ["h1", "h2", "h3", "h4", "h5", "h6"]:
-                break
-            content_parts.append(str(sibling))  # Save raw HTML
-
-        # Simply join the content parts without additional processing
-        chapter_content = "".join(content_parts)
-
-        # Store the title and raw HTML content
-        chapters_data.append((title, chapter_content))
+    # Split the HTML into chapters at each heading (h1, h2, h3, etc.)
+    chapters_data = split_html_into_chapters(html_content)
 
     # Get the highest chapter number for this book
     max_chapter = (
@@ -615,4 +700,11 @@ def bulk_upload_chapters(db: Session, book_id: int, html_content: str, user_id:
         db.refresh(db_chapter)
         created_chapters.append(db_chapter)
 
+    if created_chapters:
+        add_chapter_context_packs_task_to_bg_jobs(
+            db,
+            book_id,
+            range(next_chapter_no - 1, next_chapter_no + len(created_chapters)),
+            user_id,
+        )
     return created_chapters
@@ -1,13 +1,17 @@
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from sqlalchemy.orm import Session
 
 from app.repository.character_arcs_repository import CharacterArcsRepository
+from app.repository.storyboard_repository import StoryboardRepository
+from app.services.background_jobs.tasks import add_chapter_context_packs_task_to_bg_jobs
 
 
 class CharacterArcService:
     def __init__(self, db: Session):
+        self.db = db
         self.character_arcs_repo = CharacterArcsRepository(db)
+        self.storyboard_repo = StoryboardRepository(db)
 
     def get_character_arcs_by_type_and_source_id(self, type: str, source_id: int):
         return self.character_arcs_repo.get_by_type_and_source_id(type, source_id)
@@ -16,7 +20,19 @@ class CharacterArcService:
         return self.character_arcs_repo.get_by_id(character_arc_id)
 
     def update_character_arc(self, character_arc_id: int, update_data: Dict[str, Any]):
-        return self.character_arcs_repo.update(character_arc_id, update_data)
+        arc = self.character_arcs_repo.update(character_arc_id, update_data)
+        if arc.type == "STORYBOARD":
+            # Any chapter of the book may have the arc in its context pack
+            book_id = self.storyboard_repo.get_by_id(arc.source_id).book_id
+            add_chapter_context_packs_task_to_bg_jobs(self.db, book_id)
+        return arc
 
     def get_character_arcs_by_book_id(self, book_id: int):
         return self.character_arcs_repo.get_character_arcs_by_book_id(book_id)
+
+    def get_character_arcs_content_by_chapter(
+        self, book_id: int, chapter_no: int, character_arc_ids: Optional[Iterable[int]] = None
+    ) -> List[Tuple[str, str, int]]:
+        return self.character_arcs_repo.get_segments_by_book_and_chapter(
+            book_id, chapter_no, character_arc_ids
+        )
@@ -15,6 +15,20 @@ from app.schemas.character_arcs import CharacterArcContentJSON
 
 # Import from app services
 from app.services.ai_service import get_openai_client
+from app.services.background_jobs.cancellation import (
+    CancellationToken,
+    JobCancelledError,
+    report_cancelled,
+)
+from app.services.background_jobs.progress import (
+    KIND_STORYBOARD,
+    STATUS_CANCELLED,
+    STATUS_COMPLETED,
+    STATUS_FAILED,
+    STATUS_IN_PROGRESS,
+    STORYBOARD_CHARACTER_ARCS,
+    JobProgress,
+)
 from app.utils.model_settings import ModelSettings
 from app.utils.story_generator_utils import process_character_arcs
 
@@ -28,6 +42,7 @@ class CharacterArcGenerator:
         self.character_arc_repo = CharacterArcsRepository(self.db)
         self.storyboard_repo = StoryboardRepository(self.db)
         self.model_settings = ModelSettings(self.db)
+        self.progress = JobProgress(KIND_STORYBOARD, storyboard_id)
 
         # Initialize AI client
         try:
@@ -126,6 +141,7 @@ class CharacterArcGenerator:
 
             if not character_names_string:
                 logger.error("No character names generated")
+                self.progress.report_error("No character names generated")
                 return
 
             logger.info(f"Generated character names: {character_names_string}")
@@ -157,11 +173,14 @@ class CharacterArcGenerator:
 
                 self.character_arc_repo.batch_create(character_arcs_data)
                 logger.info(f"Stored {len(character_arcs_data)} character arcs in batch operation")
+                self.progress.advance(STORYBOARD_CHARACTER_ARCS, len(character_arcs_data))
             else:
                 logger.error("No character arcs generated")
+                self.progress.report_error("No character arcs generated")
 
         except Exception as e:
             logger.error(f"Error generating character arcs: {str(e)} {traceback.format_exc()}")
+            self.progress.report_error(f"Error generating character arcs: {e}")
 
         logger.info("Character arc generation completed")
 
@@ -171,11 +190,32 @@ class CharacterArcGenerator:
         self.storyboard_repo.update(
             self.storyboard_id, status=StoryboardStatus.CHARACTER_ARC_GENERATION_IN_PROGRESS
         )
+        self.progress.reset()
+        self.progress.set_status(STATUS_IN_PROGRESS)
+        self.progress.start_stage(STORYBOARD_CHARACTER_ARCS, len(self.character_arc_templates))
 
-        await self.generate_character_arcs()
+        try:
+            await CancellationToken(KIND_STORYBOARD, self.storyboard_id).run(
+                self.generate_character_arcs()
+            )
+        except JobCancelledError:
+            report_cancelled(self.progress, KIND_STORYBOARD)
+            # Results are only stored once every item is done, so nothing partial is left
+            # continue_storyboard restarts generation from NOT_STARTED
+            self.storyboard_repo.update(self.storyboard_id, status=StoryboardStatus.NOT_STARTED)
+            self.progress.set_stage_status(**{STORYBOARD_CHARACTER_ARCS: STATUS_CANCELLED})
+            self.progress.set_status(STATUS_CANCELLED)
+            return
+        except Exception as e:
+            self.progress.set_stage_status(**{STORYBOARD_CHARACTER_ARCS: STATUS_FAILED})
+            self.progress.set_status(STATUS_FAILED, error=str(e))
+            raise
 
         self.storyboard_repo.update(
             self.storyboard_id, status=StoryboardStatus.CHARACTER_ARC_GENERATION_COMPLETED
         )
+        # The storyboard waits for the author to continue it with plot beat generation
+        self.progress.set_stage_status(**{STORYBOARD_CHARACTER_ARCS: STATUS_COMPLETED})
+        self.progress.set_status(STATUS_COMPLETED)
 
         logger.info("Character arc generation completed.")
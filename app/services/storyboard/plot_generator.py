@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 import asyncio
 import logging
-from typing import List
+import re
+from typing import List, Set
 
+from openai import BadRequestError, LengthFinishReasonError
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
@@ -11,8 +13,7 @@ from app.models.models import PlotBeat
 
 # Import prompt templates
 from app.prompts.story_generator_prompts import (
-    CHARACTER_IDENTIFICATION_SYSTEM_PROMPT,
-    CHARACTER_IDENTIFICATION_USER_PROMPT_TEMPLATE,
+    PLOT_BEAT_CHARACTER_IDS_PROMPT_TEMPLATE,
     PLOT_BEAT_SYSTEM_PROMPT,
     PLOT_BEAT_USER_PROMPT_TEMPLATE,
 )
@@ -22,17 +23,43 @@ from app.repository.storyboard_repository import StoryboardRepository
 
 # Import from app services
 from app.services.ai_service import get_openai_client
+from app.services.background_jobs.cancellation import (
+    CancellationToken,
+    JobCancelledError,
+    report_cancelled,
+)
+from app.services.background_jobs.progress import (
+    KIND_STORYBOARD,
+    STATUS_CANCELLED,
+    STATUS_COMPLETED,
+    STATUS_FAILED,
+    STATUS_IN_PROGRESS,
+    STORYBOARD_PLOT_BEATS,
+    JobProgress,
+)
+from app.utils.character_matcher import get_character_matcher
 from app.utils.model_settings import ModelSettings
-from app.utils.story_generator_utils import get_character_arcs_content_by_chapter_id
 
 logger = logging.getLogger(__name__)
 
 
-class CharacterIdentificationResponse(BaseModel):
+class PlotBeatResponse(BaseModel):
+    content: str
     character_ids: List[int]
 
 
+def rejects_structured_output(error: BadRequestError) -> bool:
+    # Other bad requests, such as an oversized prompt, say nothing about the model
+    message = str(error).lower()
+    return error.param == "response_format" or any(
+        term in message for term in ("response_format", "json_schema", "structured output")
+    )
+
+
 class PlotBeatGenerator:
+    # Models that rejected structured output, shared by the generators of the process
+    unstructured_models: Set[str] = set()
+
     def __init__(self, db: Session, storyboard_id: int):
         self.db = db
         self.storyboard_id = storyboard_id
@@ -40,6 +67,7 @@ class PlotBeatGenerator:
         self.character_arcs_repo = CharacterArcsRepository(self.db)
         self.plot_beats_repo = PlotBeatRepository(self.db)
         self.model_settings = ModelSettings(self.db)
+        self.progress = JobProgress(KIND_STORYBOARD, storyboard_id)
 
         # Initialize AI client
         try:
@@ -64,41 +92,73 @@ class PlotBeatGenerator:
             self.plot_beats_templates = sorted(templates, key=lambda x: x.id)
             logger.info(f"Got {len(self.plot_beats_templates)} plot beat templates")
 
-    async def identify_characters_in_plot_beat(self, plot_beat: PlotBeat) -> List[int]:
-        try:
-            # Build character list with IDs
-            character_list = ""
-            for character_arc in self.character_arcs:
-                character_list += f"Character ID: {character_arc.id}, Name: {character_arc.name}\n"
-
-            system_prompt = CHARACTER_IDENTIFICATION_SYSTEM_PROMPT
-            user_prompt = CHARACTER_IDENTIFICATION_USER_PROMPT_TEMPLATE.format(
-                character_list_with_ids=character_list, plot_beat_content=plot_beat.content
-            )
-            model, temperature = self.model_settings.character_identification()
-            client = get_openai_client(model)
-
-            # Use asyncio.to_thread for this synchronous call as well
-            completion = await asyncio.to_thread(
-                client.beta.chat.completions.parse,
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=temperature,
-                response_format=CharacterIdentificationResponse,
-            )
+    def character_ids_in(self, content: str) -> List[int]:
+        # Local fallback for models without structured output: names and char_N references
+        return get_character_matcher(self.character_arcs).match(content)
 
-            return completion.choices[0].message.parsed.character_ids
+    async def complete_plot_beat(self, user_prompt: str) -> PlotBeatResponse:
+        model, temperature = self.model_settings.plot_beat_generation()
+        client = get_openai_client(model)
+        messages = [
+            {"role": "system", "content": PLOT_BEAT_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ]
 
-        except Exception as e:
-            logger.error(f"Error identifying characters in plot beat: {e}")
-            return []
+        if model not in self.unstructured_models:
+            character_list = "".join(
+                f"Character ID: {character_arc.id}, Name: {character_arc.name}\n"
+                for character_arc in self.character_arcs
+            )
+            messages[1]["content"] += PLOT_BEAT_CHARACTER_IDS_PROMPT_TEMPLATE.format(
+                character_list_with_ids=character_list
+            )
+            parsed = None
+            try:
+                # Run synchronous OpenAI call in a separate thread to avoid blocking the event loop
+                completion = await asyncio.to_thread(
+                    client.beta.chat.completions.parse,
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    response_format=PlotBeatResponse,
+                )
+                parsed = completion.choices[0].message.parsed
+                if parsed is None:
+                    logger.warning(
+                        f"{model} refused the structured plot beat, retrying without it: "
+                        f"{completion.choices[0].message.refusal}"
+                    )
+            except BadRequestError as e:
+                if rejects_structured_output(e):
+                    logger.warning(f"{model} rejected structured plot beats, matching names: {e}")
+                    self.unstructured_models.add(model)
+                else:
+                    logger.warning(f"Structured plot beat failed, retrying without it: {e}")
+            except LengthFinishReasonError as e:
+                logger.warning(f"Structured plot beat was cut off, retrying without it: {e}")
+
+            if parsed is not None:
+                known_ids = {character_arc.id for character_arc in self.character_arcs}
+                return PlotBeatResponse(
+                    content=parsed.content,
+                    character_ids=[
+                        character_id
+                        for character_id in dict.fromkeys(parsed.character_ids)
+                        if character_id in known_ids
+                    ],
+                )
+            messages[1]["content"] = user_prompt
+
+        response = await asyncio.to_thread(
+            client.chat.completions.create,
+            model=model,
+            messages=messages,
+            temperature=temperature,
+        )
+        content = response.choices[0].message.content
+        return PlotBeatResponse(content=content, character_ids=self.character_ids_in(content))
 
     async def generate_plot_beat(self, plot_beat_template: PlotBeat, chapter_id: int):
-        import re
-
         # Extract character pattern references (char_x) from plot template
         char_pattern = r"char_\d+"
         mentioned_chars = set(re.findall(char_pattern, plot_beat_template.content))
@@ -115,8 +175,8 @@ class PlotBeatGenerator:
 
         # Build character content string
         character_content_str = ""
-        character_arcs_content = get_character_arcs_content_by_chapter_id(
-            self.character_arcs, chapter_id, mentioned_chars
+        character_arcs_content = self.character_arcs_repo.get_segments_by_chapter(
+            "STORYBOARD", [self.storyboard_id], chapter_id, archetypes=mentioned_chars
         )
         logger.info(
             f"Plot beat chapter {chapter_id} character arcs content: {', '.join([character_arc[0] for character_arc in character_arcs_content])}"
@@ -126,37 +186,21 @@ class PlotBeatGenerator:
             character_content_str += f"{character_arc_content}\n\n"
 
         try:
-            system_prompt = PLOT_BEAT_SYSTEM_PROMPT
             user_prompt = PLOT_BEAT_USER_PROMPT_TEMPLATE.format(
                 prompt=self.storyboard.prompt,
                 character_content=character_content_str,
                 plot_template=plot_beat_template.content,
                 character_mappings=character_mapping_str,
             )
-            model, temperature = self.model_settings.plot_beat_generation()
-            client = get_openai_client(model)
-
-            # Run synchronous OpenAI call in a separate thread to avoid blocking the event loop
-            response = await asyncio.to_thread(
-                client.chat.completions.create,
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=temperature,
-            )
-
-            # Instead of saving to DB here, just return the content and metadata
-            content = response.choices[0].message.content
-
-            # Get character IDs without creating a plot beat first
-            # We'll create a temporary plot beat object just for identification
-            temp_plot_beat = PlotBeat(content=content)
-            character_ids = await self.identify_characters_in_plot_beat(temp_plot_beat)
+            # One call returns the beat and the characters in it
+            plot_beat = await self.complete_plot_beat(user_prompt)
 
             # Return a dict with all the data needed to create the plot beat later
-            return {"content": content, "character_ids": character_ids, "chapter_id": chapter_id}
+            return {
+                "content": plot_beat.content,
+                "character_ids": plot_beat.character_ids,
+                "chapter_id": chapter_id,
+            }
 
         except Exception as e:
             error_message = f"Error generating plot beat: {e}"
@@ -178,6 +222,10 @@ class PlotBeatGenerator:
                 logger.info(f"Generating plot beat {i+1}/{len(self.plot_beats_templates)}")
                 plot_beat_data = await self.generate_plot_beat(plot_beat_template, i + 1)
                 logger.info(f"Completed plot beat {i+1}")
+                self.progress.advance(
+                    STORYBOARD_PLOT_BEATS,
+                    error=plot_beat_data["content"] if plot_beat_data.get("error") else None,
+                )
 
                 # Return index along with data to maintain original order
                 return (i, plot_beat_data)
@@ -223,10 +271,32 @@ class PlotBeatGenerator:
             self.storyboard_id, status=StoryboardStatus.PLOT_BEATS_GENERATION_IN_PROGRESS
         )
 
-        await self.generate_all_plot_beats()
+        self.progress.reset()
+        self.progress.set_status(STATUS_IN_PROGRESS)
+        self.progress.start_stage(STORYBOARD_PLOT_BEATS, len(self.plot_beats_templates))
+
+        try:
+            await CancellationToken(KIND_STORYBOARD, self.storyboard_id).run(
+                self.generate_all_plot_beats()
+            )
+        except JobCancelledError:
+            report_cancelled(self.progress, KIND_STORYBOARD)
+            # Results are only stored once every item is done, so nothing partial is left
+            self.storyboard_repo.update(
+                self.storyboard_id, status=StoryboardStatus.CHARACTER_ARC_GENERATION_COMPLETED
+            )
+            self.progress.set_stage_status(**{STORYBOARD_PLOT_BEATS: STATUS_CANCELLED})
+            self.progress.set_status(STATUS_CANCELLED)
+            return
+        except Exception as e:
+            self.progress.set_stage_status(**{STORYBOARD_PLOT_BEATS: STATUS_FAILED})
+            self.progress.set_status(STATUS_FAILED, error=str(e))
+            raise
 
         self.storyboard_repo.update(
             self.storyboard_id, status=StoryboardStatus.PLOT_BEATS_GENERATION_COMPLETED
         )
+        self.progress.set_stage_status(**{STORYBOARD_PLOT_BEATS: STATUS_COMPLETED})
+        self.progress.set_status(STATUS_COMPLETED)
 
         logger.info(f"Plot beat generation completed. Generated {len(self.plot_beats)} plot beats.")
@@ -1,13 +1,23 @@
 import logging
 
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.models.enums import StoryboardStatus
+from app.repository.book_repository import BookRepository
+from app.repository.character_arcs_repository import CharacterArcsRepository
 from app.repository.plot_beat_repository import PlotBeatRepository
 from app.repository.storyboard_repository import StoryboardRepository
+from app.services.background_jobs import job_lock
+from app.services.background_jobs.progress import (
+    KIND_STORYBOARD,
+    JobProgress,
+    progress_events,
+)
 from app.services.background_jobs.tasks import (
     add_generate_character_arcs_task_to_bg_jobs,
     add_generate_plot_beats_task_to_bg_jobs,
+    cancel_storyboard_jobs,
 )
 from app.services.storyboard.summary_generatory import SummarizerGenerator
 from app.utils.exceptions import (
@@ -25,49 +35,89 @@ class StoryboardService:
         self.db = db
         self.storyboard_repo = StoryboardRepository(db)
         self.plot_beat_repo = PlotBeatRepository(db)
+        self.book_repo = BookRepository(db)
+        self.character_arcs_repo = CharacterArcsRepository(db)
         self.user_id = user_id
 
-    def create_storyboard(self, book_id: int, template_id: int, prompt: str):
-        try:
-            existing = self.storyboard_repo.get_by_book_id(book_id)
-            if existing:
-                raise StoryboardAlreadyExistsException(book_id)
-        except StoryboardNotFoundException:
-            pass
-
-        storyboard = self.storyboard_repo.create(book_id, template_id, prompt, self.user_id)
+    def author_id(self, book_id: int):
+        # Jobs are scheduled fairly between book authors
+        book = self.book_repo.get_by_id(book_id)
+        return book.author_id if book else None
 
-        storyboard = self.storyboard_repo.update(
-            storyboard.id, status=StoryboardStatus.CHARACTER_ARC_GENERATION_IN_PROGRESS
-        )
-
-        add_generate_character_arcs_task_to_bg_jobs(storyboard.id)
+    def create_storyboard(self, book_id: int, template_id: int, prompt: str):
+        # Concurrent requests for the same book must not both create a storyboard
+        with job_lock("create_storyboard", book_id):
+            try:
+                existing = self.storyboard_repo.get_by_book_id(book_id)
+                if existing:
+                    raise StoryboardAlreadyExistsException(book_id)
+            except StoryboardNotFoundException:
+                pass
+
+            storyboard = self.storyboard_repo.create(book_id, template_id, prompt, self.user_id)
+
+            storyboard = self.storyboard_repo.update(
+                storyboard.id, status=StoryboardStatus.CHARACTER_ARC_GENERATION_IN_PROGRESS
+            )
+
+            add_generate_character_arcs_task_to_bg_jobs(storyboard.id, self.author_id(book_id))
         return storyboard
 
     def get_storyboard_by_id(self, storyboard_id: int):
         self.db.expire_all()
         return self.storyboard_repo.get_by_id(storyboard_id)
 
+    def stream_storyboard_progress(self, storyboard_id: int) -> StreamingResponse:
+        # Raises StoryboardNotFoundException before the stream starts
+        self.storyboard_repo.get_by_id(storyboard_id)
+        # The stream can stay open for hours and only reads Redis, so release the connection
+        self.db.close()
+        return StreamingResponse(
+            progress_events(JobProgress(KIND_STORYBOARD, storyboard_id)),
+            media_type="text/event-stream",
+        )
+
     def get_storyboard_by_book_id(self, book_id: int):
         return self.storyboard_repo.get_by_book_id(book_id)
 
     def continue_storyboard(self, storyboard_id: int):
         try:
             storyboard = self.storyboard_repo.get_by_id(storyboard_id)
-            if storyboard.status not in [StoryboardStatus.CHARACTER_ARC_GENERATION_COMPLETED]:
+            if storyboard.status not in [
+                StoryboardStatus.NOT_STARTED,
+                StoryboardStatus.CHARACTER_ARC_GENERATION_COMPLETED,
+            ]:
                 raise StoryboardCannotBeContinuedException(storyboard_id, storyboard.status)
 
-            if storyboard.status == StoryboardStatus.CHARACTER_ARC_GENERATION_COMPLETED:
+            # Character arc generation was cancelled, it starts over without what it left
+            if storyboard.status == StoryboardStatus.NOT_STARTED:
+                self.character_arcs_repo.delete_by_type_and_source_id("STORYBOARD", storyboard.id)
+                storyboard = self.storyboard_repo.update(
+                    storyboard.id, status=StoryboardStatus.CHARACTER_ARC_GENERATION_IN_PROGRESS
+                )
+                add_generate_character_arcs_task_to_bg_jobs(
+                    storyboard.id, self.author_id(storyboard.book_id)
+                )
+
+            elif storyboard.status == StoryboardStatus.CHARACTER_ARC_GENERATION_COMPLETED:
                 storyboard = self.storyboard_repo.update(
                     storyboard.id, status=StoryboardStatus.PLOT_BEATS_GENERATION_IN_PROGRESS
                 )
-                add_generate_plot_beats_task_to_bg_jobs(storyboard.id)
+                add_generate_plot_beats_task_to_bg_jobs(
+                    storyboard.id, self.author_id(storyboard.book_id)
+                )
 
             return storyboard
         except Exception as e:
             logger.error(f"Error getting storyboard: {str(e)}")
             raise e
 
+    def cancel_storyboard(self, storyboard_id: int):
+        # Raises StoryboardNotFoundException; the running generator stops after its current
+        # LLM calls and moves the storyboard back to where it can be restarted from
+        self.storyboard_repo.get_by_id(storyboard_id)
+        cancel_storyboard_jobs(storyboard_id)
+
     async def generate_chapters_summary(self, storyboard_id: int, plot_beat_id: int):
         try:
             existing = self.storyboard_repo.get_by_id(storyboard_id)
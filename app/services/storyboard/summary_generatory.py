@@ -4,8 +4,11 @@ from typing import Any, Dict, List
 from sqlalchemy.orm import Session
 
 from app.repository.chapter_repository import ChapterRepository
+from app.repository.character_arcs_repository import CharacterArcsRepository
 from app.repository.plot_beat_repository import PlotBeatRepository
 from app.repository.storyboard_repository import StoryboardRepository
+from app.services.background_jobs.tasks import add_chapter_context_packs_task_to_bg_jobs
+from app.utils.character_matcher import get_character_matcher
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +20,7 @@ class SummarizerGenerator:
         self.plot_beat_repo = PlotBeatRepository(self.db)
         self.storyboard_repo = StoryboardRepository(self.db)
         self.chapter_repo = ChapterRepository(self.db)
+        self.character_arcs_repo = CharacterArcsRepository(self.db)
 
     async def initialize(self):
         if self.plot_beat_id:
@@ -31,13 +35,21 @@ class SummarizerGenerator:
             existing_chapters.sort(key=lambda ch: ch.chapter_no)
             starting_chapter_no = existing_chapters[-1].chapter_no + 1
 
+        character_ids = self.plot_beat.character_ids
+        if not character_ids:
+            # Beats whose characters were never identified, such as those edited by hand
+            character_arcs = self.character_arcs_repo.get_by_type_and_source_id(
+                "STORYBOARD", self.storyboard.id
+            )
+            character_ids = get_character_matcher(character_arcs).match(self.plot_beat.content)
+
         chapter_data = {
             "book_id": self.storyboard.book_id,
             "title": f"Chapter {starting_chapter_no}",
             "chapter_no": starting_chapter_no,
             "content": "",  # Initially empty content
             "source_text": self.plot_beat.content,
-            "character_ids": self.plot_beat.character_ids,
+            "character_ids": character_ids,
             "state": "DRAFT",
         }
 
@@ -48,6 +60,13 @@ class SummarizerGenerator:
             chapters_data = self.prepare_chapter_data()
             chapters = self.chapter_repo.batch_create(chapters_data, user_id=user_id)
             logger.info(f"Successfully created chapter for book {self.storyboard.book_id}")
+            chapter_nos = [chapter["chapter_no"] for chapter in chapters_data]
+            add_chapter_context_packs_task_to_bg_jobs(
+                self.db,
+                self.storyboard.book_id,
+                range(chapter_nos[0] - 1, chapter_nos[-1] + 1),
+                user_id,
+            )
             return chapters
         except Exception as e:
             logger.error(f"Error creating chapter: {str(e)}")
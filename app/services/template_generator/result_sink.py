@@ -0,0 +1,109 @@
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.enums import TemplateCheckpointStage
+from app.repository.chapter_repository import ChapterRepository
+from app.repository.template_checkpoint_repository import TemplateCheckpointRepository
+from app.schemas.schemas import TemplateStatusEnum
+from app.utils.exceptions import rollback_on_exception
+
+logger = logging.getLogger(__name__)
+
+
+class ResultSink:
+    """Write-behind buffer for template pipeline results.
+
+    Chapter summaries and stage checkpoints are collected as the concurrent LLM tasks finish
+    and written with bulk statements in one transaction per flush, instead of a query and a
+    commit per item on the shared session. A flush happens once MAX_PENDING writes or
+    FLUSH_INTERVAL_SECONDS have built up, and whenever the caller needs the results to be
+    visible to other jobs.
+    """
+
+    MAX_PENDING = 50
+    FLUSH_INTERVAL_SECONDS = 5.0
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.chapter_repo = ChapterRepository(db)
+        self.checkpoint_repo = TemplateCheckpointRepository(db)
+        self.summaries: Dict[int, Dict[str, Any]] = {}
+        self.checkpoints: Dict[Tuple[int, str, str], Dict[str, Any]] = {}
+        self.deleted_checkpoints: Dict[Tuple[int, TemplateCheckpointStage], Set[str]] = {}
+        self.last_flush = time.monotonic()
+
+    def save_summary(self, chapter_id: int, summary_text: str, fingerprint: Optional[str]):
+        self.summaries[chapter_id] = {
+            "id": chapter_id,
+            "source_text": summary_text,
+            "source_text_fingerprint": fingerprint,
+        }
+        self.maybe_flush()
+
+    def save_checkpoint(
+        self,
+        template_id: int,
+        stage: TemplateCheckpointStage,
+        item_key: str,
+        status: TemplateStatusEnum,
+        result_json: Any = None,
+        error: str = None,
+    ):
+        self.deleted_checkpoints.get((template_id, stage), set()).discard(item_key)
+        key = (template_id, stage.value, item_key)
+        attempts = self.checkpoints[key]["attempts"] if key in self.checkpoints else 0
+        self.checkpoints[key] = {
+            "template_id": template_id,
+            "stage": stage.value,
+            "item_key": item_key,
+            "status": status.value,
+            "result_json": result_json,
+            "error": error,
+            "attempts": attempts + 1,
+        }
+        self.maybe_flush()
+
+    def delete_checkpoints(
+        self,
+        template_id: int,
+        stage: TemplateCheckpointStage,
+        item_keys: Optional[List[str]] = None,
+    ):
+        # Drops pending writes too, so that a later flush cannot bring the rows back. Single
+        # items are deleted by the next flush, in the transaction that writes what replaces them.
+        for key in list(self.checkpoints):
+            if key[:2] == (template_id, stage.value) and (item_keys is None or key[2] in item_keys):
+                del self.checkpoints[key]
+        if item_keys is None:
+            self.deleted_checkpoints.pop((template_id, stage), None)
+            self.checkpoint_repo.delete_stage(template_id, stage)
+        else:
+            self.deleted_checkpoints.setdefault((template_id, stage), set()).update(item_keys)
+            self.maybe_flush()
+
+    def maybe_flush(self):
+        pending = len(self.summaries) + len(self.checkpoints) + len(self.deleted_checkpoints)
+        if (
+            pending >= self.MAX_PENDING
+            or time.monotonic() - self.last_flush >= self.FLUSH_INTERVAL_SECONDS
+        ):
+            self.flush()
+
+    @rollback_on_exception
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.summaries and not self.checkpoints and not self.deleted_checkpoints:
+            return
+        # On failure the session rolls back and the writes stay pending for the next flush
+        self.chapter_repo.bulk_update(list(self.summaries.values()))
+        self.checkpoint_repo.bulk_save(list(self.checkpoints.values()))
+        for (template_id, stage), item_keys in self.deleted_checkpoints.items():
+            self.checkpoint_repo.delete_items(template_id, stage, list(item_keys))
+        self.db.commit()
+        logger.info(
+            f"Flushed {len(self.summaries)} summaries and {len(self.checkpoints)} checkpoints"
+        )
+        self.summaries, self.checkpoints, self.deleted_checkpoints = {}, {}, {}
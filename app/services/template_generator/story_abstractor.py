@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
+import asyncio
 import logging
 from typing import Any, Dict, List
 
 from sqlalchemy.orm import Session
 
+from app.models.enums import TemplateCheckpointStage
 from app.models.models import Book
 from app.models.models import CharacterArc as CharacterArcModel
 from app.prompts.story_abstractor_prompts import (
@@ -12,12 +14,22 @@ from app.prompts.story_abstractor_prompts import (
 )
 from app.repository.character_arcs_repository import CharacterArcsRepository
 from app.repository.plot_beat_repository import PlotBeatRepository
-from app.repository.template_repository import TemplateRepository
+from app.repository.template_checkpoint_repository import TemplateCheckpointRepository
 from app.schemas.character_arcs import CharacterArc, CharacterArcContentJSON
 from app.schemas.schemas import TemplateStatusEnum
 from app.services.ai_service import get_openai_client
+from app.services.background_jobs.progress import (
+    KIND_TEMPLATE,
+    TEMPLATE_CHARACTER_ARC_TEMPLATE,
+    TEMPLATE_PLOT_BEAT_TEMPLATE,
+    JobProgress,
+)
+from app.services.template_generator.result_sink import ResultSink
 from app.utils.model_settings import ModelSettings
-from app.utils.story_abstractor_utils import process_character_abstractions
+from app.utils.story_abstractor_utils import (
+    abstract_character,
+    create_character_name_mappings,
+)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -30,7 +42,9 @@ class StoryAbstractor:
         self.db = db
         self.book = None
         self.template_id = template_id
-        self.template_repo = TemplateRepository(self.db)
+        self.checkpoint_repo = TemplateCheckpointRepository(self.db)
+        self.results = ResultSink(self.db)
+        self.progress = JobProgress(KIND_TEMPLATE, template_id)
         self.model_settings = None
 
         # Initialize AI client
@@ -57,7 +71,8 @@ class StoryAbstractor:
     async def read_character_arcs(self) -> List[CharacterArcModel]:
         repo = CharacterArcsRepository(self.db)
         arcs = repo.get_by_type_and_source_id("EXTRACTED", self.book_id)
-        return arcs
+        # A stable order keeps the char_N names the same when a run resumes
+        return sorted(arcs, key=lambda arc: arc.id)
 
     async def read_plot_beats(self) -> List[Dict[str, Any]]:
         plot_beats = []
@@ -67,147 +82,180 @@ class StoryAbstractor:
         beats = sorted(beats, key=lambda x: x.id, reverse=False)
         for beat in beats:
             if beat.content:
-                plot_beats.append({"content": beat.content})
+                plot_beats.append({"id": beat.id, "content": beat.content})
         return plot_beats
 
-    async def abstract_character_arcs(self, character_arcs: List[CharacterArcModel]):
+    def build_template_arc(self, abstraction: Dict[str, Any]) -> Dict[str, Any]:
+        name = abstraction.get("name", "")  # original_name of the character arc
+        content_json = abstraction.get("content_json", {})
+        archetype = abstraction.get("abstract_name", "")  # abstract_name of the character arc
+        role = ""
+        gender_age = ""
+        description = ""
+
+        # Extract role and gender/age if available from the first segment
+        if content_json:
+            # Check the first segment for required sections
+            first_segment = content_json.get("chapter_range_content", [{}])[0]
+            content = first_segment.get("content", "")
+            lines = content.split("\n")
+
+            # Extract role from header
+            for line in lines:
+                if line.startswith("# ") and " - " in line:
+                    role = line.split(" - ")[0][2:].strip()
+                    break
+
+            # Extract gender and age
+            for i, line in enumerate(lines):
+                if line.strip() == "## Gender and age":
+                    # Get content from the next line if available
+                    if i + 1 < len(lines):
+                        gender_age = lines[i + 1].strip()
+                        # Update content_json with gender and age information
+                        if first_segment.get("gender_age") is None:
+                            first_segment["gender_age"] = gender_age
+                        content_json["gender_age"] = gender_age
+                    break
+
+            # Extract description
+            for i, line in enumerate(lines):
+                if line.strip() == "## Description":
+                    # Get content from the next line if available
+                    if i + 1 < len(lines):
+                        # Find the end of the description (next ## section or end of content)
+                        desc_start = i + 1
+                        desc_end = desc_start
+                        for j in range(desc_start + 1, len(lines)):
+                            if lines[j].startswith("##"):
+                                desc_end = j - 1
+                                break
+                            desc_end = j
+
+                        # Join all description lines
+                        description = "\n".join(lines[desc_start : desc_end + 1]).strip()
+
+                        # Update content_json with description information
+                        if first_segment.get("description") is None:
+                            first_segment["description"] = description
+                        content_json["description"] = description
+                    break
+
+        return {
+            "name": name,
+            "type": "TEMPLATE",
+            "source_id": self.template_id,
+            "content_json": content_json,
+            "role": role,
+            "archetype": archetype,
+        }
+
+    async def abstract_character_arcs(self, character_arcs: List[CharacterArcModel]) -> bool:
         repo = CharacterArcsRepository(self.db)
         existing_arcs = repo.get_by_type_and_source_id("TEMPLATE", self.template_id)
         if existing_arcs:
             logger.info(f"Found {len(existing_arcs)} existing character arcs")
-            return
-
-        character_arc_objects = []
-        for arc in character_arcs:
-            character_arc_objects.append(
-                CharacterArc(
-                    name=arc.name,
-                    role=arc.role,
-                    content_json=CharacterArcContentJSON(**arc.content_json),
-                )
-            )
+            return True
 
-        logger.info(f"Async abstracting {len(character_arcs)} character arcs")
+        # Every character sees the full name mapping, so it is built before resuming
+        name_mappings = create_character_name_mappings(
+            [arc.name for arc in character_arcs if arc.name]
+        )
+
+        stage = TemplateCheckpointStage.CHARACTER_ARC_TEMPLATES
+        abstractions = self.checkpoint_repo.get_completed_results(self.template_id, stage)
+        pending_arcs = [arc for arc in character_arcs if str(arc.id) not in abstractions]
+        logger.info(
+            f"Async abstracting {len(pending_arcs)} character arcs "
+            f"({len(abstractions)} loaded from checkpoints)"
+        )
+        self.progress.start_stage(
+            TEMPLATE_CHARACTER_ARC_TEMPLATE,
+            total=len(character_arcs),
+            done=len(character_arcs) - len(pending_arcs),
+        )
 
         model, temperature = self.model_settings.character_arc_template()
-        try:
-            # Use the new process_character_abstractions utility function
-            character_abstractions = await process_character_abstractions(
-                character_arc_objects, self.client, model, temperature
-            )
 
-            # Convert results to match the expected output format of this function
-            results = {}
-            for abstraction in character_abstractions:
-                # Convert content_json to string if it's not already
-                name = abstraction.get("name", "")  # original_name of the character arc
-                content_json = abstraction.get("content_json", {})
-                archetype = abstraction.get(
-                    "abstract_name", ""
-                )  # abstract_name of the character arc
-                role = ""
-                gender_age = ""
-                description = ""
-
-                # Extract role and gender/age if available from the first segment
-                if content_json:
-                    # Check the first segment for required sections
-                    first_segment = content_json.get("chapter_range_content", [{}])[0]
-                    content = first_segment.get("content", "")
-                    lines = content.split("\n")
-
-                    # Extract role from header
-                    for line in lines:
-                        if line.startswith("# ") and " - " in line:
-                            role = line.split(" - ")[0][2:].strip()
-                            break
-
-                    # Extract gender and age
-                    for i, line in enumerate(lines):
-                        if line.strip() == "## Gender and age":
-                            # Get content from the next line if available
-                            if i + 1 < len(lines):
-                                gender_age = lines[i + 1].strip()
-                                # Update content_json with gender and age information
-                                if first_segment.get("gender_age") is None:
-                                    first_segment["gender_age"] = gender_age
-                                content_json["gender_age"] = gender_age
-                            break
-
-                    # Extract description
-                    for i, line in enumerate(lines):
-                        if line.strip() == "## Description":
-                            # Get content from the next line if available
-                            if i + 1 < len(lines):
-                                # Find the end of the description (next ## section or end of content)
-                                desc_start = i + 1
-                                desc_end = desc_start
-                                for j in range(desc_start + 1, len(lines)):
-                                    if lines[j].startswith("##"):
-                                        desc_end = j - 1
-                                        break
-                                    desc_end = j
-
-                                # Join all description lines
-                                description = "\n".join(lines[desc_start : desc_end + 1]).strip()
-
-                                # Update content_json with description information
-                                if first_segment.get("description") is None:
-                                    first_segment["description"] = description
-                                content_json["description"] = description
-                            break
-
-                # Save to database
-                repo.create(
-                    name=name,
-                    type="TEMPLATE",
-                    source_id=self.template_id,
-                    content_json=content_json,
-                    role=role,
-                    archetype=archetype,
+        async def abstract(arc: CharacterArcModel):
+            character_arc = CharacterArc(
+                name=arc.name,
+                role=arc.role,
+                content_json=CharacterArcContentJSON(**arc.content_json),
+            )
+            try:
+                abstraction = await abstract_character(
+                    character_arc, name_mappings, self.client, model, temperature
+                )
+            except Exception as e:
+                logger.error(f"Error abstracting character arc {arc.name}: {str(e)}")
+                self.results.save_checkpoint(
+                    self.template_id, stage, str(arc.id), TemplateStatusEnum.FAILED, error=str(e)
+                )
+                self.progress.advance(
+                    TEMPLATE_CHARACTER_ARC_TEMPLATE,
+                    error=f"Abstracting character arc {arc.name} failed: {e}",
                 )
+                return
+            self.results.save_checkpoint(
+                self.template_id,
+                stage,
+                str(arc.id),
+                TemplateStatusEnum.COMPLETED,
+                result_json=abstraction,
+            )
+            abstractions[str(arc.id)] = abstraction
+            self.progress.advance(TEMPLATE_CHARACTER_ARC_TEMPLATE)
 
-        except Exception as e:
-            logger.error(f"Error abstracting character arcs: {str(e)}")
-            # Return error for all arcs
-            results = {}
-            for name in character_abstractions:
-                results[name] = {
-                    "original_character": name,
-                    "abstract_arc": f"# Character Arc Template\n\nCould not generate abstraction due to an error: {str(e)}",
-                    "error": str(e),
-                }
-            return results
+        await asyncio.gather(*[abstract(arc) for arc in pending_arcs])
 
-    async def abstract_all_character_arcs(self):
-        logger.info("Abstracting all character arcs (batch mode)")
-        self.template_repo.update_character_arc_template_status(
-            self.template_id, TemplateStatusEnum.IN_PROGRESS
-        )
-        character_arcs = await self.read_character_arcs()
-        await self.abstract_character_arcs(character_arcs)
-        self.template_repo.update_character_arc_template_status(
-            self.template_id, TemplateStatusEnum.COMPLETED
+        failed = [arc for arc in character_arcs if str(arc.id) not in abstractions]
+        if failed:
+            logger.error(
+                f"{len(failed)}/{len(character_arcs)} character arcs failed to abstract; "
+                "rerun the template job to retry them"
+            )
+            return False
+
+        # Save all template arcs in one transaction, in the order of the extracted arcs
+        repo.batch_create(
+            [self.build_template_arc(abstractions[str(arc.id)]) for arc in character_arcs]
         )
+        self.results.delete_checkpoints(self.template_id, stage)
+        return True
 
-    async def abstract_plot_beats(self, plot_beats: List[Dict[str, Any]]):
-        import asyncio
+    async def abstract_all_character_arcs(self) -> bool:
+        logger.info("Abstracting all character arcs (batch mode)")
+        character_arcs = await self.read_character_arcs()
+        return await self.abstract_character_arcs(character_arcs)
 
+    async def abstract_plot_beats(self) -> bool:
         # Constants
         MAX_CONCURRENT_TASKS = 15  # Limit concurrent API calls
 
+        repo = PlotBeatRepository(self.db)
+        existing_beats = repo.get_by_source_id_and_type(self.template_id, "TEMPLATE")
+        if existing_beats:
+            logger.info(f"Found {len(existing_beats)} existing template plot beats")
+            return True
+
+        plot_beats = await self.read_plot_beats()
+        if not plot_beats:
+            logger.warning("No plot beats found")
+            return True
+
         model, temperature = self.model_settings.plot_beats_template()
 
         # Get character mappings from the already abstracted character arcs
         character_mappings = {}
-        if self.template_id is not None:
-            repo = CharacterArcsRepository(self.db)
-            character_arc_templates = repo.get_by_type_and_source_id("TEMPLATE", self.template_id)
-            for arc in character_arc_templates:
-                if arc.name and arc.archetype:
-                    character_mappings[arc.name] = arc.archetype
-            if character_mappings:
-                logger.info(f"Found {len(character_mappings)} character mappings from DB")
+        character_arc_templates = CharacterArcsRepository(self.db).get_by_type_and_source_id(
+            "TEMPLATE", self.template_id
+        )
+        for arc in character_arc_templates:
+            if arc.name and arc.archetype:
+                character_mappings[arc.name] = arc.archetype
+        if character_mappings:
+            logger.info(f"Found {len(character_mappings)} character mappings from DB")
 
         # Prepare character mapping information if available
         character_map_text = ""
@@ -219,8 +267,19 @@ class StoryAbstractor:
                 character_map_text += f"- {original} → {archetype}\n"
         logger.info(f"Character mapping text: {character_map_text}")
 
-        self.template_repo.update_plot_beat_template_status(
-            self.template_id, TemplateStatusEnum.IN_PROGRESS
+        # Beats abstracted by a previous run are keyed by the extracted plot beat ID
+        stage = TemplateCheckpointStage.PLOT_BEAT_TEMPLATES
+        abstractions = self.checkpoint_repo.get_completed_results(self.template_id, stage)
+        pending_beats = [
+            (beat_index, beat_data)
+            for beat_index, beat_data in enumerate(plot_beats)
+            if str(beat_data["id"]) not in abstractions
+        ]
+
+        self.progress.start_stage(
+            TEMPLATE_PLOT_BEAT_TEMPLATE,
+            total=len(plot_beats),
+            done=len(plot_beats) - len(pending_beats),
         )
 
         # Create a semaphore to limit concurrent API calls
@@ -250,88 +309,61 @@ class StoryAbstractor:
                         ],
                     )
                     abstract_content = response.choices[0].message.content.strip()
-                    logger.info(
-                        f"Successfully abstracted plot beat {beat_index+1}/{len(plot_beats)}"
-                    )
-                    return {"abstract_content": abstract_content, "success": True}
                 except Exception as e:
                     logger.error(
                         f"Error abstracting plot beat {beat_index+1}/{len(plot_beats)}: {str(e)}"
                     )
-                    error_content = f"# Narrative Skeleton\n\nCould not generate abstraction due to an error: {str(e)}"
-                    return {"abstract_content": error_content, "error": str(e), "success": False}
+                    self.results.save_checkpoint(
+                        self.template_id,
+                        stage,
+                        str(beat_data["id"]),
+                        TemplateStatusEnum.FAILED,
+                        error=str(e),
+                    )
+                    self.progress.advance(
+                        TEMPLATE_PLOT_BEAT_TEMPLATE,
+                        error=f"Abstracting plot beat {beat_index+1} failed: {e}",
+                    )
+                    return
+                self.results.save_checkpoint(
+                    self.template_id,
+                    stage,
+                    str(beat_data["id"]),
+                    TemplateStatusEnum.COMPLETED,
+                    result_json={"abstract_content": abstract_content},
+                )
+                abstractions[str(beat_data["id"])] = {"abstract_content": abstract_content}
+                self.progress.advance(TEMPLATE_PLOT_BEAT_TEMPLATE)
+                logger.info(f"Successfully abstracted plot beat {beat_index+1}/{len(plot_beats)}")
 
-        # Process all beats concurrently while preserving order, but with limited concurrency
         logger.info(
-            f"Starting concurrent processing of {len(plot_beats)} plot beats with max {MAX_CONCURRENT_TASKS} concurrent tasks"
+            f"Starting concurrent processing of {len(pending_beats)} plot beats "
+            f"({len(plot_beats) - len(pending_beats)} loaded from checkpoints) "
+            f"with max {MAX_CONCURRENT_TASKS} concurrent tasks"
+        )
+        await asyncio.gather(
+            *[process_beat(beat_index, beat_data) for beat_index, beat_data in pending_beats]
         )
-        tasks = [process_beat(i, beat_data) for i, beat_data in enumerate(plot_beats)]
-        results = await asyncio.gather(*tasks)
 
-        # Check if any processing failed
-        if any(not result.get("success", False) for result in results):
-            self.template_repo.update_plot_beat_template_status(
-                self.template_id, TemplateStatusEnum.FAILED
+        failed = [beat for beat in plot_beats if str(beat["id"]) not in abstractions]
+        if failed:
+            logger.error(
+                f"{len(failed)}/{len(plot_beats)} plot beats failed to abstract; "
+                "rerun the template job to retry them"
             )
+            return False
 
         # Save results to database in the original order using batch operation
-        abstract_beats = []
-        if self.template_id is not None:
-            repo = PlotBeatRepository(self.db)
-            # Prepare batch items
-            batch_items = [
+        repo.batch_create(
+            [
                 {
-                    "content": result["abstract_content"],
+                    "content": abstractions[str(beat["id"])]["abstract_content"],
                     "type": "TEMPLATE",
                     "source_id": self.template_id,
                 }
-                for result in results
-            ]
-
-            try:
-                repo.batch_create(batch_items)
-                logger.info(f"Successfully batch created {len(batch_items)} plot beats")
-            except Exception as e:
-                logger.error(f"Error in batch creation of plot beats: {str(e)}")
-                self.template_repo.update_plot_beat_template_status(
-                    self.template_id, TemplateStatusEnum.FAILED
-                )
-
-            # Prepare return data
-            abstract_beats = [
-                {"abstract_content": result["abstract_content"]} for result in results
+                for beat in plot_beats
             ]
-        else:
-            abstract_beats = [
-                {"abstract_content": result["abstract_content"]} for result in results
-            ]
-
-        self.template_repo.update_plot_beat_template_status(
-            self.template_id, TemplateStatusEnum.COMPLETED
         )
-        return abstract_beats
-
-    async def run_abstraction(self) -> Dict[str, Any]:
-        logger.info(f"Starting abstraction process for book {self.book_id}")
-        await self.initialize()
-
-        # Gather source data
-        character_arcs = await self.read_character_arcs()
-        plot_beats = await self.read_plot_beats()
-
-        # Check if we have the necessary data
-        if not character_arcs:
-            logger.warning("No character arcs found")
-
-        if not plot_beats:
-            logger.warning("No plot beats found")
-
-        # Step 1: Character Arcs
-        if character_arcs:
-            await self.abstract_all_character_arcs()
-
-        # Step 2: Plot Beats
-        if plot_beats:
-            await self.abstract_plot_beats(plot_beats)
-
-        logger.info("Abstraction process completed")
+        logger.info(f"Successfully batch created {len(plot_beats)} plot beats")
+        self.results.delete_checkpoints(self.template_id, stage)
+        return True
@@ -1,29 +1,52 @@
 #!/usr/bin/env python3
 import asyncio
+import contextlib
+import hashlib
 import logging
 import time
 import traceback
 from math import ceil
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from sqlalchemy.orm import Session
 
-from app.models.models import Book, Chapter
+from app.config import CHAPTER_SUMMARIES
+from app.models.enums import TemplateCheckpointStage
+from app.models.models import Book
 from app.prompts.story_extractor_prompts import (
+    CHAPTER_CHUNK_SUMMARY_USER_PROMPT_TEMPLATE,
+    CHAPTER_SUMMARY_PACKED_CHAPTER_TEMPLATE,
+    CHAPTER_SUMMARY_PACKED_USER_PROMPT_TEMPLATE,
+    CHAPTER_SUMMARY_REDUCE_USER_PROMPT_TEMPLATE,
     CHAPTER_SUMMARY_SYSTEM_PROMPT,
     CHAPTER_SUMMARY_USER_PROMPT_TEMPLATE,
     CHARACTER_ARC_EXTRACTION_SYSTEM_PROMPT,
 )
-from app.repository import chapter_repository
+from app.repository.chapter_repository import ChapterRepository
 from app.repository.character_arcs_repository import CharacterArcsRepository
+from app.repository.template_checkpoint_repository import TemplateCheckpointRepository
 from app.repository.template_repository import TemplateRepository
-from app.schemas.schemas import TemplateStatusEnum
+from app.schemas.character_arcs import CharacterArc
+from app.schemas.schemas import ChapterRecord, ChapterSummaries, TemplateStatusEnum
 from app.services.ai_service import get_openai_client
+from app.services.background_jobs.progress import (
+    KIND_TEMPLATE,
+    TEMPLATE_CHARACTER_ARC,
+    TEMPLATE_PLOT_BEATS,
+    TEMPLATE_SUMMARY,
+    JobProgress,
+)
+from app.services.template_generator.result_sink import ResultSink
 from app.utils.model_settings import ModelSettings
 from app.utils.story_extractor_utils import (
     CHAPTER_BATCH_SIZE,
+    CHARS_PER_TOKEN,
     consolidate_character_arcs,
+    pack_chapters_for_summary,
+    plain_text,
     process_chapter_batch_for_character_arcs,
+    split_text_into_chunks,
+    summary_fingerprint,
 )
 
 # Set up logging
@@ -41,8 +64,20 @@ class StoryExtractor:
         self.characters = []
         self.client = get_openai_client()
         self.template_id = template_id
-        self.template_repo = TemplateRepository(self.db)
+        self.chapter_repo = ChapterRepository(self.db)
+        self.checkpoint_repo = TemplateCheckpointRepository(self.db)
+        self.results = ResultSink(self.db)
+        self.progress = JobProgress(KIND_TEMPLATE, template_id)
         self.model_settings = None
+        # Set once every chapter of a CHAPTER_BATCH_SIZE batch has been summarized (or failed),
+        # so that arc extraction for that batch can start while later chapters are summarized
+        self.summarized_batches: List[asyncio.Event] = []
+        # Limit to 15 concurrent summary calls
+        self.summary_slots = asyncio.Semaphore(15)
+        self.chunked_chapter_slots = asyncio.Semaphore(3)
+        self.summaries_final = False
+        # Fingerprint of each chapter's content and summary settings, see summary_fingerprint
+        self.summary_fingerprints: Dict[int, str] = {}
 
     async def initialize(self):
         # Load book data
@@ -54,90 +89,361 @@ class StoryExtractor:
         self.model_settings = ModelSettings(self.db)
         logger.info("Initialized model settings")
 
-        # Load chapters in order
-        self.chapters = (
-            self.db.query(Chapter)
-            .filter(Chapter.book_id == self.book_id)
-            .order_by(Chapter.chapter_no)
-            .all()
-        )
-
-        # Double-check sorting to ensure chapters are in proper order
-        self.chapters.sort(key=lambda chapter: chapter.chapter_no)
-
+        # Load chapter records in order. The text of a chapter is loaded by the stage that
+        # needs it and released afterwards, so memory does not grow with the book.
+        self.chapters = self.chapter_repo.get_records_by_book_id(self.book_id)
         if not self.chapters:
             raise ValueError(f"No chapters found for book with ID {self.book_id}")
 
+        model, _ = self.model_settings.chapter_summary_for_template()
+        self.summary_fingerprints = {
+            chapter_id: summary_fingerprint(content, model)
+            for chapter_id, content in self.chapter_repo.stream_field(self.book_id, "content")
+        }
+
+        # TemplateManager skips a completed summary stage unless chapters changed since they
+        # were summarized, so no more summaries will arrive
+        template = TemplateRepository(self.db).get_by_id(self.template_id)
+        self.summaries_final = bool(
+            template
+            and template.summary_status == TemplateStatusEnum.COMPLETED
+            and not self.has_stale_summaries()
+        )
+
+        self.summarized_batches = [asyncio.Event() for _ in range(self.batch_count())]
+        for batch_num, event in enumerate(self.summarized_batches, 1):
+            if self.summaries_final or all(
+                self.has_current_summary(chapter) for chapter in self.batch_chapters(batch_num)
+            ):
+                event.set()
+
         logger.info(f"Loaded book: {self.book.title}")
         logger.info(f"Found {len(self.chapters)} chapters")
 
         return self.book, self.chapters
 
+    def initialize_chapter(self, chapter_id: int) -> Optional[ChapterRecord]:
+        # Loads and fingerprints only the one chapter, for refreshing its summary alone
+        self.model_settings = ModelSettings(self.db)
+        chapter = self.chapter_repo.get_record(self.book_id, chapter_id)
+        if not chapter:
+            return None
+        chapter.content = self.chapter_repo.get_field([chapter_id], "content").get(chapter_id)
+        model, _ = self.model_settings.chapter_summary_for_template()
+        self.summary_fingerprints = {chapter_id: summary_fingerprint(chapter.content, model)}
+        self.chapters = [chapter]
+        return chapter
+
     # Method removed and replaced with direct ModelSettings usage
 
-    async def summarize_chapter(self, chapter: Chapter) -> Dict[str, Any]:
-        if chapter.source_text:
-            summary_text = chapter.source_text
-            result = {
-                "chapter_id": chapter.id,
-                "chapter_title": chapter.title,
-                "chapter_number": chapter.chapter_no,
-                "original_length": len(chapter.content),
-                "summary_length": len(summary_text),
-                "summary": summary_text,
-                "compression_ratio": len(summary_text) / (len(chapter.content) or 1),
-                "timestamp": int(time.time()),
-            }
-            logger.info("Summary loaded from source_text")
-            return result
+    @contextlib.contextmanager
+    def loaded(self, chapters: List[ChapterRecord], field: str) -> Iterator[None]:
+        # Loads a text field ("content" or "source_text") of the chapters that do not hold it
+        # yet, and releases it again on exit. Summaries that are not flushed yet are read from
+        # the result sink.
+        missing = [chapter for chapter in chapters if getattr(chapter, field) is None]
+        if missing:
+            values = self.chapter_repo.get_field([chapter.id for chapter in missing], field)
+            for chapter in missing:
+                pending = self.results.summaries.get(chapter.id)
+                if pending and field in pending:
+                    values[chapter.id] = pending[field]
+            for chapter in missing:
+                setattr(chapter, field, values.get(chapter.id))
+        try:
+            yield
+        finally:
+            for chapter in missing:
+                setattr(chapter, field, None)
 
-        logger.info(f"Summarizing Chapter {chapter.chapter_no}: {chapter.title}")
+    def batch_count(self) -> int:
+        return ceil(len(self.chapters) / CHAPTER_BATCH_SIZE)
 
-        # Get model and temperature from settings
-        model, temperature = self.model_settings.chapter_summary_for_template()
+    def batch_chapters(self, batch_num: int) -> List[ChapterRecord]:
+        start = (batch_num - 1) * CHAPTER_BATCH_SIZE
+        return self.chapters[start : start + CHAPTER_BATCH_SIZE]
+
+    def batch_key(self, batch_num: int) -> str:
+        batch_chapters = self.batch_chapters(batch_num)
+        return f"{batch_chapters[0].chapter_no}-{batch_chapters[-1].chapter_no}"
+
+    def load_extracted_batches(self) -> Dict[int, List[CharacterArc]]:
+        checkpointed = self.checkpoint_repo.get_completed_results(
+            self.template_id, TemplateCheckpointStage.CHARACTER_ARC_BATCHES
+        )
+        batch_results = {}
+        for batch_num in range(1, self.batch_count() + 1):
+            if self.batch_key(batch_num) in checkpointed:
+                batch_results[batch_num] = [
+                    CharacterArc(**character)
+                    for character in checkpointed[self.batch_key(batch_num)]
+                ]
+        return batch_results
+
+    async def summarize_batch(self, batch_num: int) -> bool:
+        chapters = [
+            chapter
+            for chapter in self.batch_chapters(batch_num)
+            if not self.has_current_summary(chapter)
+        ]
+        results = await asyncio.gather(
+            *[self.summarize_chapters(group) for group in self.summary_groups(chapters)]
+        )
+        results = [result for group in results for result in group]
+        self.report_summaries(results)
+        return not any(result.get("error") for result in results)
+
+    def report_summaries(self, results: List[Dict[str, Any]]) -> None:
+        failed = [result["chapter_number"] for result in results if result.get("error")]
+        if len(results) > len(failed):
+            self.progress.advance(TEMPLATE_SUMMARY, len(results) - len(failed))
+        if failed:
+            self.progress.advance(
+                TEMPLATE_SUMMARY, len(failed), error=f"Summarizing chapters {failed} failed"
+            )
 
-        system_prompt = CHAPTER_SUMMARY_SYSTEM_PROMPT
-        user_prompt = CHAPTER_SUMMARY_USER_PROMPT_TEMPLATE.format(
-            chapter_title=chapter.title,
-            chapter_number=chapter.chapter_no,
-            chapter_content=chapter.content,
+    async def extract_batch(self, batch_num: int) -> Optional[List[CharacterArc]]:
+        # Checkpoints the batch either way, so that only failed batches are retried
+        try:
+            with self.loaded(self.batch_chapters(batch_num), "source_text"):
+                result = await process_chapter_batch_for_character_arcs(
+                    chapters=self.chapters,
+                    batch_number=batch_num,
+                    model_settings=self.model_settings,
+                    client=self.client,
+                    system_prompt=CHARACTER_ARC_EXTRACTION_SYSTEM_PROMPT,
+                    template_book_title=self.book.title,
+                    template_author=getattr(self.book, "author", "Unknown"),
+                )
+        except Exception as e:
+            self.results.save_checkpoint(
+                self.template_id,
+                TemplateCheckpointStage.CHARACTER_ARC_BATCHES,
+                self.batch_key(batch_num),
+                TemplateStatusEnum.FAILED,
+                error=str(e),
+            )
+            return None
+        self.results.save_checkpoint(
+            self.template_id,
+            TemplateCheckpointStage.CHARACTER_ARC_BATCHES,
+            self.batch_key(batch_num),
+            TemplateStatusEnum.COMPLETED,
+            result_json=[character.model_dump() for character in result],
+        )
+        return result
+
+    def summary_result(self, chapter: ChapterRecord, summary_text: str) -> Dict[str, Any]:
+        return {
+            "chapter_id": chapter.id,
+            "chapter_title": chapter.title,
+            "chapter_number": chapter.chapter_no,
+            "original_length": chapter.content_length,
+            "summary_length": len(summary_text),
+            "summary": summary_text,
+            "compression_ratio": len(summary_text)
+            / (chapter.content_length or 1),  # Avoid division by zero
+            "timestamp": int(time.time()),
+        }
+
+    def summary_groups(self, chapters: List[ChapterRecord]) -> List[List[ChapterRecord]]:
+        if not CHAPTER_SUMMARIES.PACKING:
+            return [[chapter] for chapter in chapters]
+        return pack_chapters_for_summary(
+            chapters,
+            CHAPTER_SUMMARIES.PACK_TOKEN_BUDGET,
+            CHAPTER_SUMMARIES.PACK_MAX_CHAPTERS,
+            CHAPTER_SUMMARIES.CHUNK_THRESHOLD_TOKENS,
         )
 
-        import asyncio
+    async def summarize_chapters(self, chapters: List[ChapterRecord]) -> List[Dict[str, Any]]:
+        with self.loaded(chapters, "content"):
+            if len(chapters) == 1:
+                return [await self.summarize_chapter(chapters[0])]
+            return await self.summarize_packed_chapters(chapters)
 
+    async def summarize_packed_chapters(
+        self, chapters: List[ChapterRecord]
+    ) -> List[Dict[str, Any]]:
+        chapter_numbers = [chapter.chapter_no for chapter in chapters]
+        logger.info(f"Summarizing chapters {chapter_numbers} in one call")
+
+        model, temperature = self.model_settings.chapter_summary_for_template()
+        user_prompt = CHAPTER_SUMMARY_PACKED_USER_PROMPT_TEMPLATE.format(
+            chapter_count=len(chapters),
+            chapters="".join(
+                CHAPTER_SUMMARY_PACKED_CHAPTER_TEMPLATE.format(
+                    chapter_title=chapter.title,
+                    chapter_number=chapter.chapter_no,
+                    chapter_content=chapter.content,
+                )
+                for chapter in chapters
+            ),
+        )
+
+        summaries: Dict[int, str] = {}
         try:
 
-            def blocking_openai_call():
-                return self.client.chat.completions.create(
+            def blocking_structured_call():
+                return self.client.beta.chat.completions.parse(
                     model=model,
                     messages=[
-                        {"role": "system", "content": system_prompt},
+                        {"role": "system", "content": CHAPTER_SUMMARY_SYSTEM_PROMPT},
                         {"role": "user", "content": user_prompt},
                     ],
                     temperature=temperature,
+                    response_format=ChapterSummaries,
                 )
 
-            response = await asyncio.to_thread(blocking_openai_call)
-            summary_text = response.choices[0].message.content
+            completion = await asyncio.to_thread(blocking_structured_call)
+            for entry in completion.choices[0].message.parsed.summaries:
+                if entry.chapter_number in chapter_numbers and entry.summary.strip():
+                    summaries[entry.chapter_number] = entry.summary.strip()
+        except Exception as e:
+            logger.error(f"Error summarizing chapters {chapter_numbers} in one call: {str(e)}")
+
+        for chapter in chapters:
+            if chapter.chapter_no in summaries:
+                self.set_summary(chapter, summaries[chapter.chapter_no])
+
+        # Chapters the packed response left out are summarized one call each
+        missing = [chapter for chapter in chapters if chapter.chapter_no not in summaries]
+        if missing:
+            logger.warning(
+                f"Falling back to per-chapter summaries for chapters "
+                f"{[chapter.chapter_no for chapter in missing]}"
+            )
+        fallback = await asyncio.gather(*[self.summarize_chapter(chapter) for chapter in missing])
+        results = {result["chapter_id"]: result for result in fallback}
+        return [
+            results.get(chapter.id) or self.summary_result(chapter, summaries[chapter.chapter_no])
+            for chapter in chapters
+        ]
+
+    def has_current_summary(self, chapter: ChapterRecord) -> bool:
+        # Summaries without a fingerprint were written by hand or before fingerprints existed
+        # and are kept as they are
+        if not chapter.has_summary:
+            return False
+        return chapter.summary_fingerprint in (None, self.summary_fingerprints.get(chapter.id))
+
+    def has_stale_summaries(self) -> bool:
+        return any(
+            chapter.has_summary and not self.has_current_summary(chapter)
+            for chapter in self.chapters
+        )
+
+    def set_summary(self, chapter: ChapterRecord, summary_text: str) -> None:
+        fingerprint = self.summary_fingerprints.get(chapter.id)
+        self.results.save_summary(chapter.id, summary_text, fingerprint)
+        chapter.has_summary, chapter.summary_fingerprint = True, fingerprint
 
-            # Create summary with metadata (for tracking in memory)
-            result = {
-                "chapter_id": chapter.id,
-                "chapter_title": chapter.title,
-                "chapter_number": chapter.chapter_no,
-                "original_length": len(chapter.content),
-                "summary_length": len(summary_text),
-                "summary": summary_text,
-                "compression_ratio": len(summary_text)
-                / (len(chapter.content) or 1),  # Avoid division by zero
-                "timestamp": int(time.time()),
-            }
+    def needs_chunking(self, chapter: ChapterRecord) -> bool:
+        return chapter.content_length // CHARS_PER_TOKEN > CHAPTER_SUMMARIES.CHUNK_THRESHOLD_TOKENS
+
+    async def complete_summary(self, user_prompt: str) -> str:
+        # Get model and temperature from settings
+        model, temperature = self.model_settings.chapter_summary_for_template()
+
+        def blocking_openai_call():
+            return self.client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": CHAPTER_SUMMARY_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt},
+                ],
+                temperature=temperature,
+            )
+
+        response = await asyncio.to_thread(blocking_openai_call)
+        return response.choices[0].message.content
+
+    async def summarize_chapter_in_chunks(self, chapter: ChapterRecord) -> Tuple[str, List[str]]:
+        # Parts are summarized in parallel and then combined. Each call takes its own
+        # summary slot, and part summaries are checkpointed by content hash so that a retry
+        # only redoes the parts that failed. Returns the summary and the part checkpoint keys.
+        chunks = split_text_into_chunks(plain_text(chapter.content), CHAPTER_SUMMARIES.CHUNK_TOKENS)
+        stage = TemplateCheckpointStage.CHAPTER_SUMMARY_CHUNKS
+        item_keys = [
+            f"{chapter.id}:{index}:{hashlib.sha1(chunk.encode()).hexdigest()[:16]}"
+            for index, chunk in enumerate(chunks)
+        ]
+        cached = self.checkpoint_repo.get_completed_results(self.template_id, stage)
+        logger.info(
+            f"Summarizing chapter {chapter.chapter_no} in {len(chunks)} parts, "
+            f"{sum(1 for key in item_keys if key in cached)} already summarized"
+        )
+
+        async def summarize_part(index: int, chunk: str) -> str:
+            if item_keys[index] in cached:
+                return cached[item_keys[index]]
+            async with self.summary_slots:
+                part_summary = await self.complete_summary(
+                    CHAPTER_CHUNK_SUMMARY_USER_PROMPT_TEMPLATE.format(
+                        chapter_title=chapter.title,
+                        chapter_number=chapter.chapter_no,
+                        part=index + 1,
+                        part_count=len(chunks),
+                        chunk_content=chunk,
+                    )
+                )
+            self.results.save_checkpoint(
+                self.template_id,
+                stage,
+                item_keys[index],
+                TemplateStatusEnum.COMPLETED,
+                result_json=part_summary,
+            )
+            return part_summary
+
+        part_summaries = await asyncio.gather(
+            *[summarize_part(index, chunk) for index, chunk in enumerate(chunks)]
+        )
+        async with self.summary_slots:
+            summary_text = await self.complete_summary(
+                CHAPTER_SUMMARY_REDUCE_USER_PROMPT_TEMPLATE.format(
+                    chapter_title=chapter.title,
+                    chapter_number=chapter.chapter_no,
+                    part_summaries="\n\n".join(
+                        f"### Part {index}\n{part_summary}"
+                        for index, part_summary in enumerate(part_summaries, 1)
+                    ),
+                )
+            )
+        return summary_text, item_keys
+
+    async def summarize_chapter(self, chapter: ChapterRecord) -> Dict[str, Any]:
+        # Expects the chapter content to be loaded, see summarize_chapters
+        if self.has_current_summary(chapter):
+            logger.info("Summary loaded from source_text")
+            with self.loaded([chapter], "source_text"):
+                return self.summary_result(chapter, chapter.source_text)
 
-            # Save the summary to the database
-            chapter.source_text = summary_text
-            chapter_repo = chapter_repository.ChapterRepository(self.db)
-            chapter_repo.update(chapter)
-            logger.info("Summary saved to database")
+        logger.info(f"Summarizing Chapter {chapter.chapter_no}: {chapter.title}")
+
+        try:
+            part_keys = []
+            if self.needs_chunking(chapter):
+                summary_text, part_keys = await self.summarize_chapter_in_chunks(chapter)
+            else:
+                summary_text = await self.complete_summary(
+                    CHAPTER_SUMMARY_USER_PROMPT_TEMPLATE.format(
+                        chapter_title=chapter.title,
+                        chapter_number=chapter.chapter_no,
+                        chapter_content=chapter.content,
+                    )
+                )
+
+            # Create summary with metadata (for tracking in memory)
+            result = self.summary_result(chapter, summary_text)
+
+            # Queue the summary for the next bulk write. The part summaries are dropped in the
+            # same write, so a crash before it leaves them for the retry.
+            self.set_summary(chapter, summary_text)
+            if part_keys:
+                self.results.delete_checkpoints(
+                    self.template_id, TemplateCheckpointStage.CHAPTER_SUMMARY_CHUNKS, part_keys
+                )
 
             return result
         except Exception as e:
@@ -151,49 +457,87 @@ class StoryExtractor:
                 "error": True,
             }
 
-    async def summarize_all_chapters(self) -> List[Dict[str, Any]]:
-        import time as _time
-
-        self.template_repo.update_summary_status(self.template_id, TemplateStatusEnum.IN_PROGRESS)
-
-        chapters_to_process = [chapter for chapter in self.chapters if not chapter.source_text]
+    async def summarize_all_chapters(self) -> bool:
+        # Summaries are saved on the chapter as they finish, so a rerun only retries the rest.
+        # Chapters edited since they were summarized are summarized again.
+        chapters_to_process = [
+            chapter for chapter in self.chapters if not self.has_current_summary(chapter)
+        ]
         logger.info(
             f"Found {len(chapters_to_process)} chapters that need summarization out of {len(self.chapters)} total chapters"
         )
 
         if not chapters_to_process:
             logger.info("All chapters already have summaries, skipping summarization")
-            self.template_repo.update_summary_status(self.template_id, TemplateStatusEnum.COMPLETED)
-            return []
-
-        # Use a semaphore to limit concurrency
-        import asyncio
-
-        semaphore = asyncio.Semaphore(15)  # Limit to 15 concurrent tasks
-
-        async def limited_summarize(chapter):
-            async with semaphore:
-                logger.info(f"[START] Summarizing chapter {chapter.chapter_no}: {chapter.title}")
-                start_time = _time.time()
-                result = await self.summarize_chapter(chapter)
-                elapsed = _time.time() - start_time
-                logger.info(
-                    f"[DONE] Chapter {chapter.chapter_no}: {chapter.title} summarized in {elapsed:.2f}s"
-                )
-                return result
+            return True
+        self.progress.start_stage(
+            TEMPLATE_SUMMARY,
+            total=len(self.chapters),
+            done=len(self.chapters) - len(chapters_to_process),
+        )
 
-        logger.info("[BATCH] Starting concurrent summarization of chapters...")
-        batch_start = _time.time()
-        tasks = [limited_summarize(chapter) for chapter in chapters_to_process]
-        results = await asyncio.gather(*tasks)
-        batch_elapsed = _time.time() - batch_start
+        # Chapters still to summarize per batch, to release each batch as soon as it is done
+        remaining = {}
+        for batch_num in range(1, self.batch_count() + 1):
+            remaining[batch_num] = sum(
+                1
+                for chapter in self.batch_chapters(batch_num)
+                if not self.has_current_summary(chapter)
+            )
+        batch_of = {
+            chapter.id: (index // CHAPTER_BATCH_SIZE) + 1
+            for index, chapter in enumerate(self.chapters)
+        }
+
+        async def limited_summarize(chapters):
+            label = ", ".join(f"{chapter.chapter_no}: {chapter.title}" for chapter in chapters)
+            # Chunked chapters take a summary slot for each of their calls instead, and fewer
+            # of them are held in memory at once
+            slot = self.summary_slots
+            if len(chapters) == 1 and self.needs_chunking(chapters[0]):
+                slot = self.chunked_chapter_slots
+            async with slot:
+                logger.info(f"[START] Summarizing chapter {label}")
+                start_time = time.time()
+                results = await self.summarize_chapters(chapters)
+                elapsed = time.time() - start_time
+                logger.info(f"[DONE] Chapter {label} summarized in {elapsed:.2f}s")
+            self.report_summaries(results)
+            for chapter in chapters:
+                batch_num = batch_of[chapter.id]
+                remaining[batch_num] -= 1
+                if not remaining[batch_num]:
+                    # Extraction reads the batch back, so its summaries are written first
+                    self.results.flush()
+                    self.summarized_batches[batch_num - 1].set()
+            return results
+
+        # With CHAPTER_SUMMARIES.PACKING, consecutive short chapters share one call
+        groups = self.summary_groups(chapters_to_process)
+        logger.info(
+            f"[BATCH] Starting concurrent summarization of {len(chapters_to_process)} chapters "
+            f"in {len(groups)} calls..."
+        )
+        batch_start = time.time()
+        # Chapters are queued in order, so batches complete roughly in order too
+        tasks = [limited_summarize(group) for group in groups]
+        try:
+            results = [result for group in await asyncio.gather(*tasks) for result in group]
+        finally:
+            self.results.flush()
+            # Never leave arc extraction waiting on a batch that will not complete
+            for event in self.summarized_batches:
+                event.set()
+        batch_elapsed = time.time() - batch_start
         logger.info(f"[BATCH] All chapter summaries complete in {batch_elapsed:.2f}s")
-        self.template_repo.update_summary_status(self.template_id, TemplateStatusEnum.COMPLETED)
-        return results
+        failed = [result["chapter_number"] for result in results if result.get("error")]
+        if failed:
+            logger.error(f"Failed to summarize chapters {failed}")
+        return not failed
 
     # The extract_characters_from_summaries method has been removed as it's now part of extract_character_arcs
 
-    async def analyze_all_plot_beats(self) -> List[Dict[str, Any]]:
+    async def analyze_all_plot_beats(self) -> bool:
         logger.info("Creating plot beats from chapter summaries")
 
         # Check for existing plot beats in the database
@@ -202,71 +546,51 @@ class StoryExtractor:
         plot_beat_repo = PlotBeatRepository(self.db)
         existing_plot_beats = plot_beat_repo.get_by_source_id_and_type(self.book_id, "EXTRACTED")
         if existing_plot_beats:
-            self.template_repo.update_plot_beats_status(
-                self.template_id, TemplateStatusEnum.COMPLETED
-            )
             logger.info(
                 f"Found {len(existing_plot_beats)} plot beats in the database for book_id {self.book_id}"
             )
-            return [
-                {"content": pb.content, "type": pb.type, "source_id": pb.source_id, "id": pb.id}
-                for pb in existing_plot_beats
-            ]
+            return True
 
         # If not found, create plot beats from chapter summaries
         logger.info("No plot beats found in the database, creating new plot beats")
-        self.template_repo.update_plot_beats_status(
-            self.template_id, TemplateStatusEnum.IN_PROGRESS
-        )
 
-        # Load all chapter summaries from the database (source_text)
+        # Stream all chapter summaries from the database (source_text)
         summaries = []
-        for chapter in self.chapters:
-            if chapter.source_text:
-                summaries.append(
-                    {
-                        "chapter_no": chapter.chapter_no,
-                        "title": chapter.title,
-                        "summary": chapter.source_text,
-                    }
-                )
+        chapter_numbers = {chapter.id: chapter.chapter_no for chapter in self.chapters}
+        for chapter_id, source_text in self.chapter_repo.stream_field(self.book_id, "source_text"):
+            if source_text:
+                summaries.append(source_text)
             else:
-                logger.warning(f"No summary (source_text) found for chapter {chapter.chapter_no}")
+                logger.warning(
+                    f"No summary (source_text) found for chapter {chapter_numbers.get(chapter_id)}"
+                )
 
         if not summaries:
             logger.error("No chapter summaries found for plot beat creation")
-            return [{"error": "No summaries available"}]
+            return False
 
         logger.info(f"Loaded {len(summaries)} chapter summaries for plot beat creation")
+        self.progress.start_stage(TEMPLATE_PLOT_BEATS, total=len(summaries))
 
-        # Save each chapter summary as a plot beat
-        all_results = []
+        # Save each chapter summary as a plot beat, all in one transaction so that a partial
+        # set is never mistaken for a finished stage
         try:
-            for summary in summaries:
-                plot_beat = plot_beat_repo.create(
-                    content=summary["summary"],
-                    type="EXTRACTED",
-                    source_id=self.book_id,
-                )
-                all_results.append(
-                    {
-                        "chapter_no": summary["chapter_no"],
-                        "content": plot_beat.content,
-                        "type": plot_beat.type,
-                        "source_id": plot_beat.source_id,
-                        "id": plot_beat.id,
-                    }
-                )
+            plot_beat_repo.batch_create(
+                [
+                    {"content": summary, "type": "EXTRACTED", "source_id": self.book_id}
+                    for summary in summaries
+                ]
+            )
         except Exception as e:
-            error_message = f"Error creating plot beats: {str(e)}"
-            logger.error(error_message)
+            logger.error(f"Error creating plot beats: {str(e)}")
             logger.error(traceback.format_exc())
-            return [{"error": error_message}]
+            self.progress.report_error(f"Creating plot beats failed: {e}")
+            return False
 
-        self.template_repo.update_plot_beats_status(self.template_id, TemplateStatusEnum.COMPLETED)
-        return all_results
+        self.progress.advance(TEMPLATE_PLOT_BEATS, len(summaries))
+        return True
 
-    async def extract_character_arcs(self) -> Dict[str, Any]:
+    async def extract_character_arcs(self) -> bool:
         logger.info("Extracting character arcs from chapter summaries in batches")
 
         # Step 1: Try to load character arcs from the database first
@@ -276,75 +600,76 @@ class StoryExtractor:
             logger.info(
                 f"Found {len(db_character_arcs)} character arcs in the database for book_id {self.book_id}"
             )
-            self.template_repo.update_character_arc_status(
-                self.template_id, TemplateStatusEnum.COMPLETED
-            )
-            return db_character_arcs
-
-        self.template_repo.update_character_arc_status(
-            self.template_id, TemplateStatusEnum.IN_PROGRESS
-        )
+            return True
 
-        # Step 2: Load all chapters with summaries
-        chapter_repo = chapter_repository.ChapterRepository(self.db)
-        chapters = chapter_repo.get_by_book_id(self.book_id)
-        chapters = [ch for ch in chapters if ch.source_text]
-        chapters.sort(key=lambda ch: ch.chapter_no)
+        # Step 2: Batches cover the book's chapters in order; each one waits for its own
+        # summaries only, so extraction runs alongside summarize_all_chapters
+        num_batches = self.batch_count()
+        logger.info(f"Will process chapters in {num_batches} batches of {CHAPTER_BATCH_SIZE}")
 
-        if not chapters:
-            logger.error("No chapter summaries found for character arc extraction")
-            self.template_repo.update_character_arc_status(
-                self.template_id, TemplateStatusEnum.FAILED
+        # Step 3: Reuse the batches a previous run already extracted
+        stage = TemplateCheckpointStage.CHARACTER_ARC_BATCHES
+        batch_results = self.load_extracted_batches()
+        pending_batches = [n for n in range(1, num_batches + 1) if n not in batch_results]
+        if batch_results:
+            logger.info(
+                f"Resuming character arc extraction: {len(batch_results)}/{num_batches} batches "
+                "loaded from checkpoints"
             )
-            return {"error": "No summaries available"}
-
-        logger.info(f"Loaded {len(chapters)} chapters with summaries for character arc extraction")
-
-        # Step 3: Calculate number of batches needed
-        num_batches = ceil(len(chapters) / CHAPTER_BATCH_SIZE)
-        logger.info(f"Will process chapters in {num_batches} batches of {CHAPTER_BATCH_SIZE}")
+        self.progress.start_stage(
+            TEMPLATE_CHARACTER_ARC, total=num_batches, done=len(batch_results)
+        )
 
         try:
-            # Step 4: Process chapters in batches of CHAPTER_BATCH_SIZE with controlled concurrency
+            # Step 4: Process the remaining batches with controlled concurrency
             # Limit to 15 concurrent batch processing tasks
             semaphore = asyncio.Semaphore(15)
 
             async def limited_batch_process(batch_num):
+                await self.summarized_batches[batch_num - 1].wait()
+                missing = [
+                    chapter.chapter_no
+                    for chapter in self.batch_chapters(batch_num)
+                    if not self.has_current_summary(chapter)
+                ]
+                # A failed summary fails the summary stage; extract the batch once it is retried
+                if missing and not self.summaries_final:
+                    logger.error(f"Skipping chapter batch {batch_num}, no summaries for {missing}")
+                    return
                 async with semaphore:
                     logger.info(f"[START] Processing chapter batch {batch_num}/{num_batches}")
                     start_time = time.time()
-                    result = await process_chapter_batch_for_character_arcs(
-                        chapters=chapters,
-                        batch_number=batch_num,
-                        model_settings=self.model_settings,
-                        client=self.client,
-                        system_prompt=CHARACTER_ARC_EXTRACTION_SYSTEM_PROMPT,
-                        template_book_title=self.book.title,
-                        template_author=getattr(self.book, "author", "Unknown"),
-                    )
+                    result = await self.extract_batch(batch_num)
+                    if result is None:
+                        self.progress.advance(
+                            TEMPLATE_CHARACTER_ARC,
+                            error=f"Extracting chapter batch {batch_num} failed",
+                        )
+                        return
+                    self.progress.advance(TEMPLATE_CHARACTER_ARC)
+                    batch_results[batch_num] = result
                     elapsed = time.time() - start_time
                     logger.info(
                         f"[DONE] Chapter batch {batch_num}/{num_batches} processed in {elapsed:.2f}s"
                     )
-                    return result
 
-            # Create tasks with controlled concurrency
-            batch_tasks = [
-                limited_batch_process(batch_num) for batch_num in range(1, num_batches + 1)
-            ]
-
-            # Wait for all batch processing to complete
             logger.info("[BATCH] Starting concurrent processing of chapter batches...")
             batch_start = time.time()
-            batch_results = await asyncio.gather(*batch_tasks)
+            await asyncio.gather(*[limited_batch_process(n) for n in pending_batches])
             batch_elapsed = time.time() - batch_start
             logger.info(f"[BATCH] All chapter batches processed in {batch_elapsed:.2f}s")
-            logger.info(f"Completed processing {num_batches} batches of chapters")
+
+            if len(batch_results) < num_batches:
+                logger.error(
+                    f"{num_batches - len(batch_results)}/{num_batches} chapter batches failed; "
+                    "rerun the template job to retry them"
+                )
+                return False
 
             # Step 5: Hierarchical consolidation of character references
             # First within mega-batches of 10 small batches (100 chapters), then across mega-batches
             consolidated_characters = await consolidate_character_arcs(
-                character_batches=batch_results,
+                character_batches=[batch_results[n] for n in range(1, num_batches + 1)],
                 model_settings=self.model_settings,
                 client=self.client,
                 mega_batch_size=10,  # Each mega-batch contains 10 small batches (100 chapters total)
@@ -352,49 +677,26 @@ class StoryExtractor:
 
             if not consolidated_characters:
                 logger.error("No character arcs were successfully extracted")
-                self.template_repo.update_character_arc_status(
-                    self.template_id, TemplateStatusEnum.FAILED
-                )
-                return {"error": "Failed to extract any character arcs"}
-
-            # Step 6: Save consolidated characters to the database
-            character_arcs_repo = CharacterArcsRepository(self.db)
-            character_arcs = []
-
-            for char in consolidated_characters:
-                logger.info(f"Saving consolidated character arc: {char.name} | {char.role}")
-                # Convert Pydantic model to dict before serializing to JSON
-                character_arc = character_arcs_repo.create(
-                    content_json=char.content_json.model_dump(),  # Convert Pydantic model to dict then JSON
-                    type="EXTRACTED",
-                    source_id=self.book_id,
-                    name=char.name,
-                    role=char.role,
-                )
-                logger.info(f"Saved consolidated character arc: {character_arc.name}")
-                character_arcs.append(character_arc)
+                return False
 
-            self.template_repo.update_character_arc_status(
-                self.template_id, TemplateStatusEnum.COMPLETED
+            # Step 6: Save consolidated characters to the database in one transaction
+            character_arcs_repo.batch_create(
+                [
+                    {
+                        "content_json": char.content_json.model_dump(),
+                        "type": "EXTRACTED",
+                        "source_id": self.book_id,
+                        "name": char.name,
+                        "role": char.role,
+                    }
+                    for char in consolidated_characters
+                ]
             )
-            return character_arcs
+            logger.info(f"Saved {len(consolidated_characters)} consolidated character arcs")
+            self.results.delete_checkpoints(self.template_id, stage)
+            return True
 
         except Exception as e:
-            error_message = f"Error extracting character arcs: {str(e)}\n{traceback.format_exc()}"
-            logger.error(error_message)
+            logger.error(f"Error extracting character arcs: {str(e)}")
             logger.error(traceback.format_exc())
-            self.template_repo.update_character_arc_status(
-                self.template_id, TemplateStatusEnum.FAILED
-            )
-            return {"error": error_message}
-
-    async def run_analysis(self) -> Dict[str, Any]:
-        logger.info(f"Starting analysis for book ID: {self.book_id}")
-
-        await self.summarize_all_chapters()
-
-        await self.extract_character_arcs()
-
-        await self.analyze_all_plot_beats()
-
-        logger.info("Analysis completed")
+            return False
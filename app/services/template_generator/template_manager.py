@@ -1,13 +1,54 @@
+import asyncio
 import logging
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
 from sqlalchemy.orm import Session
 
+from app.repository.template_repository import TemplateRepository
+from app.schemas.schemas import TemplateStatusEnum
+from app.services.background_jobs.cancellation import (
+    CancellationToken,
+    JobCancelledError,
+    report_cancelled,
+)
+from app.services.background_jobs.progress import KIND_TEMPLATE, JobProgress
 from app.services.template_generator.story_abstractor import StoryAbstractor
 from app.services.template_generator.story_extractor import StoryExtractor
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+# (template status column, stage coroutine returning whether every item completed,
+#  status columns of the stages that must complete before it starts)
+Stage = Tuple[str, Callable[[], Awaitable[bool]], Tuple[str, ...]]
+
+# LLM calls run through asyncio.to_thread. Summaries and arc batches allow 15 calls each and
+# now overlap, while the default pool is only os.cpu_count() + 4 threads wide.
+LLM_THREADS = 32
+
+# Event loops whose default executor is already sized for LLM calls
+_llm_executor_loops: "weakref.WeakSet[asyncio.AbstractEventLoop]" = weakref.WeakSet()
+
+
+def install_llm_executor(threads: int = LLM_THREADS) -> None:
+    """Give the running loop a default executor wide enough for concurrent LLM calls.
+
+    Only the first call per loop takes effect, so that jobs sharing a loop in AsyncWorker also
+    share its executor, which the worker sizes for all of them. The loop shuts the executor
+    down when it closes, waiting for calls that are still in flight.
+    """
+    loop = asyncio.get_running_loop()
+    if loop in _llm_executor_loops:
+        return
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=threads, thread_name_prefix="llm"))
+    _llm_executor_loops.add(loop)
+
+
+class TemplateStageFailedError(RuntimeError):
+    pass
+
 
 class TemplateManager:
     def __init__(self, book_id: int, db: Session = None):
@@ -15,31 +56,160 @@ class TemplateManager:
         self.db = db
         self.template = None
         self.template_id = None
+        self.template_repo = TemplateRepository(db)
+        self.progress = None
+
+    def stages(self, extractor: StoryExtractor, abstractor: StoryAbstractor) -> List[Stage]:
+        # Stages start as soon as their dependencies complete, so independent ones overlap.
+        # Arc extraction has no stage dependency: it waits for each batch of summaries inside
+        # StoryExtractor and so runs alongside summarization.
+        return [
+            ("summary_status", extractor.summarize_all_chapters, ()),
+            ("character_arc_status", extractor.extract_character_arcs, ()),
+            ("plot_beats_status", extractor.analyze_all_plot_beats, ("summary_status",)),
+            (
+                "character_arc_template_status",
+                abstractor.abstract_all_character_arcs,
+                ("character_arc_status",),
+            ),
+            (
+                "plot_beat_template_status",
+                abstractor.abstract_plot_beats,
+                ("plot_beats_status", "character_arc_template_status"),
+            ),
+        ]
+
+    async def run_stages(self, stages: List[Stage]):
+        completed: Dict[str, bool] = {}
+        for status_field, _, _ in stages:
+            if getattr(self.template, status_field) == TemplateStatusEnum.COMPLETED:
+                logger.info(f"Skipping {status_field}, already completed")
+                completed[status_field] = True
+
+        running: Dict[asyncio.Task, str] = {}
+        pending: Dict[str, TemplateStatusEnum] = {}
+        error: Optional[BaseException] = None
+        while True:
+            for status_field, run_stage, after in stages:
+                if status_field in completed or status_field in running.values():
+                    continue
+                if all(completed.get(dependency) for dependency in after):
+                    running[asyncio.create_task(run_stage())] = status_field
+                    pending[status_field] = TemplateStatusEnum.IN_PROGRESS
+            # Stages that finished and the stages they unblocked are recorded in one write
+            self.template_repo.update_status(self.template_id, **pending)
+            self.progress.set_stage_status(
+                **{
+                    status_field.removesuffix("_status"): status.value
+                    for status_field, status in pending.items()
+                }
+            )
+            pending = {}
+            if not running:
+                break
+
+            try:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            except asyncio.CancelledError:
+                # asyncio.wait leaves the stages running, they must stop before checkpoints flush
+                for task in running:
+                    task.cancel()
+                await asyncio.gather(*running, return_exceptions=True)
+                raise
+            for task in done:
+                status_field = running.pop(task)
+                if task.exception():
+                    error = error or task.exception()
+                    completed[status_field] = False
+                else:
+                    completed[status_field] = task.result()
+                pending[status_field] = (
+                    TemplateStatusEnum.COMPLETED
+                    if completed[status_field]
+                    else TemplateStatusEnum.FAILED
+                )
+
+        if error:
+            raise error
+        failed = [status_field for status_field, ok in completed.items() if not ok]
+        if failed:
+            raise TemplateStageFailedError(
+                f"Template {self.template_id} stages {failed} have failed items, "
+                "re-enqueue the job to retry them"
+            )
 
     async def run(self, template_id: int):
+        """Run every template stage that has not completed yet.
 
+        Stages checkpoint their items as they finish, so re-enqueueing a failed job skips the
+        completed stages and retries only the items that failed. Independent stages run
+        concurrently and their status changes are batched into as few writes as possible.
+        Returns None if the job was cancelled through its CancellationToken.
+        """
         try:
             self.template_id = template_id
-            logger.info(f"Created template with ID {self.template_id} for book {self.book_id}")
+            self.progress = JobProgress(KIND_TEMPLATE, template_id)
+            self.template = self.template_repo.get_by_id(template_id)
+            if not self.template:
+                raise ValueError(f"Template with ID {template_id} not found")
+            logger.info(f"Running template {self.template_id} for book {self.book_id}")
+            self.progress.reset()
+            self.progress.set_status(TemplateStatusEnum.IN_PROGRESS.value)
 
-            # Step 3: Run story extraction
             extractor = StoryExtractor(self.book_id, self.db, self.template_id)
             await extractor.initialize()
-            await extractor.run_analysis()
-            logger.info("Story extraction complete.")
-
-            # Step 4: Run story abstraction, passing template_id
+            if (
+                self.template.summary_status == TemplateStatusEnum.COMPLETED
+                and extractor.has_stale_summaries()
+            ):
+                # Chapters were edited since they were summarized, summarize just those again
+                logger.info(f"Reopening summary_status of template {self.template_id}")
+                self.template_repo.update_status(
+                    self.template_id, summary_status=TemplateStatusEnum.NOT_STARTED
+                )
+                self.template = self.template_repo.get_by_id(template_id)
             abstractor = StoryAbstractor(self.book_id, self.db, self.template_id)
             await abstractor.initialize()
-            await abstractor.abstract_all_character_arcs()
-            plot_beats = await abstractor.read_plot_beats()
-            await abstractor.abstract_plot_beats(plot_beats)
-            logger.info("Story abstraction complete.")
+
+            install_llm_executor()
+            stages = self.stages(extractor, abstractor)
+            try:
+                await CancellationToken(KIND_TEMPLATE, template_id).run(self.run_stages(stages))
+            finally:
+                # Failed items are checkpointed too, so that a retry skips the rest
+                extractor.results.flush()
+                abstractor.results.flush()
 
             logger.info(
                 f"Template creation and abstraction complete for book {self.book_id} (template_id={self.template_id})"
             )
+            self.progress.set_status(TemplateStatusEnum.COMPLETED.value)
             return self.template_id
+        except JobCancelledError:
+            self.mark_cancelled([status_field for status_field, _, _ in stages])
+            return None
         except Exception as e:
             logger.error(f"Error in template manager: {e}")
+            if self.progress:
+                self.progress.set_status(TemplateStatusEnum.FAILED.value, error=str(e))
             raise e
+
+    def mark_cancelled(self, status_fields: List[str]):
+        report_cancelled(self.progress, KIND_TEMPLATE)
+        template = self.template_repo.get_by_id(self.template_id)
+        interrupted = {
+            status_field: TemplateStatusEnum.CANCELLED
+            for status_field in status_fields
+            if getattr(template, status_field) == TemplateStatusEnum.IN_PROGRESS
+        }
+        self.template_repo.update_status(self.template_id, **interrupted)
+        self.progress.set_stage_status(
+            **{
+                status_field.removesuffix("_status"): status.value
+                for status_field, status in interrupted.items()
+            }
+        )
+        self.progress.set_status(TemplateStatusEnum.CANCELLED.value)
+        logger.info(
+            f"Template {self.template_id} cancelled, interrupted stages {list(interrupted)}"
+        )
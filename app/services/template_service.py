@@ -1,44 +1,69 @@
 from typing import List
 
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
+from app.repository.book_repository import BookRepository
 from app.repository.character_arcs_repository import CharacterArcsRepository
 from app.repository.plot_beat_repository import PlotBeatRepository
 from app.repository.template_repository import TemplateRepository
 from app.schemas.schemas import TemplateRead, TemplateStatusEnum
-from app.services.background_jobs.tasks import add_template_creation_task_to_bg_jobs
+from app.services.background_jobs import job_lock
+from app.services.background_jobs.progress import (
+    KIND_TEMPLATE,
+    JobProgress,
+    TemplateProgress,
+    progress_events,
+)
+from app.services.background_jobs.tasks import (
+    add_template_creation_task_to_bg_jobs,
+    cancel_template_jobs,
+)
 
 
 class TemplateService:
     def __init__(self, db: Session):
+        self.db = db
         self.template_repo = TemplateRepository(db)
+        self.book_repo = BookRepository(db)
         self.character_arc_repo = CharacterArcsRepository(db)
         self.plot_beat_repo = PlotBeatRepository(db)
 
     def create_template(self, book_id: int, name: str) -> dict:
-        # Check if a template already exists for this book_id
-        existing = self.template_repo.get_by_book_id(book_id)
-        if existing:
-            add_template_creation_task_to_bg_jobs(book_id, existing.id)
-            return {
-                "error": f"A template already exists for book_id {book_id}",
-                "template_id": existing.id,
-            }
-        template = self.template_repo.create(
-            name=name,
-            book_id=book_id,
-            summary_status=TemplateStatusEnum.NOT_STARTED,
-            character_arc_status=TemplateStatusEnum.NOT_STARTED,
-            plot_beats_status=TemplateStatusEnum.NOT_STARTED,
-            character_arc_template_status=TemplateStatusEnum.NOT_STARTED,
-            plot_beat_template_status=TemplateStatusEnum.NOT_STARTED,
-        )
-        template_id = template.id
+        # Jobs are scheduled fairly between book authors
+        book = self.book_repo.get_by_id(book_id)
+        author_id = book.author_id if book else None
+        # Concurrent requests for the same book must not both create a template
+        with job_lock("create_template", book_id):
+            # Check if a template already exists for this book_id
+            existing = self.template_repo.get_by_book_id(book_id)
+            if existing:
+                # Resumes a failed build, or returns the job that is already running
+                add_template_creation_task_to_bg_jobs(book_id, existing.id, author_id)
+                return {
+                    "error": f"A template already exists for book_id {book_id}",
+                    "template_id": existing.id,
+                }
+            template = self.template_repo.create(
+                name=name,
+                book_id=book_id,
+                summary_status=TemplateStatusEnum.NOT_STARTED,
+                character_arc_status=TemplateStatusEnum.NOT_STARTED,
+                plot_beats_status=TemplateStatusEnum.NOT_STARTED,
+                character_arc_template_status=TemplateStatusEnum.NOT_STARTED,
+                plot_beat_template_status=TemplateStatusEnum.NOT_STARTED,
+            )
+            template_id = template.id
 
-        add_template_creation_task_to_bg_jobs(book_id, template_id)
+            add_template_creation_task_to_bg_jobs(book_id, template_id, author_id)
 
         return {"template_id": template_id, "status": template.summary_status}
 
+    def cancel_template(self, template_id: int) -> dict:
+        # The job stops after its current LLM calls and marks its stages CANCELLED
+        cancel_template_jobs(template_id)
+        return {"template_id": template_id, "cancel_requested": True}
+
     def get_templates(self) -> List[TemplateRead]:
         templates = self.template_repo.get_all_templates()
         return templates
@@ -55,3 +80,15 @@ class TemplateService:
 
     def get_template_row(self, template_id: int):
         return self.template_repo.get_by_id(template_id)
+
+    def get_template_progress(self, template_id: int) -> dict:
+        # Only fanned-out builds report batch progress, see TEMPLATE_JOBS.FAN_OUT
+        return TemplateProgress(template_id).get()
+
+    def stream_template_progress(self, template_id: int) -> StreamingResponse:
+        # The stream can stay open for hours and only reads Redis, so release the connection
+        self.db.close()
+        return StreamingResponse(
+            progress_events(JobProgress(KIND_TEMPLATE, template_id)),
+            media_type="text/event-stream",
+        )
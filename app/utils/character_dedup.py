@@ -0,0 +1,185 @@
+import re
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, FrozenSet, List, Set, Tuple
+
+HONORIFICS = {
+    "mr",
+    "mrs",
+    "ms",
+    "miss",
+    "mx",
+    "dr",
+    "prof",
+    "professor",
+    "sir",
+    "dame",
+    "lord",
+    "lady",
+    "madam",
+    "madame",
+    "captain",
+    "capt",
+    "uncle",
+    "aunt",
+    "master",
+    "mistress",
+}
+NON_WORD_PATTERN = re.compile(r"[^\w\s]")
+
+# Multi-word names this similar may be spelling variants, which only the LLM can tell
+FUZZY_MATCH_RATIO = 0.9
+
+
+class DisjointSet:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a: int, b: int) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            # Keep the smaller index as root so that clusters are ordered by first mention
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def name_tokens(name: str) -> Tuple[Tuple[str, ...], bool]:
+    # Lower-cased name words without punctuation or titles, and whether a title was present
+    words = NON_WORD_PATTERN.sub(" ", name.lower()).split()
+    tokens = tuple(word for word in words if word not in HONORIFICS)
+    # A bare title ("The Captain") is the whole name
+    if not tokens:
+        return tuple(words), False
+    return tokens, len(tokens) < len(words)
+
+
+def name_titles(name: str) -> FrozenSet[str]:
+    return frozenset(NON_WORD_PATTERN.sub(" ", name.lower()).split()) & HONORIFICS
+
+
+def canonical_name(names: List[str]) -> str:
+    # The most complete spelling wins, then the most frequent, then the first mentioned
+    counts = Counter(name.strip() for name in names)
+    order = {name: index for index, name in enumerate(counts)}
+    return max(
+        counts,
+        key=lambda name: (len(name_tokens(name)[0]), counts[name], -order[name]),
+    )
+
+
+def cluster_character_names(names: List[str]) -> Tuple[List[List[int]], List[bool]]:
+    """Group indices of names that obviously refer to the same character.
+
+    Merges names that are equal after normalising case, whitespace, punctuation and titles,
+    and a first name ("Elizabeth") or titled surname ("Mr. Darcy") that matches exactly one
+    full name. Names with different titles ("Mr. Smith", "Mrs. Smith") are never merged.
+    Returns the clusters, ordered by first mention, and for each one whether it is
+    ambiguous: it shares a name word with another cluster, it is a close spelling of another
+    cluster, it was kept apart by its title, or it is a lone single word that may be a
+    nickname. Only ambiguous clusters need an LLM to decide whether they are the same
+    character.
+    """
+    tokens = [name_tokens(name) for name in names]
+    clusters = DisjointSet(len(names))
+    # Titles of each cluster by its root, and the names whose cluster the LLM has to check
+    cluster_titles = {index: name_titles(name) for index, name in enumerate(names)}
+    flagged: Set[int] = set()
+
+    def merge(a: int, b: int) -> None:
+        root_a, root_b = clusters.find(a), clusters.find(b)
+        if root_a == root_b:
+            return
+        titles_a, titles_b = cluster_titles[root_a], cluster_titles[root_b]
+        if titles_a and titles_b and not titles_a & titles_b:
+            flagged.update((a, b))
+            return
+        clusters.union(root_a, root_b)
+        cluster_titles[clusters.find(root_a)] = titles_a | titles_b
+
+    # Exact matches after normalisation, one cluster per title. Untitled names only join
+    # when the titled ones agree, "Smith" may be either "Mr. Smith" or "Mrs. Smith".
+    roots_by_key: Dict[Tuple[str, ...], List[int]] = defaultdict(list)
+    untitled_by_key: Dict[Tuple[str, ...], List[int]] = defaultdict(list)
+    for index, (key, titled) in enumerate(tokens):
+        if not key:
+            continue
+        if not titled:
+            untitled_by_key[key].append(index)
+            continue
+        for root in roots_by_key[key]:
+            if not cluster_titles[clusters.find(root)] & cluster_titles[index]:
+                continue
+            merge(root, index)
+            break
+        else:
+            roots_by_key[key].append(index)
+    for key, indices in untitled_by_key.items():
+        for index in indices[1:]:
+            merge(indices[0], index)
+        if len(roots_by_key[key]) == 1:
+            merge(roots_by_key[key][0], indices[0])
+        else:
+            roots_by_key[key].insert(0, indices[0])
+    for roots in roots_by_key.values():
+        if len(roots) > 1:
+            flagged.update(roots)
+
+    # Spelling variants of multi-word names, compared within buckets of the same initials.
+    # "Mary Bennet" and "Mark Bennet" are as close as "Elizabeth" and "Elisabeth", so they
+    # are left to the LLM rather than merged.
+    buckets: Dict[Tuple[str, str], List[Tuple[str, ...]]] = defaultdict(list)
+    for key in roots_by_key:
+        if len(key) > 1:
+            buckets[(key[0][0], key[-1][0])].append(key)
+    for bucket in buckets.values():
+        keys = [" ".join(key) for key in bucket]
+        for i in range(len(bucket)):
+            for j in range(i + 1, len(bucket)):
+                matcher = SequenceMatcher(None, keys[i], keys[j])
+                if matcher.quick_ratio() >= FUZZY_MATCH_RATIO and (
+                    matcher.ratio() >= FUZZY_MATCH_RATIO
+                ):
+                    flagged.update(roots_by_key[bucket[i]] + roots_by_key[bucket[j]])
+
+    # Single words that name exactly one full-name cluster
+    full_by_first: Dict[str, Set[int]] = defaultdict(set)
+    full_by_last: Dict[str, Set[int]] = defaultdict(set)
+    for index, (key, _) in enumerate(tokens):
+        if len(key) > 1:
+            full_by_first[key[0]].add(clusters.find(index))
+            full_by_last[key[-1]].add(clusters.find(index))
+    for index, (key, titled) in enumerate(tokens):
+        if len(key) != 1:
+            continue
+        # "Mr. Darcy" is a surname, "Elizabeth" usually a first name
+        candidates = full_by_last[key[0]] if titled else full_by_first[key[0]]
+        if not candidates and not titled:
+            candidates = full_by_last[key[0]]
+        if len(candidates) == 1:
+            merge(next(iter(candidates)), index)
+
+    members: Dict[int, List[int]] = defaultdict(list)
+    for index in range(len(names)):
+        members[clusters.find(index)].append(index)
+    grouped = [members[root] for root in sorted(members)]
+
+    clusters_by_word: Dict[str, Set[int]] = defaultdict(set)
+    for cluster_index, group in enumerate(grouped):
+        for index in group:
+            for word in tokens[index][0]:
+                clusters_by_word[word].add(cluster_index)
+    ambiguous = [
+        (all(len(tokens[index][0]) < 2 for index in group) and len(group) == 1)
+        or any(index in flagged for index in group)
+        for group in grouped
+    ]
+    for cluster_ids in clusters_by_word.values():
+        if len(cluster_ids) > 1:
+            for cluster_index in cluster_ids:
+                ambiguous[cluster_index] = True
+    return grouped, ambiguous
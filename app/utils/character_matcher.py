@@ -0,0 +1,137 @@
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.models.models import CharacterArc
+from app.utils.character_dedup import name_tokens
+
+# Aliases shorter than this ("Al", "Jo") match too much unrelated text
+MIN_ALIAS_LENGTH = 3
+MATCHER_CACHE_SIZE = 64
+
+
+class CharacterMatcher:
+    """Finds the characters mentioned in a text in one pass over it.
+
+    Names, their aliases and char_N archetype tokens are compiled into an Aho-Corasick
+    automaton, so matching costs the length of the text however many characters there are.
+    Terms only match as whole words. Full names and archetypes match in any case, single words
+    ("Will", "Grace") only when capitalised, as they are often ordinary words too. Aliases
+    shared by several characters are dropped rather than guessed, which leaves them to the LLM.
+    """
+
+    def __init__(self, terms: Dict[str, Set[int]], capitalised_terms: Iterable[str] = ()):
+        # Node 0 is the root. Each node has its transitions, failure link and matched terms.
+        self.transitions: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.outputs: List[List[Tuple[int, Set[int], bool]]] = [[]]
+        capitalised_terms = set(capitalised_terms)
+        for term, character_ids in terms.items():
+            self.add(term, character_ids, term in capitalised_terms)
+        self.link()
+
+    def add(self, term: str, character_ids: Set[int], capitalised: bool = False) -> None:
+        node = 0
+        for char in term:
+            if char not in self.transitions[node]:
+                self.transitions.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+                self.transitions[node][char] = len(self.transitions) - 1
+            node = self.transitions[node][char]
+        self.outputs[node].append((len(term), character_ids, capitalised))
+
+    def link(self) -> None:
+        queue = deque(self.transitions[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.transitions[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.transitions[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.transitions[fallback].get(char, 0)
+                self.outputs[child] = self.outputs[child] + self.outputs[self.fail[child]]
+
+    def match(self, text: Optional[str]) -> List[int]:
+        """Return the IDs of the characters mentioned in text, in order of first mention."""
+        if not text:
+            return []
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # A few characters lower-case to several, keep the positions of the original
+            lowered = "".join(char if len(char.lower()) > 1 else char.lower() for char in text)
+        found: Dict[int, None] = {}
+        node = 0
+        for end, char in enumerate(lowered, 1):
+            while node and char not in self.transitions[node]:
+                node = self.fail[node]
+            node = self.transitions[node].get(char, 0)
+            for length, character_ids, capitalised in self.outputs[node]:
+                start = end - length
+                if capitalised and not text[start].isupper():
+                    continue
+                if is_word_boundary(lowered, start - 1) and is_word_boundary(lowered, end):
+                    found.update(dict.fromkeys(sorted(character_ids)))
+        return list(found)
+
+
+def is_word_boundary(text: str, index: int) -> bool:
+    return index < 0 or index >= len(text) or not (text[index].isalnum() or text[index] == "_")
+
+
+def character_terms(
+    character_arcs: List[CharacterArc],
+) -> Tuple[Dict[str, Set[int]], Set[str]]:
+    # The terms of each character, and those of them that only match when capitalised
+    terms: Dict[str, Set[int]] = {}
+    capitalised_terms: Set[str] = set()
+    alias_owners: Dict[str, Set[int]] = {}
+    for character_arc in character_arcs:
+        for term in (character_arc.name, character_arc.archetype):
+            if term and term.strip():
+                terms.setdefault(term.strip().lower(), set()).add(character_arc.id)
+        if not character_arc.name:
+            continue
+        # The name without titles, and the first and last names of multi-word names
+        tokens, _ = name_tokens(character_arc.name)
+        if len(character_arc.name.split()) == 1:
+            capitalised_terms.add(character_arc.name.strip().lower())
+        aliases = {" ".join(tokens)}
+        if len(tokens) > 1:
+            aliases.update((tokens[0], tokens[-1]))
+        for alias in aliases:
+            if len(alias) >= MIN_ALIAS_LENGTH:
+                alias_owners.setdefault(alias, set()).add(character_arc.id)
+
+    for alias, character_ids in alias_owners.items():
+        if alias not in terms and len(character_ids) == 1:
+            terms[alias] = character_ids
+            if " " not in alias:
+                capitalised_terms.add(alias)
+    # Archetypes ("char_1") are not words of the story and match in any case
+    for character_arc in character_arcs:
+        if character_arc.archetype:
+            capitalised_terms.discard(character_arc.archetype.strip().lower())
+    return terms, capitalised_terms
+
+
+_matchers: "OrderedDict[Tuple, CharacterMatcher]" = OrderedDict()
+
+
+def get_character_matcher(character_arcs: List[CharacterArc]) -> CharacterMatcher:
+    """Matcher for a storyboard's character arcs, built once per version of them."""
+    version = tuple(
+        sorted(
+            (character_arc.id, character_arc.name or "", character_arc.archetype or "")
+            for character_arc in character_arcs
+        )
+    )
+    matcher = _matchers.get(version)
+    if matcher is None:
+        matcher = CharacterMatcher(*character_terms(character_arcs))
+        _matchers[version] = matcher
+        if len(_matchers) > MATCHER_CACHE_SIZE:
+            _matchers.popitem(last=False)
+    else:
+        _matchers.move_to_end(version)
+    return matcher
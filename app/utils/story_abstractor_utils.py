@@ -77,7 +77,7 @@ async def abstract_blood_relations_with_llm(
         return abstracted_relations
     except Exception as e:
         logger.error(f"Error abstracting blood relations for {original_name}: {str(e)}")
-        return f"Error abstracting blood relations: {str(e)}"
+        raise
 
 
 async def parse_character_content_json(
@@ -155,12 +155,7 @@ async def abstract_character_chapter_content(
         }
     except Exception as e:
         logger.error(f"Error abstracting character chapter content for {original_name}: {str(e)}")
-        return {
-            "chapter_range": character_arc_content.chapter_range,
-            "abstract_content": f"Error abstracting content: {str(e)}",
-            "original_name": original_name,
-            "abstract_name": abstract_name,
-        }
+        raise
 
 
 async def abstract_character_content_json(
@@ -218,116 +213,51 @@ async def abstract_character_content_json(
     return abstractions
 
 
-async def process_character_abstractions(
-    character_arcs: List[CharacterArc], client, model, temperature
-) -> List[Dict[str, Any]]:
-    # Create character name mappings
-    character_names = [arc.name for arc in character_arcs if arc.name]
-    name_mappings = create_character_name_mappings(character_names)
-
-    # STEP 1: Abstract chapter content
-    abstraction_tasks = {}
-    for arc in character_arcs:
-        abstract_name = name_mappings.get(arc.name)
-        task = abstract_character_content_json(
-            arc.name,
-            arc.content_json.chapter_range_content,  # Pass only the chapter_range_content
+async def abstract_character(
+    character_arc: CharacterArc, name_mappings: Dict[str, str], client, model, temperature
+) -> Dict[str, Any]:
+    # Raises if any LLM call fails, so that the caller checkpoints the character as failed
+    # instead of saving an error message as template content
+    name = character_arc.name
+    abstract_name = name_mappings.get(name)
+
+    abstractions, abstracted_blood_relations = await asyncio.gather(
+        abstract_character_content_json(
+            name,
+            character_arc.content_json.chapter_range_content,
             abstract_name,
             name_mappings,  # Pass all character mappings
             client,
             model,
             temperature,
-        )
-        abstraction_tasks[arc.name] = task
-
-    # Execute all chapter content abstraction tasks concurrently
-    abstraction_results = {}
-
-    if abstraction_tasks:
-        # Get the names in a fixed order to match with results
-        names = list(abstraction_tasks.keys())
-        tasks = list(abstraction_tasks.values())
-
-        # Execute all tasks concurrently
-        all_abstractions = await asyncio.gather(*tasks)
-
-        # Match results back to character names
-        for i, name in enumerate(names):
-            abstract_name = name_mappings.get(name)
-            abstraction_results[name] = all_abstractions[i]
-            logger.info(f"Finished abstracting all chapter segments for {name} as {abstract_name}")
-
-    # STEP 2: Abstract blood relations
-    blood_relation_tasks = {}
-    for name in abstraction_results.keys():
-        abstract_name = name_mappings.get(name)
-
-        # Get the original character arc to access its blood_relations
-        original_arc = next((arc for arc in character_arcs if arc.name == name), None)
-
-        # Extract blood relations based on the content_json structure
-        blood_relations = original_arc.content_json.blood_relations
-
-        # Create an async task for blood relations abstraction using LLM
-        blood_relation_tasks[name] = abstract_blood_relations_with_llm(
-            blood_relations,
+        ),
+        abstract_blood_relations_with_llm(
+            character_arc.content_json.blood_relations,
             name,
             abstract_name,
-            name_mappings,  # Pass all character mappings
+            name_mappings,
             client,
             model,
             temperature,
-        )
-
-    # Execute all blood relations abstraction tasks concurrently
-    blood_relations_results = {}
-
-    if blood_relation_tasks:
-        # Get the names in a fixed order to match with results
-        br_names = list(blood_relation_tasks.keys())
-        br_tasks = list(blood_relation_tasks.values())
-
-        # Execute all tasks concurrently
-        all_blood_relations = await asyncio.gather(*br_tasks)
-
-        # Match results back to character names
-        for i, name in enumerate(br_names):
-            abstract_name = name_mappings.get(name)
-            blood_relations_results[name] = all_blood_relations[i]
-            logger.info(
-                f"Finished abstracting blood relations for {name} as {abstract_name}: {all_blood_relations[i]}"
-            )
-    else:
-        logger.info("No blood relations to abstract")
-
-    # STEP 3: Format final results combining chapter_range_content abstractions with blood relations abstractions
-    character_abstractions = []
-    for name, abstractions in abstraction_results.items():
-        abstract_name = name_mappings.get(name)
-
-        # Create chapter_range_content with abstracted segments
-        chapter_range_content = []
-        for chapter_abstraction in abstractions:
-            chapter_range_content.append(
-                {
-                    "chapter_range": chapter_abstraction.get("chapter_range", ""),
-                    "content": chapter_abstraction.get("abstract_content", ""),
-                }
-            )
-
-        # Get the abstracted blood relations
-        abstracted_blood_relations = blood_relations_results.get(name, "None")
+        ),
+    )
+    logger.info(f"Finished abstracting {name} as {abstract_name}")
 
-        character_abstractions.append(
+    # Create chapter_range_content with abstracted segments
+    chapter_range_content = []
+    for chapter_abstraction in abstractions:
+        chapter_range_content.append(
             {
-                "name": name,
-                "abstract_name": abstract_name,
-                "content_json": {
-                    "chapter_range_content": chapter_range_content,
-                    "blood_relations": abstracted_blood_relations,
-                },
+                "chapter_range": chapter_abstraction.get("chapter_range", ""),
+                "content": chapter_abstraction.get("abstract_content", ""),
             }
         )
 
-    logger.info("Completed all character abstractions including blood relations")
-    return character_abstractions
+    return {
+        "name": name,
+        "abstract_name": abstract_name,
+        "content_json": {
+            "chapter_range_content": chapter_range_content,
+            "blood_relations": abstracted_blood_relations,
+        },
+    }
@@ -1,15 +1,18 @@
 #!/usr/bin/env python3
 import asyncio
+import hashlib
 import json
 import logging
 import re
 import traceback
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup
 
-from app.models.models import Chapter
 from app.prompts.story_extractor_prompts import (
     BLOOD_RELATIONS_CONSOLIDATION_PROMPT_TEMPLATE,
     BLOOD_RELATIONS_CONSOLIDATION_SYSTEM_PROMPT,
+    CHAPTER_SUMMARY_PROMPT_VERSION,
     CHARACTER_ARC_EXTRACTION_USER_PROMPT_TEMPLATE,
     CHARACTER_CONSOLIDATION_PROMPT_TEMPLATE,
     CHARACTER_CONSOLIDATION_SYSTEM_PROMPT,
@@ -18,9 +21,12 @@ from app.schemas.character_arcs import (
     CharacterArc,
     CharacterArcContent,
     CharacterArcContentJSON,
+    CharacterArcNameGroup,
     CharacterArcNameGroups,
     CharacterReference,
 )
+from app.schemas.schemas import ChapterRecord
+from app.utils.character_dedup import canonical_name, cluster_character_names
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -28,10 +34,131 @@ logger = logging.getLogger(__name__)
 
 # Define constants
 CHAPTER_BATCH_SIZE = 10  # Number of chapters to process per batch
+CHARS_PER_TOKEN = 4  # Rough estimate for English prose
+
+# Character entries in the extraction output
+CHARACTER_BLOCK_PATTERN = re.compile(
+    r"CHARACTER:\s*([^\n]+)\s*\n"  # name line
+    r"FILE_START\s*\n"  # allow spaces before the newline
+    r"([\s\S]*?)"  # block content (non-greedy)
+    r"\s*FILE_END",  # optional spaces before FILE_END
+    re.DOTALL,
+)
+# Chapters uploaded through bulk_upload_chapters can still hold raw HTML
+HTML_TAG_PATTERN = re.compile(r"</?(p|br|div|span|h[1-6])\b[^>]*>", re.IGNORECASE)
+PARAGRAPH_SPLIT_PATTERN = re.compile(r"\n\s*")
+SENTENCE_SPLIT_PATTERN = re.compile(r"(?<=[.!?])\s+")
+ROLE_PATTERN = re.compile(r"## Role\n([^\n]+)")
+BLOOD_RELATIONS_PATTERN = re.compile(r"## Blood Relations\n([\s\S]*?)(?=\n## |\Z)")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text or "") // CHARS_PER_TOKEN
+
+
+def summary_fingerprint(content: str, model: str) -> str:
+    # Whitespace-only edits keep the fingerprint; a new model or prompt version changes it
+    normalized = " ".join((content or "").split())
+    key = f"{CHAPTER_SUMMARY_PROMPT_VERSION}:{model}:{normalized}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def plain_text(content: str) -> str:
+    if HTML_TAG_PATTERN.search(content or ""):
+        return BeautifulSoup(content, "html.parser").get_text("\n")
+    return content or ""
+
+
+def split_text_into_chunks(text: str, chunk_tokens: int) -> List[str]:
+    # Paragraphs are kept whole where they fit; longer ones are cut at sentence ends, and
+    # sentences longer than a chunk at chunk_tokens worth of characters
+    pieces: List[str] = []
+    for paragraph in PARAGRAPH_SPLIT_PATTERN.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= chunk_tokens:
+            pieces.append(paragraph)
+            continue
+        for sentence in SENTENCE_SPLIT_PATTERN.split(paragraph):
+            step = chunk_tokens * CHARS_PER_TOKEN
+            pieces.extend(sentence[i : i + step] for i in range(0, len(sentence), step))
+
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for piece in pieces:
+        tokens = estimate_tokens(piece)
+        if current and current_tokens + tokens > chunk_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def pack_chapters_for_summary(
+    chapters: List[ChapterRecord],
+    token_budget: int,
+    max_chapters: int,
+    chunk_threshold_tokens: int,
+) -> List[List[ChapterRecord]]:
+    # Consecutive chapters grouped up to token_budget; long chapters always get their own
+    # group. Chapters over chunk_threshold_tokens are summarised in parts, each part taking a
+    # summary slot, so a group holding one would wait on slots while holding one itself.
+    groups: List[List[ChapterRecord]] = []
+    current: List[ChapterRecord] = []
+    current_tokens = 0
+    for chapter in chapters:
+        tokens = chapter.content_length // CHARS_PER_TOKEN
+        if tokens > token_budget // 2 or tokens > chunk_threshold_tokens:
+            if current:
+                groups.append(current)
+                current, current_tokens = [], 0
+            groups.append([chapter])
+            continue
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_chapters):
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(chapter)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def parse_character_blocks(text: str, chapter_range: List[int]) -> List[CharacterArc]:
+    characters = []
+    for name, content in CHARACTER_BLOCK_PATTERN.findall(text):
+        # Extract the role and the Blood Relations section
+        role_match = ROLE_PATTERN.search(content)
+        role = role_match.group(1).strip() if role_match else ""
+        blood_relations_match = BLOOD_RELATIONS_PATTERN.search(content)
+        blood_relations = blood_relations_match.group(1).strip() if blood_relations_match else ""
+
+        characters.append(
+            CharacterArc(
+                name=name.strip(),
+                role=role,
+                content_json=CharacterArcContentJSON(
+                    chapter_range_content=[
+                        CharacterArcContent(
+                            chapter_range=chapter_range,
+                            content=content.strip(),
+                            blood_relations=blood_relations,
+                        )
+                    ],
+                    blood_relations=blood_relations,
+                ),
+            )
+        )
+    return characters
 
 
 async def process_chapter_batch_for_character_arcs(
-    chapters: List[Chapter],
+    chapters: List[ChapterRecord],
     batch_number: int,
     model_settings,
     client,
@@ -94,56 +221,14 @@ async def process_chapter_batch_for_character_arcs(
 
         character_markdown_content = response.choices[0].message.content
 
-        # Extract individual character entries using regex
-        pattern = re.compile(
-            r"CHARACTER:\s*([^\n]+)\s*\n"  # name line
-            r"FILE_START\s*\n"  # allow spaces before the newline
-            r"([\s\S]*?)"  # block content (non-greedy)
-            r"\s*FILE_END",  # optional spaces before FILE_END
-            re.DOTALL,
-        )
-
-        # Find all matches
-        matches = re.findall(pattern, character_markdown_content)
-        logger.info(f"Found {len(matches)} characters in batch {batch_number}")
-
-        # Create character arc entries with Pydantic models
-        consolidated_characters = []
-        role_pattern = r"## Role\n([^\n]+)"
-
-        for name, content in matches:
-            # Extract the role using regex
-            role_match = re.search(role_pattern, content)
-            role = role_match.group(1).strip() if role_match else ""
-
-            # Extract Blood Relations section
-            blood_relations_pattern = r"## Blood Relations\n([\s\S]*?)(?=\n## |\Z)"
-            blood_relations_match = re.search(blood_relations_pattern, content)
-            blood_relations = (
-                blood_relations_match.group(1).strip() if blood_relations_match else ""
-            )
-
-            # Create consolidated character directly
-            consolidated_character = CharacterArc(
-                name=name.strip(),
-                role=role,
-                content_json=CharacterArcContentJSON(
-                    chapter_range_content=[
-                        CharacterArcContent(
-                            chapter_range=chapter_range,
-                            content=content.strip(),
-                            blood_relations=blood_relations,
-                        )
-                    ],
-                    blood_relations=blood_relations,
-                ),
-            )
-            consolidated_characters.append(consolidated_character)
+        consolidated_characters = parse_character_blocks(character_markdown_content, chapter_range)
+        logger.info(f"Found {len(consolidated_characters)} characters in batch {batch_number}")
 
         return consolidated_characters
     except Exception as e:
         logger.error(f"Error extracting character arcs for batch {batch_number}: {str(e)}")
-        return []  # Empty list of ConsolidatedCharacter objects
+        # Raised so that the caller checkpoints the batch as failed and retries only it
+        raise
 
 
 async def get_consolidated_character_groups(
@@ -257,11 +342,79 @@ async def build_consolidated_characters(
     return consolidated_characters
 
 
+async def consolidate_character_group(
+    character_lists: List[List[CharacterArc]],
+    model_settings,
+    client,
+    semaphore: asyncio.Semaphore,
+) -> List[CharacterArc]:
+    flattened: List[CharacterArc] = [char for characters in character_lists for char in characters]
+    names = [character.name for character in flattened]
+
+    # Merge the obvious duplicates locally and only ask the LLM about ambiguous clusters
+    clusters, ambiguous = cluster_character_names(names)
+    ambiguous_clusters = [cluster for cluster, unclear in zip(clusters, ambiguous) if unclear]
+    if len(ambiguous_clusters) < 2:
+        ambiguous_clusters = []
+    groups = [
+        CharacterArcNameGroup(
+            indices=cluster, canonical_name=canonical_name([names[i] for i in cluster])
+        )
+        for cluster, unclear in zip(clusters, ambiguous)
+        if not (unclear and ambiguous_clusters)
+    ]
+    logger.info(
+        f"Local pre-deduplication: {len(names)} references -> {len(clusters)} clusters, "
+        f"{len(ambiguous_clusters)} ambiguous sent to the LLM"
+    )
+
+    if ambiguous_clusters:
+        character_references = [
+            CharacterReference(index=idx, name=canonical_name([names[i] for i in cluster]))
+            for idx, cluster in enumerate(ambiguous_clusters)
+        ]
+        async with semaphore:
+            consolidated_groups = await get_consolidated_character_groups(
+                character_references, model_settings, client
+            )
+
+        resolved = set()
+        for group in consolidated_groups.groups:
+            cluster_ids = [
+                idx
+                for idx in dict.fromkeys(group.indices)
+                if 0 <= idx < len(ambiguous_clusters) and idx not in resolved
+            ]
+            if not cluster_ids or not group.canonical_name:
+                continue
+            resolved.update(cluster_ids)
+            groups.append(
+                CharacterArcNameGroup(
+                    indices=[i for idx in cluster_ids for i in ambiguous_clusters[idx]],
+                    canonical_name=group.canonical_name,
+                )
+            )
+        # Clusters the LLM left out, or all of them if the call failed, stay as they are
+        for idx, cluster in enumerate(ambiguous_clusters):
+            if idx not in resolved:
+                groups.append(
+                    CharacterArcNameGroup(
+                        indices=cluster, canonical_name=canonical_name([names[i] for i in cluster])
+                    )
+                )
+
+    # Keep characters in order of first mention
+    groups.sort(key=lambda group: min(group.indices))
+    return await build_consolidated_characters([flattened], CharacterArcNameGroups(groups=groups))
+
+
 async def consolidate_character_arcs(
     character_batches: List[List[CharacterArc]],
     model_settings,
     client,
     mega_batch_size: int = 10,  # Number of small batches per mega-batch
+    merge_fan_in: int = 8,  # Consolidated lists merged per call above the mega-batch level
+    max_concurrency: int = 15,
 ) -> List[CharacterArc]:
     if not character_batches or len(character_batches) == 0:
         return []
@@ -270,6 +423,9 @@ async def consolidate_character_arcs(
         f"Starting hierarchical consolidation of {len(character_batches)} character batches"
     )
 
+    # Shared by every consolidation and blood relations call below
+    semaphore = asyncio.Semaphore(max_concurrency)
+
     # Step 1: Group small batches into mega-batches
     mega_batches: List[List[List[CharacterArc]]] = []
     for i in range(0, len(character_batches), mega_batch_size):
@@ -280,64 +436,36 @@ async def consolidate_character_arcs(
         f"Created {len(mega_batches)} mega-batches from {len(character_batches)} original batches"
     )
 
-    # Step 2: Consolidate within each mega-batch
-    mega_batch_results: List[List[CharacterArc]] = []
-    for mb_idx, mega_batch in enumerate(mega_batches):
-        logger.info(f"Consolidating characters within mega-batch {mb_idx+1}/{len(mega_batches)}")
-
-        # Flatten the mega-batch
-        flattened_mega_batch: List[CharacterArc] = [char for batch in mega_batch for char in batch]
-
-        # Create character references for the flattened batch
-        character_references: List[CharacterReference] = []
-        for idx, character in enumerate(flattened_mega_batch):
-            character_references.append(CharacterReference(index=idx, name=character.name))
-
-        # Get consolidated groups from LLM
-        consolidated_groups = await get_consolidated_character_groups(
-            character_references, model_settings, client
-        )
-
-        # Build consolidated characters from the groups
-        consolidated_mega_batch = await build_consolidated_characters(
-            [flattened_mega_batch], consolidated_groups  # Pass as a single batch
-        )
-
-        mega_batch_results.append(consolidated_mega_batch)
+    # Step 2: Consolidate within each mega-batch, all mega-batches concurrently
+    level: List[List[CharacterArc]] = await asyncio.gather(
+        *[
+            consolidate_character_group(mega_batch, model_settings, client, semaphore)
+            for mega_batch in mega_batches
+        ]
+    )
+    for mb_idx, consolidated_mega_batch in enumerate(level):
         logger.info(
             f"Mega-batch {mb_idx+1} consolidated: {len(consolidated_mega_batch)} unique characters"
         )
 
-    # Step 3: Final consolidation across all mega-batches
-    final_characters = []
-
-    if len(mega_batch_results) == 1:
+    # Step 3: Tree reduction across mega-batches, merging merge_fan_in lists per call so that
+    # no single prompt has to hold the whole cast of a very long book
+    if len(level) == 1:
         logger.info("Only one mega-batch, skipping final consolidation step")
-        final_characters = mega_batch_results[0]
-    else:
-        logger.info(f"Performing final consolidation across {len(mega_batch_results)} mega-batches")
-
-        # Create character references for final consolidation
-        final_references: List[CharacterReference] = []
-        final_characters_flat: List[CharacterArc] = []
-
-        for batch in mega_batch_results:
-            for character in batch:
-                index = len(final_references)
-                final_references.append(CharacterReference(index=index, name=character.name))
-                final_characters_flat.append(character)
-
-        # Get final consolidated groups
-        final_groups = await get_consolidated_character_groups(
-            final_references, model_settings, client
-        )
 
-        # Build final consolidated characters
-        final_characters = await build_consolidated_characters(
-            [final_characters_flat], final_groups  # Treat as a single batch
-        )
+    async def merge(group: List[List[CharacterArc]]) -> List[CharacterArc]:
+        if len(group) == 1:
+            return group[0]
+        return await consolidate_character_group(group, model_settings, client, semaphore)
 
-        logger.info(f"Final consolidation complete: {len(final_characters)} unique characters")
+    depth = 0
+    while len(level) > 1:
+        depth += 1
+        groups = [level[i : i + merge_fan_in] for i in range(0, len(level), merge_fan_in)]
+        logger.info(f"Consolidation level {depth}: merging {len(level)} lists in {len(groups)}")
+        level = await asyncio.gather(*[merge(group) for group in groups])
+    final_characters = level[0]
+    logger.info(f"Final consolidation complete: {len(final_characters)} unique characters")
 
     # Ensure we have final characters before proceeding
     if not final_characters:
@@ -347,19 +475,22 @@ async def consolidate_character_arcs(
     # Consolidate blood relations separately for each final character
     logger.info(f"Starting blood relations consolidation for {len(final_characters)} characters")
     final_characters_with_blood_relations = await consolidate_blood_relations_for_all_characters(
-        final_characters, model_settings, client
+        final_characters, model_settings, client, semaphore
     )
 
     return final_characters_with_blood_relations
 
 
 async def consolidate_blood_relations_for_all_characters(
-    final_characters: List[CharacterArc], model_settings, client
+    final_characters: List[CharacterArc],
+    model_settings,
+    client,
+    semaphore: Optional[asyncio.Semaphore] = None,
 ) -> List[CharacterArc]:
-    result_characters = []
     logger.info(f"Processing blood relations for {len(final_characters)} characters")
+    semaphore = semaphore or asyncio.Semaphore(15)
 
-    for character in final_characters:
+    async def consolidate_character(character: CharacterArc) -> CharacterArc:
         logger.info(
             f"Processing blood relations for character: {character.name} | {character.role}"
         )
@@ -380,19 +511,24 @@ async def consolidate_blood_relations_for_all_characters(
         # Consolidate blood relations if available
         consolidated_blood_relations = ""
         if blood_relations_texts:
-            consolidated_blood_relations = await consolidate_blood_relations_text(
-                character.name, blood_relations_texts, model_settings, client
-            )
+            async with semaphore:
+                consolidated_blood_relations = await consolidate_blood_relations_text(
+                    character.name, blood_relations_texts, model_settings, client
+                )
 
         character.content_json.blood_relations = consolidated_blood_relations
         logger.info(
             f"Consolidated blood relations for character: {character.name} | {character.role} | {consolidated_blood_relations}"
         )
+        return character
 
-        result_characters.append(character)
+    # gather keeps the input order
+    result_characters = await asyncio.gather(
+        *[consolidate_character(character) for character in final_characters]
+    )
 
     logger.info("Blood relations consolidation completed for all characters")
-    return result_characters
+    return list(result_characters)
 
 
 async def consolidate_blood_relations_text(
@@ -0,0 +1,149 @@
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+# Metrics where a higher value in the candidate report is a regression
+LOWER_IS_BETTER = ("wall_s", "llm_calls", "prompt_tokens", "completion_tokens", "queries")
+PEAK_RSS = "peak_rss_mb"
+# Only in reports written with --tracemalloc
+PEAK_TRACED = "peak_traced_mb"
+MEMORY = (PEAK_RSS, PEAK_TRACED)
+# Micro-benchmark metrics, see benchmarks.micro
+MICRO_TIME = "median_s"
+MICRO_MEMORY = "peak_kb"
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def runs_by_size(report: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
+    return {run["chapters"]: run for run in report["runs"]}
+
+
+def change(base: Optional[float], head: Optional[float]) -> Optional[float]:
+    if base is None or head is None:
+        return None
+    if base == 0:
+        return 0.0 if head == 0 else float("inf")
+    return (head - base) / base
+
+
+def compare(
+    base: Dict[str, Any], head: Dict[str, Any], threshold: float, rss_threshold: float
+) -> Tuple[List[str], List[str]]:
+    lines, regressions = [], []
+    base_runs, head_runs = runs_by_size(base), runs_by_size(head)
+    for chapters in sorted(set(base_runs) & set(head_runs)):
+        base_run, head_run = base_runs[chapters], head_runs[chapters]
+        sections = [("total", base_run["total"], head_run["total"])]
+        for stage, head_stage in head_run["stages"].items():
+            sections.append((stage, base_run["stages"].get(stage, {}), head_stage))
+
+        lines.append(f"\n{chapters} chapters")
+        for section, base_metrics, head_metrics in sections:
+            for metric in LOWER_IS_BETTER + MEMORY + ("achieved_concurrency",):
+                delta = change(base_metrics.get(metric), head_metrics.get(metric))
+                if delta is None:
+                    continue
+                limit = rss_threshold if metric in MEMORY else threshold
+                flag = ""
+                if metric != "achieved_concurrency" and delta > limit:
+                    flag = "  REGRESSION"
+                    regressions.append(f"{chapters} chapters {section} {metric} {delta:+.1%}")
+                lines.append(
+                    f"  {section:<26} {metric:<22} {base_metrics[metric]:>12} -> "
+                    f"{head_metrics[metric]:<12} {delta:+.1%}{flag}"
+                )
+    return lines, regressions
+
+
+def compare_micro(
+    base: Dict[str, Any], head: Dict[str, Any], threshold: float, memory_threshold: float
+) -> Tuple[List[str], List[str]]:
+    lines, regressions = [], []
+    for name, head_case in head["cases"].items():
+        base_case = base["cases"].get(name)
+        if not base_case:
+            continue
+        for metric, limit in ((MICRO_TIME, threshold), (MICRO_MEMORY, memory_threshold)):
+            delta = change(base_case[metric], head_case[metric])
+            flag = ""
+            if delta > limit:
+                flag = "  REGRESSION"
+                regressions.append(f"{name} {metric} {delta:+.1%}")
+            lines.append(
+                f"  {name:<72} {metric:<10} {base_case[metric]:>12.6g} -> "
+                f"{head_case[metric]:<12.6g} {delta:+.1%}{flag}"
+            )
+    return lines, regressions
+
+
+def compare_load(
+    base: Dict[str, Any], head: Dict[str, Any], threshold: float
+) -> Tuple[List[str], List[str]]:
+    lines, regressions = [], []
+    sections = [("total", base["total"], head["total"])]
+    for name, head_endpoint in head["endpoints"].items():
+        if name in base["endpoints"]:
+            sections.append((name, base["endpoints"][name], head_endpoint))
+    sections.append(("loop_lag", {"latency": base["loop_lag"]}, {"latency": head["loop_lag"]}))
+
+    for name, base_block, head_block in sections:
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            base_value = base_block["latency"].get(metric)
+            head_value = head_block["latency"].get(metric)
+            delta = change(base_value, head_value)
+            if delta is None:
+                continue
+            flag = ""
+            if metric != "p50_ms" and delta > threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{name} {metric} {delta:+.1%}")
+            lines.append(
+                f"  {name:<18} {metric:<12} {base_value:>12.1f} -> {head_value:<12.1f} "
+                f"{delta:+.1%}{flag}"
+            )
+        if "error_rate" in head_block:
+            base_rate, head_rate = base_block["error_rate"], head_block["error_rate"]
+            # Error rates are compared in absolute terms: 0.1% -> 0.5% is a regression
+            flag = ""
+            if head_rate - base_rate > 0.005:
+                flag = "  REGRESSION"
+                regressions.append(f"{name} error_rate {base_rate:.2%} -> {head_rate:.2%}")
+            lines.append(
+                f"  {name:<18} {'error_rate':<12} {base_rate:>12.2%} -> {head_rate:<12.2%}{flag}"
+            )
+    return lines, regressions
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare two benchmark JSON reports of the same kind"
+    )
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    parser.add_argument("--rss-threshold", type=float, default=0.20)
+    args = parser.parse_args(argv)
+
+    base, head = load(args.base), load(args.head)
+    if base.get("benchmark") != head.get("benchmark"):
+        parser.error("Reports come from different benchmarks")
+    if base.get("benchmark") == "load_test":
+        lines, regressions = compare_load(base, head, args.threshold)
+    elif base.get("benchmark") == "micro":
+        lines, regressions = compare_micro(base, head, args.threshold, args.rss_threshold)
+    else:
+        lines, regressions = compare(base, head, args.threshold, args.rss_threshold)
+    print(f"{base.get('label')} -> {head.get('label')}")
+    print("\n".join(lines))
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+
+class FakeLLMServer:
+    """Run the fake LLM in a child process so it does not share the benchmark's event loop."""
+
+    def __init__(self, port: int = 8100, host: str = "127.0.0.1", **config: Any):
+        self.host = host
+        self.port = port
+        self.config = config
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def openai_url(self) -> str:
+        return f"{self.base_url}/v1"
+
+    def start(self, timeout: float = 15.0) -> "FakeLLMServer":
+        cmd = [sys.executable, "-m", "benchmarks.fake_llm", "--host", self.host]
+        cmd += ["--port", str(self.port)]
+        for key, value in self.config.items():
+            option = f"--{key.replace('_', '-')}"
+            if isinstance(value, bool):
+                cmd.append(option if value else f"--no-{key.replace('_', '-')}")
+            else:
+                cmd += [option, str(value)]
+        self.process = subprocess.Popen(cmd, env=os.environ.copy())
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if httpx.get(f"{self.base_url}/health", timeout=1).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            if self.process.poll() is not None:
+                raise RuntimeError("Fake LLM server exited during startup")
+            time.sleep(0.1)
+        self.stop()
+        raise RuntimeError(f"Fake LLM server did not start on {self.base_url}")
+
+    def stop(self) -> None:
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait(timeout=10)
+        self.process = None
+
+    def stats(self) -> Dict[str, Any]:
+        return httpx.get(f"{self.base_url}/_admin/stats", timeout=5).json()
+
+    def reset(self) -> None:
+        httpx.post(f"{self.base_url}/_admin/reset", timeout=5)
+
+    def configure(self, **values: Any) -> Dict[str, Any]:
+        return httpx.patch(f"{self.base_url}/_admin/config", json=values, timeout=5).json()
+
+    def __enter__(self) -> "FakeLLMServer":
+        """Start the server for the duration of a ``with`` block."""
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        """Stop the server when the ``with`` block exits."""
+        self.stop()
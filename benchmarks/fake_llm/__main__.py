@@ -0,0 +1,36 @@
+import argparse
+from dataclasses import fields
+
+import uvicorn
+
+from benchmarks.fake_llm.server import MODES, FakeLLMConfig, create_app
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the local OpenAI-compatible fake LLM")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--mode", choices=MODES, default="synthetic")
+    defaults = FakeLLMConfig()
+    for f in fields(FakeLLMConfig):
+        if f.name == "mode":
+            continue
+        default = getattr(defaults, f.name)
+        option = f"--{f.name.replace('_', '-')}"
+        if isinstance(default, bool):
+            parser.add_argument(option, action=argparse.BooleanOptionalAction, default=default)
+        elif default is None:
+            parser.add_argument(option, type=int, default=None)
+        else:
+            parser.add_argument(option, type=type(default), default=default)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = FakeLLMConfig(**{f.name: getattr(args, f.name) for f in fields(FakeLLMConfig)})
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
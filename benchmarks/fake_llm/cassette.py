@@ -0,0 +1,50 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+# Request fields that determine the response. Anything else (stream_options, user, ...) is
+# ignored. Whether the call streams is part of the key too, as the two are recorded and
+# replayed in different shapes.
+KEY_FIELDS = ("model", "messages", "temperature", "response_format", "tools", "max_tokens")
+
+
+def cassette_key(body: Dict[str, Any]) -> str:
+    relevant = {field: body.get(field) for field in KEY_FIELDS}
+    relevant["stream"] = bool(body.get("stream"))
+    payload = json.dumps(relevant, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class CassetteStore:
+    """One JSON file per recorded interaction, named after the request key."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        path = self._path(cassette_key(body))
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, body: Dict[str, Any], response: Dict[str, Any]) -> str:
+        key = cassette_key(body)
+        entry = {"key": key, "request": body, "response": response}
+        tmp_path = f"{self._path(key)}.tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self._path(key))
+        return key
+
+    def __len__(self) -> int:
+        """Return the number of recorded interactions."""
+        return sum(1 for name in os.listdir(self.directory) if name.endswith(".json"))
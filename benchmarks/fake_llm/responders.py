@@ -0,0 +1,221 @@
+import hashlib
+import json
+import random
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+WORDS = (
+    "the she he they said looked away moment room door night city office silence quietly "
+    "suddenly because before after again never always heart hand voice eyes smile glass "
+    "window phone message contract family secret marriage company meeting dinner car rain "
+    "promise truth lie anger fear hope love power money name house morning evening"
+).split()
+
+FALLBACK_NAMES = [
+    "Raegan Hayes",
+    "Mitchel Dixon",
+    "Lauren Murray",
+    "Kyler Dixon",
+    "Luciana Dixon",
+    "Tessa Dixon",
+    "Nicole Hart",
+    "Henley Brooks",
+]
+
+ROLES = [
+    "Female Protagonist",
+    "Male Protagonist",
+    "Antagonist",
+    "Supporting Character",
+    "Best Friend",
+    "Family Elder",
+]
+
+NAME_PATTERN = re.compile(r"\b([A-Z][a-z]{2,} [A-Z][a-z]{2,})\b")
+CHARACTER_REFERENCE_PATTERN = re.compile(r'"index":\s*(\d+),\s*"name":\s*"((?:[^"\\]|\\.)*)"')
+CHAR_ARCHETYPE_PATTERN = re.compile(r"\bchar_\d+\b")
+CHAPTER_NUMBER_PATTERN = re.compile(r"Chapter Number: (\d+)")
+# Length of each summary in a packed chapter summary response
+SUMMARY_TOKENS = 300
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough OpenAI-style estimate: one token per four characters
+    return max(1, len(text) // 4)
+
+
+def messages_text(messages: List[Dict[str, Any]]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content or "")
+    return "\n".join(parts)
+
+
+def request_seed(body: Dict[str, Any]) -> int:
+    digest = hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()
+    return int(digest[:16], 16)
+
+
+def lorem(rng: random.Random, n_tokens: int) -> str:
+    # The vocabulary averages about 1.5 tokens per word
+    words = [rng.choice(WORDS) for _ in range(max(1, n_tokens * 2 // 3))]
+    sentences = []
+    for i in range(0, len(words), 12):
+        sentence = " ".join(words[i : i + 12])
+        sentences.append(sentence[0].upper() + sentence[1:] + ".")
+    return " ".join(sentences)
+
+
+def names_in_prompt(prompt: str, limit: int = 6) -> List[str]:
+    names = []
+    for name in NAME_PATTERN.findall(prompt):
+        if name not in names:
+            names.append(name)
+        if len(names) >= limit:
+            break
+    return names or FALLBACK_NAMES[:limit]
+
+
+def character_blocks(rng: random.Random, prompt: str, n_tokens: int) -> str:
+    names = names_in_prompt(prompt)
+    per_character = max(40, n_tokens // len(names))
+    blocks = []
+    for name in names:
+        relative = rng.choice(FALLBACK_NAMES)
+        blocks.append(
+            f"CHARACTER: {name}\n"
+            "FILE_START\n"
+            f"# {name} - Character Arc\n\n"
+            f"## Description\n{lorem(rng, per_character // 2)}\n\n"
+            f"## Role\n{rng.choice(ROLES)}\n\n"
+            f"## Key Relationships\n{relative} - {lorem(rng, 12)}\n\n"
+            f"## Blood Relations\nFather: {relative.split()[0]}\n\n"
+            f"## Power Dynamics\n{lorem(rng, per_character // 4)}\n\n"
+            f"## Motivation\n{lorem(rng, per_character // 4)}\n"
+            "FILE_END"
+        )
+    return "\n\n".join(blocks)
+
+
+def scene_outline(rng: random.Random, n_tokens: int) -> str:
+    scene_count = rng.randint(3, 6)
+    per_scene = max(20, n_tokens // scene_count)
+    scenes = []
+    for number in range(1, scene_count + 1):
+        scenes.append(
+            f"<scene-{number}>\n<title>{lorem(rng, 4).rstrip('.')}</title>\n"
+            f"{lorem(rng, per_scene)}\n</scene-{number}>"
+        )
+    return "\n\n".join(scenes)
+
+
+def text_completion(body: Dict[str, Any], rng: random.Random, n_tokens: int) -> str:
+    prompt = messages_text(body.get("messages", []))
+    if "FILE_START" in prompt:
+        return character_blocks(rng, prompt, n_tokens)
+    if "<scene-" in prompt:
+        return scene_outline(rng, n_tokens)
+    archetypes = sorted(set(CHAR_ARCHETYPE_PATTERN.findall(prompt)))
+    text = lorem(rng, n_tokens)
+    if archetypes:
+        # Keep archetype tokens flowing through abstraction prompts
+        text = f"{' and '.join(archetypes[:3])} {text}"
+    return text
+
+
+def character_name_groups(body: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    prompt = messages_text(body.get("messages", []))
+    groups: Dict[str, Dict[str, Any]] = {}
+    for index, name in CHARACTER_REFERENCE_PATTERN.findall(prompt):
+        key = " ".join(name.lower().split())
+        group = groups.setdefault(key, {"indices": [], "canonical_name": name})
+        group["indices"].append(int(index))
+    return {"groups": list(groups.values())}
+
+
+def chapter_summaries(body: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    prompt = messages_text(body.get("messages", []))
+    return {
+        "summaries": [
+            {"chapter_number": int(number), "summary": lorem(rng, SUMMARY_TOKENS)}
+            for number in dict.fromkeys(CHAPTER_NUMBER_PATTERN.findall(prompt))
+        ]
+    }
+
+
+# Responders for structured outputs whose fields must be consistent with the prompt.
+# Keyed by the response_format json_schema name (the Pydantic model name).
+STRUCTURED_RESPONDERS: Dict[str, Callable[[Dict[str, Any], random.Random], Dict[str, Any]]] = {
+    "CharacterArcNameGroups": character_name_groups,
+    "ChapterSummaries": chapter_summaries,
+}
+
+
+def _resolve_ref(schema: Dict[str, Any], root: Dict[str, Any]) -> Dict[str, Any]:
+    ref = schema.get("$ref")
+    if not ref:
+        return schema
+    node: Any = root
+    for part in ref.lstrip("#/").split("/"):
+        node = node[part]
+    return node
+
+
+def schema_instance(
+    schema: Dict[str, Any], root: Dict[str, Any], rng: random.Random, depth: int = 0
+) -> Any:
+    schema = _resolve_ref(schema, root)
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    for combinator in ("anyOf", "oneOf"):
+        if combinator in schema:
+            options = [s for s in schema[combinator] if s.get("type") != "null"]
+            return schema_instance((options or schema[combinator])[0], root, rng, depth)
+
+    schema_type = schema.get("type")
+    if isinstance(schema_type, list):
+        schema_type = next((t for t in schema_type if t != "null"), "null")
+
+    if schema_type == "object":
+        properties = schema.get("properties", {})
+        return {
+            key: schema_instance(value, root, rng, depth + 1) for key, value in properties.items()
+        }
+    if schema_type == "array":
+        count = 0 if depth > 4 else rng.randint(1, 3)
+        return [
+            schema_instance(schema.get("items", {}), root, rng, depth + 1) for _ in range(count)
+        ]
+    if schema_type == "integer":
+        return rng.randint(1, 20)
+    if schema_type == "number":
+        return round(rng.random(), 3)
+    if schema_type == "boolean":
+        return rng.random() < 0.5
+    if schema_type == "null":
+        return None
+    return lorem(rng, 20)
+
+
+def structured_completion(body: Dict[str, Any], rng: random.Random) -> Optional[str]:
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") != "json_schema":
+        return None
+    json_schema = response_format.get("json_schema", {})
+    responder = STRUCTURED_RESPONDERS.get(json_schema.get("name"))
+    if responder:
+        return json.dumps(responder(body, rng))
+    schema = json_schema.get("schema", {})
+    return json.dumps(schema_instance(schema, schema, rng))
+
+
+def synthesize(body: Dict[str, Any], default_tokens: int) -> str:
+    rng = random.Random(request_seed(body))
+    structured = structured_completion(body, rng)
+    if structured is not None:
+        return structured
+    n_tokens = body.get("max_tokens") or body.get("max_completion_tokens") or default_tokens
+    return text_completion(body, rng, n_tokens)
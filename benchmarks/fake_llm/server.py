@@ -0,0 +1,381 @@
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from benchmarks.fake_llm.cassette import CassetteStore
+from benchmarks.fake_llm.responders import estimate_tokens, messages_text, synthesize
+
+MODES = ("synthetic", "record", "replay")
+
+# Headers that must not be forwarded upstream when recording
+HOP_BY_HOP_HEADERS = {"host", "content-length", "connection", "accept-encoding"}
+
+
+@dataclass
+class FakeLLMConfig:
+    mode: str = "synthetic"
+    # Fixed network/queueing overhead added to every request
+    latency_ms: float = 50.0
+    jitter_ms: float = 0.0
+    # Time to first token (prefill) and decode speed
+    ttft_ms: float = 400.0
+    tokens_per_second: float = 60.0
+    # Completion length when the request does not set max_tokens
+    output_tokens: int = 300
+    # Probability of failing a request before any output, and of aborting a stream midway
+    error_rate: float = 0.0
+    error_status: int = 500
+    stream_abort_rate: float = 0.0
+    cassette_dir: str = "benchmarks/cassettes"
+    upstream_url: str = "https://api.portkey.ai/v1"
+    # In replay mode: fall back to synthetic output for unknown requests instead of failing
+    replay_fallback: bool = True
+    # In replay mode: "model" uses the latency model above, "recorded" reuses captured timings
+    replay_timing: str = "model"
+    seed: Optional[int] = None
+
+    def update(self, values: Dict[str, Any]) -> None:
+        known = {f.name: f.type for f in fields(self)}
+        for key, value in values.items():
+            if key not in known:
+                raise ValueError(f"Unknown config field: {key}")
+            setattr(self, key, value)
+        if self.mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+
+
+@dataclass
+class FakeLLMStats:
+    started_at: float = field(default_factory=time.monotonic)
+    calls: Dict[str, int] = field(
+        default_factory=lambda: {"completion": 0, "parse": 0, "stream": 0}
+    )
+    errors_injected: int = 0
+    streams_aborted: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+    replay_hits: int = 0
+    replay_misses: int = 0
+    recorded: int = 0
+    _busy_integral: float = 0.0
+    _last_change: float = field(default_factory=time.monotonic)
+
+    def _advance(self) -> None:
+        now = time.monotonic()
+        self._busy_integral += self.in_flight * (now - self._last_change)
+        self._last_change = now
+
+    def enter(self, kind: str, prompt_tokens: int) -> None:
+        self._advance()
+        self.calls[kind] += 1
+        self.prompt_tokens += prompt_tokens
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def exit(self) -> None:
+        self._advance()
+        self.in_flight -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._advance()
+        wall = max(time.monotonic() - self.started_at, 1e-9)
+        data = {k: v for k, v in asdict(self).items() if not k.startswith("_")}
+        data.pop("started_at")
+        data["total_calls"] = sum(self.calls.values())
+        data["wall_seconds"] = round(wall, 3)
+        # Time-weighted mean number of requests in flight since the last reset
+        data["avg_concurrency"] = round(self._busy_integral / wall, 3)
+        return data
+
+
+def request_kind(body: Dict[str, Any]) -> str:
+    if body.get("stream"):
+        return "stream"
+    if (body.get("response_format") or {}).get("type") == "json_schema":
+        return "parse"
+    return "completion"
+
+
+def error_response(status: int, message: str) -> JSONResponse:
+    error_type = "rate_limit_error" if status == 429 else "server_error"
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"message": message, "type": error_type, "code": str(status)}},
+    )
+
+
+def completion_body(model: str, content: str, prompt_tokens: int) -> Dict[str, Any]:
+    completion_tokens = estimate_tokens(content)
+    return {
+        "id": f"chatcmpl-fake-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content, "refusal": None},
+                "finish_reason": "stop",
+                "logprobs": None,
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def chunk_line(completion_id: str, model: str, delta: Dict[str, Any], finish_reason=None) -> str:
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
+def split_tokens(content: str) -> List[str]:
+    # Word-sized pieces keep whitespace attached so that joining them restores the text
+    pieces, current = [], ""
+    for char in content:
+        current += char
+        if char.isspace():
+            pieces.append(current)
+            current = ""
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def create_app(config: Optional[FakeLLMConfig] = None) -> FastAPI:
+    app = FastAPI(title="Fake LLM", description="OpenAI-compatible stand-in for benchmarks")
+    app.state.config = config or FakeLLMConfig()
+    app.state.stats = FakeLLMStats()
+    app.state.rng = random.Random(app.state.config.seed)
+    app.state.cassettes = CassetteStore(app.state.config.cassette_dir)
+
+    def cfg() -> FakeLLMConfig:
+        return app.state.config
+
+    async def network_delay() -> None:
+        delay = cfg().latency_ms + app.state.rng.uniform(0, cfg().jitter_ms)
+        await asyncio.sleep(delay / 1000)
+
+    def decode_seconds(n_tokens: int) -> float:
+        return n_tokens / cfg().tokens_per_second if cfg().tokens_per_second > 0 else 0.0
+
+    async def stream_tokens(
+        model: str, content: str, ttft_s: float, decode_s: float
+    ) -> AsyncIterator[str]:
+        completion_id = f"chatcmpl-fake-{uuid.uuid4().hex[:12]}"
+        await asyncio.sleep(ttft_s)
+        yield chunk_line(completion_id, model, {"role": "assistant", "content": ""})
+
+        tokens = split_tokens(content)
+        abort_at = None
+        if app.state.rng.random() < cfg().stream_abort_rate and tokens:
+            abort_at = app.state.rng.randint(0, len(tokens) - 1)
+
+        # Group tokens so that we do not schedule more than ~100 sleeps per second
+        per_token = decode_s / max(len(tokens), 1)
+        group = max(1, int(0.01 / per_token)) if per_token > 0 else len(tokens) or 1
+        for start in range(0, len(tokens), group):
+            if abort_at is not None and start >= abort_at:
+                app.state.stats.streams_aborted += 1
+                raise RuntimeError("Fake LLM stream aborted (injected)")
+            piece = "".join(tokens[start : start + group])
+            await asyncio.sleep(per_token * len(tokens[start : start + group]))
+            yield chunk_line(completion_id, model, {"content": piece})
+
+        yield chunk_line(completion_id, model, {}, finish_reason="stop")
+        yield "data: [DONE]\n\n"
+
+    async def tracked(iterator: AsyncIterator[str]) -> AsyncIterator[str]:
+        try:
+            async for line in iterator:
+                yield line
+        finally:
+            app.state.stats.exit()
+
+    async def record(request: Request, body: Dict[str, Any]):
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+        url = f"{cfg().upstream_url.rstrip('/')}/chat/completions"
+        started = time.monotonic()
+
+        if not body.get("stream"):
+            # Exits here whatever happens, record is called outside the handler's try
+            try:
+                async with httpx.AsyncClient(timeout=600) as client:
+                    upstream = await client.post(url, json=body, headers=headers)
+                elapsed_ms = (time.monotonic() - started) * 1000
+                if upstream.status_code == 200:
+                    app.state.cassettes.save(
+                        body,
+                        {"status": 200, "body": upstream.json(), "elapsed_ms": elapsed_ms},
+                    )
+                    app.state.stats.recorded += 1
+                # Relayed as is, error bodies of some providers are not JSON
+                return Response(
+                    content=upstream.content,
+                    status_code=upstream.status_code,
+                    media_type=upstream.headers.get("content-type"),
+                )
+            finally:
+                app.state.stats.exit()
+
+        async def relay() -> AsyncIterator[str]:
+            lines, ttft_ms = [], None
+            async with httpx.AsyncClient(timeout=600) as client:
+                async with client.stream("POST", url, json=body, headers=headers) as upstream:
+                    async for line in upstream.aiter_lines():
+                        if not line:
+                            continue
+                        if ttft_ms is None:
+                            ttft_ms = (time.monotonic() - started) * 1000
+                        lines.append(line)
+                        yield f"{line}\n\n"
+                    status = upstream.status_code
+            if status == 200:
+                app.state.cassettes.save(
+                    body,
+                    {
+                        "status": 200,
+                        "stream": lines,
+                        "ttft_ms": ttft_ms,
+                        "elapsed_ms": (time.monotonic() - started) * 1000,
+                    },
+                )
+                app.state.stats.recorded += 1
+
+        return StreamingResponse(tracked(relay()), media_type="text/event-stream")
+
+    async def replay_recorded(body: Dict[str, Any], entry: Dict[str, Any]):
+        response = entry["response"]
+        recorded_timing = cfg().replay_timing == "recorded"
+
+        if "stream" not in response:
+            content = response["body"]["choices"][0]["message"].get("content") or ""
+            if recorded_timing:
+                await asyncio.sleep(response.get("elapsed_ms", 0) / 1000)
+            else:
+                await network_delay()
+                await asyncio.sleep(cfg().ttft_ms / 1000 + decode_seconds(estimate_tokens(content)))
+            app.state.stats.completion_tokens += estimate_tokens(content)
+            app.state.stats.exit()
+            return JSONResponse(content=response["body"])
+
+        lines = response["stream"]
+        # Providers emit roughly one token per chunk
+        app.state.stats.completion_tokens += len(lines)
+        if recorded_timing:
+            ttft_s = (response.get("ttft_ms") or 0) / 1000
+            decode_s = max(response.get("elapsed_ms", 0) / 1000 - ttft_s, 0)
+        else:
+            ttft_s = (cfg().latency_ms + cfg().ttft_ms) / 1000
+            decode_s = decode_seconds(len(lines))
+
+        async def play() -> AsyncIterator[str]:
+            await asyncio.sleep(ttft_s)
+            per_line = decode_s / max(len(lines), 1)
+            for line in lines:
+                await asyncio.sleep(per_line)
+                yield f"{line}\n\n"
+
+        return StreamingResponse(tracked(play()), media_type="text/event-stream")
+
+    async def synthetic(body: Dict[str, Any], prompt_tokens: int):
+        model = body.get("model", "fake-model")
+        content = synthesize(body, cfg().output_tokens)
+        n_tokens = estimate_tokens(content)
+        app.state.stats.completion_tokens += n_tokens
+
+        if body.get("stream"):
+            ttft_s = (cfg().latency_ms + cfg().ttft_ms) / 1000
+            return StreamingResponse(
+                tracked(stream_tokens(model, content, ttft_s, decode_seconds(n_tokens))),
+                media_type="text/event-stream",
+            )
+
+        await network_delay()
+        await asyncio.sleep(cfg().ttft_ms / 1000 + decode_seconds(n_tokens))
+        app.state.stats.exit()
+        return JSONResponse(content=completion_body(model, content, prompt_tokens))
+
+    @app.post("/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt_tokens = estimate_tokens(messages_text(body.get("messages", [])))
+        app.state.stats.enter(request_kind(body), prompt_tokens)
+
+        if app.state.rng.random() < cfg().error_rate:
+            await network_delay()
+            app.state.stats.errors_injected += 1
+            app.state.stats.exit()
+            return error_response(cfg().error_status, "Injected error from fake LLM")
+
+        if cfg().mode == "record":
+            return await record(request, body)
+
+        try:
+            if cfg().mode == "replay":
+                entry = app.state.cassettes.load(body)
+                if entry:
+                    app.state.stats.replay_hits += 1
+                    return await replay_recorded(body, entry)
+                app.state.stats.replay_misses += 1
+                if not cfg().replay_fallback:
+                    app.state.stats.exit()
+                    return error_response(404, "No cassette recorded for this request")
+
+            return await synthetic(body, prompt_tokens)
+        except Exception:
+            app.state.stats.exit()
+            raise
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "mode": cfg().mode}
+
+    @app.get("/_admin/stats")
+    async def get_stats():
+        return app.state.stats.snapshot()
+
+    @app.post("/_admin/reset")
+    async def reset_stats():
+        in_flight = app.state.stats.in_flight
+        app.state.stats = FakeLLMStats()
+        app.state.stats.in_flight = in_flight
+        return {"status": "reset"}
+
+    @app.get("/_admin/config")
+    async def get_config():
+        return asdict(cfg())
+
+    @app.patch("/_admin/config")
+    async def patch_config(values: Dict[str, Any]):
+        try:
+            cfg().update(values)
+        except ValueError as e:
+            return error_response(400, str(e))
+        if "cassette_dir" in values:
+            app.state.cassettes = CassetteStore(cfg().cassette_dir)
+        if "seed" in values:
+            app.state.rng = random.Random(cfg().seed)
+        return asdict(cfg())
+
+    return app
@@ -0,0 +1,54 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+from app.auth import get_current_user
+from app.main import app
+
+# ASGI entrypoint for load tests: the real app, with Auth0 replaced by a fixed user holding
+# every permission and a probe that samples event-loop lag in each worker.
+#   gunicorn benchmarks.load_app:app -k uvicorn.workers.UvicornWorker -w 4
+
+BENCHMARK_USER = {
+    "user_id": "benchmark",
+    "permissions": [
+        "book:write",
+        "book:delete",
+        "storyboard:read",
+        "storyboard:write",
+        "template:read",
+        "template:write",
+    ],
+    "email": "benchmark@example.com",
+}
+
+LAG_INTERVAL = 0.05
+lag_samples: deque = deque(maxlen=20000)
+
+
+async def benchmark_user():
+    return BENCHMARK_USER
+
+
+async def sample_loop_lag():
+    # A sleep that wakes up late means something held the loop for that long
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        lag_samples.append(time.perf_counter() - start - LAG_INTERVAL)
+
+
+async def start_lag_probe():
+    app.state.lag_probe = asyncio.create_task(sample_loop_lag())
+
+
+@app.get("/_bench/loop-lag", include_in_schema=False)
+async def loop_lag():
+    samples = [round(lag * 1000, 3) for lag in lag_samples]
+    lag_samples.clear()
+    return {"pid": os.getpid(), "interval_ms": LAG_INTERVAL * 1000, "lag_ms": samples}
+
+
+app.dependency_overrides[get_current_user] = benchmark_user
+app.router.on_startup.append(start_lag_probe)
@@ -0,0 +1,461 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.fake_llm import FakeLLMServer
+from benchmarks.template_pipeline import git_revision
+
+API_PREFIX = "/vaani/api/v1"
+DEFAULT_DATABASE_URL = "sqlite:///benchmarks/.load_test.db"
+
+DEFAULT_PROFILE: Dict[str, Any] = {
+    "duration_s": 60,
+    "users": 20,
+    "ramp_s": 5,
+    "think_time_ms": 500,
+    "mix": {"chapter_list": 1},
+    "server": {"workers": 4, "timeout": 300, "extra_args": []},
+    "fake_llm": {"latency_ms": 50, "ttft_ms": 400, "tokens_per_second": 60, "output_tokens": 300},
+    "seed": {"chapters": 100, "words_per_chapter": 1500, "cast_size": 40},
+}
+
+
+@dataclass
+class Target:
+    """What the virtual users hit: ids discovered from the running app."""
+
+    book_id: int
+    chapter_ids: List[int]
+    rng: random.Random = field(default_factory=random.Random)
+
+    def chapter_id(self) -> int:
+        return self.rng.choice(self.chapter_ids)
+
+
+@dataclass
+class Sample:
+    scenario: str
+    start: float
+    latency: float
+    status: int
+    ttfb: Optional[float] = None
+    error: Optional[str] = None
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: List[Sample] = []
+        self.lag_ms: Dict[int, List[float]] = defaultdict(list)
+
+    async def request(
+        self,
+        client: httpx.AsyncClient,
+        scenario: str,
+        method: str,
+        path: str,
+        stream: bool = False,
+        **kwargs,
+    ) -> None:
+        start = time.perf_counter()
+        sample = Sample(scenario, start, 0.0, 0)
+        try:
+            if stream:
+                async with client.stream(method, path, **kwargs) as response:
+                    sample.status = response.status_code
+                    async for line in response.aiter_lines():
+                        if sample.ttfb is None and line:
+                            sample.ttfb = time.perf_counter() - start
+                        # Streams report failures in-band with a 200 status
+                        if line.startswith("data: error:"):
+                            sample.error = line[len("data: ") :][:200]
+            else:
+                response = await client.request(method, path, **kwargs)
+                sample.status = response.status_code
+                sample.ttfb = response.elapsed.total_seconds()
+            if sample.status >= 400 and not sample.error:
+                sample.error = f"HTTP {sample.status}"
+        except httpx.HTTPError as e:
+            sample.error = f"{type(e).__name__}: {e}"
+        sample.latency = time.perf_counter() - start
+        self.samples.append(sample)
+
+
+Scenario = Callable[[httpx.AsyncClient, Recorder, Target], Awaitable[None]]
+SCENARIOS: Dict[str, Scenario] = {}
+
+
+def scenario(name: str):
+    def register(fn: Scenario) -> Scenario:
+        SCENARIOS[name] = fn
+        return fn
+
+    return register
+
+
+@scenario("chapter_list")
+async def chapter_list(client, recorder, target):
+    await recorder.request(client, "chapter_list", "GET", f"/books/{target.book_id}/chapters")
+
+
+@scenario("chapter_read")
+async def chapter_read(client, recorder, target):
+    path = f"/books/{target.book_id}/chapters/{target.chapter_id()}"
+    await recorder.request(client, "chapter_read", "GET", path)
+
+
+@scenario("settings_read")
+async def settings_read(client, recorder, target):
+    await recorder.request(client, "settings_read", "GET", "/settings")
+
+
+@scenario("scene_generation")
+async def scene_generation(client, recorder, target):
+    path = f"/books/{target.book_id}/chapters/{target.chapter_id()}/generate-scenes"
+    body = {"user_prompt": "Outline the next scenes of this chapter."}
+    await recorder.request(client, "scene_generation", "POST", path, json=body)
+
+
+@scenario("content_stream")
+async def content_stream(client, recorder, target):
+    path = f"/books/{target.book_id}/chapters/{target.chapter_id()}/generate-content"
+    body = {"user_prompt": "Write the chapter from the scene breakdown."}
+    await recorder.request(client, "content_stream", "POST", path, stream=True, json=body)
+
+
+@scenario("chat_stream")
+async def chat_stream(client, recorder, target):
+    body = {"messages": [{"role": "user", "content": "Suggest a twist for the next chapter."}]}
+    await recorder.request(client, "chat_stream", "POST", "/chat/stream", stream=True, json=body)
+
+
+@scenario("chat_character")
+async def chat_character(client, recorder, target):
+    body = {
+        "messages": [{"role": "user", "content": "How do you feel about what happened?"}],
+        "character_name": "Raegan",
+        "chapter_id": target.chapter_id(),
+    }
+    await recorder.request(client, "chat_character", "POST", "/chat/character", json=body)
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(values: List[float]) -> Dict[str, Optional[float]]:
+    ms = [value * 1000 for value in values]
+    return {
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+        "max_ms": max(ms) if ms else None,
+        "mean_ms": statistics.fmean(ms) if ms else None,
+    }
+
+
+def summarize(recorder: Recorder, duration: float) -> Dict[str, Any]:
+    by_scenario: Dict[str, List[Sample]] = defaultdict(list)
+    for sample in recorder.samples:
+        by_scenario[sample.scenario].append(sample)
+
+    def block(samples: List[Sample]) -> Dict[str, Any]:
+        errors = [s for s in samples if s.error]
+        ttfb = [s.ttfb for s in samples if s.ttfb is not None and not s.error]
+        error_kinds: Dict[str, int] = defaultdict(int)
+        for sample in errors:
+            error_kinds[sample.error.split(":")[0]] += 1
+        return {
+            "requests": len(samples),
+            "errors": len(errors),
+            "error_rate": round(len(errors) / len(samples), 4) if samples else 0.0,
+            "throughput_rps": round(len(samples) / duration, 3),
+            "latency": latency_summary([s.latency for s in samples if not s.error]),
+            "ttfb": latency_summary(ttfb),
+            "error_kinds": dict(error_kinds),
+        }
+
+    all_lag = [lag for samples in recorder.lag_ms.values() for lag in samples]
+    return {
+        "total": block(recorder.samples),
+        "endpoints": {name: block(samples) for name, samples in sorted(by_scenario.items())},
+        "loop_lag": {
+            "samples": len(all_lag),
+            "p50_ms": percentile(all_lag, 50),
+            "p99_ms": percentile(all_lag, 99),
+            "max_ms": max(all_lag) if all_lag else None,
+            "workers": {
+                str(pid): {"p99_ms": percentile(lags, 99), "max_ms": max(lags)}
+                for pid, lags in recorder.lag_ms.items()
+                if lags
+            },
+        },
+    }
+
+
+async def poll_loop_lag(client: httpx.AsyncClient, recorder: Recorder, deadline: float):
+    # Each poll lands on one worker; over a run every worker gets sampled several times
+    while time.perf_counter() < deadline:
+        try:
+            data = (await client.get("/_bench/loop-lag")).json()
+            recorder.lag_ms[data["pid"]].extend(data["lag_ms"])
+        except (httpx.HTTPError, ValueError, KeyError):
+            pass
+        await asyncio.sleep(0.5)
+
+
+async def virtual_user(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    target: Target,
+    mix: Dict[str, float],
+    think_time: float,
+    start_delay: float,
+    deadline: float,
+    rng: random.Random,
+):
+    await asyncio.sleep(start_delay)
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        await SCENARIOS[name](client, recorder, target)
+        if think_time:
+            # Exponential think time keeps users from marching in lock-step
+            await asyncio.sleep(rng.expovariate(1 / think_time))
+
+
+async def discover_target(base_url: str, seed: int) -> Target:
+    async with httpx.AsyncClient(base_url=f"{base_url}{API_PREFIX}", timeout=30) as client:
+        books = (await client.get("/books")).json()
+        if not books:
+            raise RuntimeError("No books found on the target; run with seeding enabled")
+        book_id = books[0]["id"]
+        chapters = (await client.get(f"/books/{book_id}/chapters")).json()
+    return Target(book_id, [chapter["id"] for chapter in chapters], random.Random(seed))
+
+
+async def run_load(base_url: str, profile: Dict[str, Any], seed: int) -> Dict[str, Any]:
+    unknown = set(profile["mix"]) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f"Unknown scenarios in mix: {sorted(unknown)}")
+
+    target = await discover_target(base_url, seed)
+    recorder = Recorder()
+    users = profile["users"]
+    limits = httpx.Limits(max_connections=users + 5, max_keepalive_connections=users + 5)
+    timeout = httpx.Timeout(profile["server"].get("timeout", 300))
+
+    async with (
+        httpx.AsyncClient(
+            base_url=f"{base_url}{API_PREFIX}", limits=limits, timeout=timeout
+        ) as client,
+        # No keep-alive, so that successive polls can land on different workers
+        httpx.AsyncClient(
+            base_url=base_url, timeout=5, limits=httpx.Limits(max_keepalive_connections=0)
+        ) as probe,
+    ):
+        # Drain lag samples gathered while the app was idle
+        await probe.get("/_bench/loop-lag")
+        start = time.perf_counter()
+        deadline = start + profile["duration_s"]
+        ramp = profile.get("ramp_s", 0)
+        tasks = [
+            virtual_user(
+                client,
+                recorder,
+                target,
+                profile["mix"],
+                profile.get("think_time_ms", 0) / 1000,
+                ramp * index / users,
+                deadline,
+                random.Random(seed + index),
+            )
+            for index in range(users)
+        ]
+        await asyncio.gather(poll_loop_lag(probe, recorder, deadline), *tasks)
+        duration = time.perf_counter() - start
+
+    return summarize(recorder, duration)
+
+
+def seed_database(database_url: str, llm_url: str, seed_config: Dict[str, Any], seed: int):
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["FAKE_LLM_URL"] = llm_url
+
+    from app.database import Base, SessionLocal, engine
+    from benchmarks.synthetic import seed_book
+    from scripts.create_default_settings import create_default_settings
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    create_default_settings()
+    db = SessionLocal()
+    try:
+        seed_book(
+            db,
+            seed_config["chapters"],
+            seed_config.get("words_per_chapter", 1500),
+            seed_config.get("cast_size", 40),
+            seed=seed,
+        )
+    finally:
+        db.close()
+
+
+def start_server(
+    port: int, server_config: Dict[str, Any], database_url: str, llm_url: str, log_path: str
+) -> subprocess.Popen:
+    cmd = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "benchmarks.load_app:app",
+        "-k",
+        server_config.get("worker_class", "uvicorn.workers.UvicornWorker"),
+        "--bind",
+        f"127.0.0.1:{port}",
+        "-w",
+        str(server_config.get("workers", 4)),
+        "--timeout",
+        str(server_config.get("timeout", 300)),
+        *server_config.get("extra_args", []),
+    ]
+    # book_service builds an OpenAI client at import time and needs some key
+    env = {
+        "OPENAI_API_KEY": "fake-llm",
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "FAKE_LLM_URL": llm_url,
+    }
+    log = open(log_path, "w")
+    process = subprocess.Popen(cmd, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited during startup, see {log_path}")
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"gunicorn did not start on port {port}")
+
+
+def load_profile(path: Optional[str]) -> Dict[str, Any]:
+    profile = json.loads(json.dumps(DEFAULT_PROFILE))
+    if path:
+        with open(path) as f:
+            overrides = json.load(f)
+        for key, value in overrides.items():
+            if isinstance(value, dict) and key in ("server", "fake_llm", "seed"):
+                profile[key].update(value)
+            else:
+                profile[key] = value
+        profile.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    return profile
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load-test the API against a fake LLM")
+    parser.add_argument("profile", nargs="?", help="JSON profile, see benchmarks/profiles")
+    parser.add_argument("--url", help="Target an already running app instead of starting one")
+    parser.add_argument("--workers", type=int, help="Override server.workers from the profile")
+    parser.add_argument("--users", type=int, help="Override users from the profile")
+    parser.add_argument("--duration", type=float, help="Override duration_s from the profile")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--llm-port", type=int, default=8101)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--server-log", default="benchmarks/.load_test.log")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", help="Name for this run, defaults to the git revision")
+    parser.add_argument("--output", "-o", help="Write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    profile = load_profile(args.profile)
+    if args.workers:
+        profile["server"]["workers"] = args.workers
+    if args.users:
+        profile["users"] = args.users
+    if args.duration:
+        profile["duration_s"] = args.duration
+
+    llm_server = server = None
+    base_url = args.url
+    try:
+        if not base_url:
+            llm_server = FakeLLMServer(port=args.llm_port, **profile["fake_llm"]).start()
+            seed_database(args.database_url, llm_server.openai_url, profile["seed"], args.seed)
+            server = start_server(
+                args.port,
+                profile["server"],
+                args.database_url,
+                llm_server.openai_url,
+                args.server_log,
+            )
+            base_url = f"http://127.0.0.1:{args.port}"
+        results = asyncio.run(run_load(base_url, profile, args.seed))
+        if llm_server:
+            results["fake_llm"] = llm_server.stats()
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+        if llm_server:
+            llm_server.stop()
+
+    revision = git_revision()
+    report = {
+        "benchmark": "load_test",
+        "label": args.label or revision,
+        "git_revision": revision,
+        "created_at": int(time.time()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "target": args.url or "local",
+        "database": args.database_url.split(":", 1)[0],
+        "profile": profile,
+        **results,
+    }
+
+    for name, endpoint in report["endpoints"].items():
+        latency = endpoint["latency"]
+        print(
+            f"{name:<18} {endpoint['requests']:>6} req {endpoint['throughput_rps']:>8.2f} rps  "
+            f"p50 {latency['p50_ms'] or 0:>8.1f}  p95 {latency['p95_ms'] or 0:>8.1f}  "
+            f"p99 {latency['p99_ms'] or 0:>8.1f} ms  errors {endpoint['error_rate']:.2%}",
+            file=sys.stderr,
+        )
+    print(f"loop lag p99 {report['loop_lag']['p99_ms']} ms", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import timeit
+import tracemalloc
+from functools import cached_property
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.fake_llm.responders import character_blocks, scene_outline
+from benchmarks.template_pipeline import git_revision
+
+Case = Callable[[], Any]
+
+# name -> factory building the zero-argument callable to time from the shared fixtures
+CASES: Dict[str, Callable[["Fixtures"], Case]] = {}
+
+
+def case(name: str):
+    def register(factory: Callable[["Fixtures"], Case]):
+        CASES[name] = factory
+        return factory
+
+    return register
+
+
+class Fixtures:
+    """Realistic large inputs shared by all cases, built once per run."""
+
+    def __init__(self, chapters: int, cast_size: int, words_per_chapter: int, seed: int):
+        from benchmarks.synthetic import chapter_text, make_cast
+
+        self.rng = random.Random(seed)
+        self.chapter_count = chapters
+        self.cast = make_cast(cast_size, seed)
+        self.chapters = [
+            chapter_text(self.rng, self.cast, words_per_chapter) for _ in range(chapters)
+        ]
+        self.loop = asyncio.new_event_loop()
+
+    @cached_property
+    def character_arc_rows(self) -> List[Any]:
+        from app.models.models import CharacterArc
+
+        range_size = 10
+
+        # Protagonists appear in every range, the rest of the cast in a random subset
+        ranges = [
+            [start, min(start + range_size - 1, self.chapter_count)]
+            for start in range(1, self.chapter_count + 1, range_size)
+        ]
+        rows = []
+        for index, name in enumerate(self.cast, 1):
+            present = ranges if index <= 4 else self.rng.sample(ranges, k=len(ranges) // 5 or 1)
+            rows.append(
+                CharacterArc(
+                    id=index,
+                    name=name,
+                    archetype=f"char_{index}",
+                    type="STORYBOARD",
+                    content_json={
+                        "chapter_range_content": [
+                            {"chapter_range": chapter_range, "content": self.chapters[i][:1200]}
+                            for i, chapter_range in enumerate(sorted(present))
+                        ],
+                        "blood_relations": "None",
+                    },
+                )
+            )
+        return rows
+
+
+@case("format_prompt.scene_system_prompt")
+def format_scene_prompt(fixtures: Fixtures) -> Case:
+    from app.prompts import format_prompt
+    from app.prompts.scenes import SCENE_GENERATION_SYSTEM_PROMPT_V1
+
+    previous = "\n\n".join(fixtures.chapters[:5])
+    last, following = fixtures.chapters[5], fixtures.chapters[6]
+    return lambda: format_prompt(
+        SCENE_GENERATION_SYSTEM_PROMPT_V1,
+        previous_chapters=previous,
+        last_chapter=last,
+        next_chapter=following,
+    )
+
+
+@case("chapter_service.parse_scene_outline")
+def parse_scenes(fixtures: Fixtures) -> Case:
+    from app.services.chapter_service import parse_scene_outline
+
+    response_text = scene_outline(fixtures.rng, 4000)
+    return lambda: parse_scene_outline(response_text)
+
+
+@case("story_extractor_utils.parse_character_blocks")
+def parse_characters(fixtures: Fixtures) -> Case:
+    from app.utils.story_extractor_utils import parse_character_blocks
+
+    output = "\n\n".join(character_blocks(fixtures.rng, name, 400) for name in fixtures.cast)
+    return lambda: parse_character_blocks(output, [1, 10])
+
+
+@case("story_generator_utils.get_character_arcs_content_by_chapter_id")
+def arcs_for_chapter(fixtures: Fixtures) -> Case:
+    from app.utils.story_generator_utils import get_character_arcs_content_by_chapter_id
+
+    rows = fixtures.character_arc_rows
+    chapter_no = fixtures.chapter_count // 2
+    return lambda: get_character_arcs_content_by_chapter_id(rows, chapter_no)
+
+
+@case("story_generator_utils.get_character_arcs_content_by_chapter_id.100_chapters")
+def arcs_for_many_chapters(fixtures: Fixtures) -> Case:
+    from app.utils.story_generator_utils import get_character_arcs_content_by_chapter_id
+
+    # One lookup per chapter, as plot beat and chapter generation do across a storyboard
+    rows = fixtures.character_arc_rows
+    chapter_numbers = range(1, fixtures.chapter_count + 1, max(1, fixtures.chapter_count // 100))
+    return lambda: [
+        get_character_arcs_content_by_chapter_id(rows, chapter_no) for chapter_no in chapter_numbers
+    ]
+
+
+@case("story_extractor_utils.build_consolidated_characters")
+def consolidate(fixtures: Fixtures) -> Case:
+    from app.schemas.character_arcs import CharacterArcNameGroup, CharacterArcNameGroups
+    from app.utils.story_extractor_utils import (
+        build_consolidated_characters,
+        parse_character_blocks,
+    )
+
+    # One extraction batch per ten chapters, each mentioning a slice of the cast
+    batches = []
+    for start in range(1, fixtures.chapter_count + 1, 10):
+        names = fixtures.rng.sample(fixtures.cast, k=min(20, len(fixtures.cast)))
+        output = "\n\n".join(character_blocks(fixtures.rng, name, 200) for name in names)
+        batches.append(parse_character_blocks(output, [start, start + 9]))
+
+    indices_by_name: Dict[str, List[int]] = {}
+    flat = [character for batch in batches for character in batch]
+    for index, character in enumerate(flat):
+        indices_by_name.setdefault(character.name, []).append(index)
+    groups = CharacterArcNameGroups(
+        groups=[
+            CharacterArcNameGroup(indices=indices, canonical_name=name)
+            for name, indices in indices_by_name.items()
+        ]
+    )
+    return lambda: fixtures.loop.run_until_complete(build_consolidated_characters(batches, groups))
+
+
+@case("character_dedup.cluster_character_names")
+def cluster_names(fixtures: Fixtures) -> Case:
+    from app.utils.character_dedup import cluster_character_names
+
+    # Names as extraction batches report them: repeats, titles, first names and typos
+    variants = []
+    for name in fixtures.cast:
+        first, last = name.split(" ", 1)
+        variants += [name, name.upper(), f"Mr. {last}", first, name.replace("a", "e", 1)]
+    names = [fixtures.rng.choice(variants) for _ in range(20 * len(fixtures.cast))]
+    return lambda: cluster_character_names(names)
+
+
+@case("chapter_service.split_html_into_chapters")
+def split_html(fixtures: Fixtures) -> Case:
+    from app.services.chapter_service import split_html_into_chapters
+
+    html_content = "".join(
+        f"<h2>Chapter {number}</h2>"
+        + "".join(f"<p>{paragraph}</p>" for paragraph in text.split("\n\n"))
+        for number, text in enumerate(fixtures.chapters, 1)
+    )
+    return lambda: split_html_into_chapters(html_content)
+
+
+def measure(fn: Case, repeat: int, min_time: float) -> Dict[str, Any]:
+    timer = timeit.Timer(fn)
+    # Calibrate the loop count so that each repeat takes at least min_time
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time:
+            break
+        number *= 2
+    times = [elapsed / number for elapsed in timer.repeat(repeat=repeat, number=number)]
+
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "number": number,
+        "repeat": repeat,
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "stdev_s": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for CPU hot paths")
+    parser.add_argument("--chapters", type=int, default=1000)
+    parser.add_argument("--cast-size", type=int, default=200)
+    parser.add_argument("--words-per-chapter", type=int, default=1500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds per repeat")
+    parser.add_argument("--filter", "-k", help="Only run cases whose name contains this")
+    parser.add_argument("--label", help="Name for this run, defaults to the git revision")
+    parser.add_argument("--output", "-o", help="Write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    # Importing app modules connects to the database; nothing here touches it
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    logging.disable(logging.WARNING)
+
+    setup_start = time.perf_counter()
+    fixtures = Fixtures(args.chapters, args.cast_size, args.words_per_chapter, args.seed)
+    setup_seconds = time.perf_counter() - setup_start
+
+    results = {}
+    for name, factory in CASES.items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(factory(fixtures), args.repeat, args.min_time)
+        print(
+            f"{name:<72} {results[name]['median_s'] * 1e3:>10.3f} ms"
+            f"  ±{results[name]['stdev_s'] * 1e3:.3f}  peak {results[name]['peak_kb']:.0f} KiB",
+            file=sys.stderr,
+        )
+    fixtures.loop.close()
+
+    revision = git_revision()
+    report = {
+        "benchmark": "micro",
+        "label": args.label or revision,
+        "git_revision": revision,
+        "created_at": int(time.time()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "fixtures": {
+            "chapters": args.chapters,
+            "cast_size": args.cast_size,
+            "words_per_chapter": args.words_per_chapter,
+            "seed": args.seed,
+            "setup_s": round(setup_seconds, 3),
+        },
+        "cases": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import random
+import time
+from typing import List, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.models import Book, Chapter, Template
+from app.schemas.schemas import TemplateStatusEnum
+
+FIRST_NAMES = (
+    "Raegan Mitchel Lauren Kyler Luciana Tessa Nicole Henley Adrian Brielle Caspian Delia Emery "
+    "Fletcher Gemma Harlan Isolde Jasper Keira Lennox Marisol Nolan Odette Percy Quinn Rosalind "
+    "Silas Talia Ulric Vivian Weston Xenia Yara Zane"
+).split()
+
+LAST_NAMES = (
+    "Hayes Dixon Murray Hart Brooks Sinclair Whitmore Calloway Ashford Langley Mercer Prescott "
+    "Thorne Vance Winslow Harrington"
+).split()
+
+NARRATIVE = (
+    "looked across the room and said nothing for a long moment before the door opened again "
+    "the city lights blurred through the rain on the office window while the phone kept ringing "
+    "she remembered the promise made years ago and the secret the family had buried since then "
+    "he signed the contract without reading it because the company needed the deal by morning "
+    "dinner ended in silence and the car waited outside with its engine still running"
+).split()
+
+BENCHMARK_USER = "benchmark"
+
+
+def make_cast(size: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    names = [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
+    rng.shuffle(names)
+    return names[:size]
+
+
+def chapter_text(rng: random.Random, cast: List[str], words: int) -> str:
+    # Paragraphs of filler prose with a few named characters per chapter, so that
+    # extraction prompts see a realistic mix of recurring and one-off names
+    present = rng.sample(cast, k=min(len(cast), rng.randint(2, 5)))
+    paragraphs = []
+    written = 0
+    while written < words:
+        sentences = [
+            f"{rng.choice(present)} "
+            + " ".join(rng.choice(NARRATIVE) for _ in range(rng.randint(12, 24)))
+            for _ in range(rng.randint(3, 6))
+        ]
+        paragraph = ". ".join(sentences) + "."
+        paragraphs.append(paragraph)
+        written += len(paragraph.split())
+    return "\n\n".join(paragraphs)
+
+
+def seed_book(
+    db: Session,
+    chapters: int,
+    words_per_chapter: int = 1500,
+    cast_size: int = 40,
+    seed: int = 0,
+) -> Tuple[Book, Template]:
+    rng = random.Random(seed)
+    cast = make_cast(cast_size, seed)
+    now = int(time.time())
+    audit = {
+        "created_at": now,
+        "updated_at": now,
+        "created_by": BENCHMARK_USER,
+        "updated_by": BENCHMARK_USER,
+    }
+
+    book = Book(
+        title=f"Synthetic Book ({chapters} chapters)",
+        author="Benchmark",
+        author_id=BENCHMARK_USER,
+        **audit,
+    )
+    db.add(book)
+    db.flush()
+
+    db.add_all(
+        Chapter(
+            book_id=book.id,
+            title=f"Chapter {number}",
+            chapter_no=number,
+            content=chapter_text(rng, cast, words_per_chapter),
+            **audit,
+        )
+        for number in range(1, chapters + 1)
+    )
+
+    template = Template(
+        name=book.title,
+        book_id=book.id,
+        summary_status=TemplateStatusEnum.NOT_STARTED,
+        character_arc_status=TemplateStatusEnum.NOT_STARTED,
+        plot_beats_status=TemplateStatusEnum.NOT_STARTED,
+        character_arc_template_status=TemplateStatusEnum.NOT_STARTED,
+        plot_beat_template_status=TemplateStatusEnum.NOT_STARTED,
+    )
+    db.add(template)
+    db.commit()
+    db.refresh(book)
+    db.refresh(template)
+    return book, template
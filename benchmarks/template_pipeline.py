@@ -0,0 +1,411 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.fake_llm import FakeLLMServer
+
+DEFAULT_DATABASE_URL = "sqlite:///benchmarks/.template_pipeline.db"
+
+# (stage name, module, class, coroutine method) timed around each TemplateManager.run step.
+# Keep in sync with the orchestration in TemplateManager.
+STAGES = [
+    (
+        "extract.summaries",
+        "app.services.template_generator.story_extractor",
+        "StoryExtractor",
+        "summarize_all_chapters",
+    ),
+    (
+        "extract.character_arcs",
+        "app.services.template_generator.story_extractor",
+        "StoryExtractor",
+        "extract_character_arcs",
+    ),
+    (
+        "extract.plot_beats",
+        "app.services.template_generator.story_extractor",
+        "StoryExtractor",
+        "analyze_all_plot_beats",
+    ),
+    (
+        "abstract.character_arcs",
+        "app.services.template_generator.story_abstractor",
+        "StoryAbstractor",
+        "abstract_all_character_arcs",
+    ),
+    (
+        "abstract.plot_beats",
+        "app.services.template_generator.story_abstractor",
+        "StoryAbstractor",
+        "abstract_plot_beats",
+    ),
+]
+
+
+# With --tracemalloc, a snapshot is taken whenever traced memory grows this much past the last
+# snapshot, so that the reported allocation sites are those of the peak
+SNAPSHOT_GROWTH = 1.1
+TOP_ALLOCATIONS = 15
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+@dataclass
+class LLMCall:
+    start: float
+    end: float
+    status: int
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+@dataclass
+class PipelineProbe:
+    """Collects timestamped LLM calls, SQL statements, RSS samples and stage intervals.
+
+    With ``trace_memory`` it also samples Python heap usage through tracemalloc and keeps a
+    snapshot of the allocations at the peak.
+    """
+
+    rss_interval: float = 0.05
+    trace_memory: bool = False
+    calls: List[LLMCall] = field(default_factory=list)
+    queries: List[float] = field(default_factory=list)
+    rss_samples: List[Tuple[float, int]] = field(default_factory=list)
+    stages: List[Tuple[str, float, float]] = field(default_factory=list)
+    traced_samples: List[Tuple[float, int]] = field(default_factory=list)
+    peak_snapshot: Optional[tracemalloc.Snapshot] = None
+
+    @contextmanager
+    def attach(self, engine) -> Iterator["PipelineProbe"]:
+        from sqlalchemy import event
+
+        def count_query(*args, **kwargs):
+            self.queries.append(time.perf_counter())
+
+        original_send = httpx.Client.send
+        probe = self
+
+        def send(client, request, **kwargs):
+            start = time.perf_counter()
+            response = original_send(client, request, **kwargs)
+            if request.url.path.endswith("/chat/completions"):
+                call = LLMCall(start, time.perf_counter(), response.status_code)
+                if not kwargs.get("stream") and response.status_code == 200:
+                    usage = response.json().get("usage") or {}
+                    call.prompt_tokens = usage.get("prompt_tokens", 0)
+                    call.completion_tokens = usage.get("completion_tokens", 0)
+                probe.calls.append(call)
+            return response
+
+        stop = threading.Event()
+
+        def sample_rss():
+            snapshot_at = 0
+            while not stop.is_set():
+                now = time.perf_counter()
+                self.rss_samples.append((now, rss_bytes()))
+                if self.trace_memory:
+                    traced = tracemalloc.get_traced_memory()[0]
+                    self.traced_samples.append((now, traced))
+                    if traced > snapshot_at * SNAPSHOT_GROWTH:
+                        self.peak_snapshot, snapshot_at = tracemalloc.take_snapshot(), traced
+                stop.wait(self.rss_interval)
+
+        sampler = threading.Thread(target=sample_rss, daemon=True)
+        if self.trace_memory:
+            tracemalloc.start()
+        event.listen(engine, "before_cursor_execute", count_query)
+        httpx.Client.send = send
+        sampler.start()
+        try:
+            with self.timed_stages():
+                yield self
+        finally:
+            stop.set()
+            sampler.join()
+            if self.trace_memory:
+                tracemalloc.stop()
+            httpx.Client.send = original_send
+            event.remove(engine, "before_cursor_execute", count_query)
+
+    @contextmanager
+    def timed_stages(self) -> Iterator[None]:
+        import importlib
+
+        patched = []
+        for name, module_name, class_name, method_name in STAGES:
+            cls = getattr(importlib.import_module(module_name), class_name)
+            original = getattr(cls, method_name)
+            setattr(cls, method_name, self._timed(name, original))
+            patched.append((cls, method_name, original))
+        try:
+            yield
+        finally:
+            for cls, method_name, original in patched:
+                setattr(cls, method_name, original)
+
+    def _timed(self, name: str, method):
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                self.stages.append((name, start, time.perf_counter()))
+
+        return wrapper
+
+    def window(self, start: float, end: float) -> Dict[str, Any]:
+        wall = max(end - start, 1e-9)
+        calls = [c for c in self.calls if start <= c.start < end]
+        # Time-weighted number of LLM requests in flight during the window
+        busy = sum(max(0.0, min(c.end, end) - max(c.start, start)) for c in self.calls)
+        rss = [value for at, value in self.rss_samples if start <= at <= end]
+        traced = [value for at, value in self.traced_samples if start <= at <= end]
+        metrics = {
+            "wall_s": round(end - start, 3),
+            "llm_calls": len(calls),
+            "llm_errors": sum(1 for c in calls if c.status >= 400),
+            "prompt_tokens": sum(c.prompt_tokens for c in calls),
+            "completion_tokens": sum(c.completion_tokens for c in calls),
+            "achieved_concurrency": round(busy / wall, 2),
+            "queries": sum(1 for at in self.queries if start <= at < end),
+            "peak_rss_mb": round(max(rss) / 2**20, 1) if rss else None,
+        }
+        if self.trace_memory:
+            metrics["peak_traced_mb"] = round(max(traced) / 2**20, 1) if traced else None
+        return metrics
+
+    def top_allocations(self) -> List[Dict[str, Any]]:
+        # Allocation sites holding the most memory at the traced peak
+        if self.peak_snapshot is None:
+            return []
+        snapshot = self.peak_snapshot.filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        return [
+            {
+                "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_mb": round(stat.size / 2**20, 2),
+                "count": stat.count,
+            }
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+        ]
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def fake_llm_stats(llm_url: str) -> Optional[Dict[str, Any]]:
+    base_url = llm_url.rstrip("/").removesuffix("/v1")
+    try:
+        return httpx.get(f"{base_url}/_admin/stats", timeout=5).json()
+    except (httpx.HTTPError, ValueError):
+        return None
+
+
+def reset_fake_llm(llm_url: str) -> None:
+    base_url = llm_url.rstrip("/").removesuffix("/v1")
+    try:
+        httpx.post(f"{base_url}/_admin/reset", timeout=5)
+    except httpx.HTTPError:
+        pass
+
+
+def run_size(args: argparse.Namespace, chapters: int) -> Dict[str, Any]:
+    # The app reads FAKE_LLM_URL and DATABASE_URL at import time
+    os.environ["FAKE_LLM_URL"] = args.llm_url
+    os.environ["DATABASE_URL"] = args.database_url
+
+    from sqlalchemy import func
+
+    from app.database import Base, SessionLocal, engine
+    from app.models.models import CharacterArc, PlotBeat
+    from app.services.template_generator.template_manager import TemplateManager
+    from benchmarks.synthetic import seed_book
+
+    logging.getLogger().setLevel(args.log_level)
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        seed_start = time.perf_counter()
+        book, template = seed_book(
+            db, chapters, args.words_per_chapter, args.cast_size, seed=args.seed
+        )
+        seed_seconds = time.perf_counter() - seed_start
+
+        reset_fake_llm(args.llm_url)
+        probe = PipelineProbe(rss_interval=args.rss_interval, trace_memory=args.tracemalloc)
+        rss_before = rss_bytes()
+        error = None
+        with probe.attach(engine):
+            start = time.perf_counter()
+            try:
+                asyncio.run(TemplateManager(book.id, db).run(template.id))
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            end = time.perf_counter()
+
+        arcs_by_type = dict(
+            db.query(CharacterArc.type, func.count(CharacterArc.id))
+            .group_by(CharacterArc.type)
+            .all()
+        )
+        beats_by_type = dict(
+            db.query(PlotBeat.type, func.count(PlotBeat.id)).group_by(PlotBeat.type).all()
+        )
+    finally:
+        db.close()
+
+    stages = {}
+    for name, stage_start, stage_end in probe.stages:
+        stages[name] = probe.window(stage_start, stage_end)
+
+    run = {
+        "chapters": chapters,
+        "words_per_chapter": args.words_per_chapter,
+        "cast_size": args.cast_size,
+        "error": error,
+        "seed_s": round(seed_seconds, 3),
+        "total": probe.window(start, end),
+        "stages": stages,
+        "rss_before_mb": round(rss_before / 2**20, 1),
+        "max_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            / (2**20 if sys.platform == "darwin" else 2**10),
+            1,
+        ),
+        "outputs": {"character_arcs": arcs_by_type, "plot_beats": beats_by_type},
+        "fake_llm": fake_llm_stats(args.llm_url),
+    }
+    if args.tracemalloc:
+        run["top_allocations"] = probe.top_allocations()
+    return run
+
+
+def run_child(args: argparse.Namespace, chapters: int) -> Dict[str, Any]:
+    # One process per book size so that RSS and import caches do not leak between runs
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        output = f.name
+    cmd = [sys.executable, "-m", "benchmarks.template_pipeline", "--chapters", str(chapters)]
+    cmd += ["--output", output, "--llm-url", args.llm_url]
+    cmd += ["--database-url", args.database_url, "--seed", str(args.seed)]
+    cmd += ["--words-per-chapter", str(args.words_per_chapter)]
+    cmd += ["--cast-size", str(args.cast_size), "--log-level", args.log_level]
+    cmd += ["--rss-interval", str(args.rss_interval)]
+    if args.tracemalloc:
+        cmd.append("--tracemalloc")
+    try:
+        subprocess.run(cmd, check=True)
+        with open(output) as f:
+            return json.load(f)["runs"][0]
+    finally:
+        os.unlink(output)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run TemplateManager end to end on synthetic books against a fake LLM"
+    )
+    parser.add_argument("--chapters", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--words-per-chapter", type=int, default=1500)
+    parser.add_argument("--cast-size", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--llm-url", help="Use an already running fake LLM instead of starting one")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--ttft-ms", type=float, default=400.0)
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--output-tokens", type=int, default=300)
+    parser.add_argument("--rss-interval", type=float, default=0.05)
+    parser.add_argument(
+        "--tracemalloc",
+        action="store_true",
+        help="Also report peak Python heap usage and the allocation sites at the peak",
+    )
+    parser.add_argument("--label", help="Name for this run, defaults to the git revision")
+    parser.add_argument("--log-level", default="ERROR")
+    parser.add_argument("--output", "-o", help="Write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    llm_config = {
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "ttft_ms": args.ttft_ms,
+        "tokens_per_second": args.tokens_per_second,
+        "output_tokens": args.output_tokens,
+        "seed": args.seed,
+    }
+
+    server = None
+    if not args.llm_url:
+        server = FakeLLMServer(port=args.port, **llm_config).start()
+        args.llm_url = server.openai_url
+    try:
+        if len(args.chapters) == 1:
+            runs = [run_size(args, args.chapters[0])]
+        else:
+            runs = [run_child(args, chapters) for chapters in args.chapters]
+    finally:
+        if server:
+            server.stop()
+
+    revision = git_revision()
+    report = {
+        "benchmark": "template_pipeline",
+        "label": args.label or revision,
+        "git_revision": revision,
+        "created_at": int(time.time()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": args.database_url.split(":", 1)[0],
+        "fake_llm": llm_config if server else {"url": args.llm_url},
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,5 +2,6 @@
 set -e
 export PYTHONUNBUFFERED=1
 
-echo "Starting RQ Worker......"
-exec python -m rq.cli worker --url $REDIS_URL default high low
+# WORKER_MODE and WORKER_CLASSES pick the worker type and the job classes of this pool
+echo "Starting RQ Worker for ${WORKER_CLASSES:-all job classes}......"
+exec python -m app.services.background_jobs.worker